@@ -0,0 +1,2 @@
+# bench/__init__.py
+"""SPX-OS v0.2 benchmark suite: `python -m bench --help` (run from the repo root)."""
@@ -0,0 +1,66 @@
+# bench/__main__.py
+"""
+Benchmark CLI — SPX-OS v0.2
+  python -m bench [--quick] [--only kem.] [--out results.json]
+  python -m bench --compare baseline.json [--threshold 0.25]        # run, then compare
+  python -m bench --compare baseline.json --current results.json     # compare two saved files
+Exit status 1 if compare finds a regression.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import sys
+from typing import Any, Dict
+
+from bench.suite import compare, run
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench", description="SPX-OS kernel benchmarks")
+    ap.add_argument("--quick", action="store_true", help="smaller sizes (CI smoke run)")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per case, fastest is kept")
+    ap.add_argument("--only", help="run cases whose name contains this substring")
+    ap.add_argument("--out", help="write results JSON here (default: stdout)")
+    ap.add_argument("--compare", metavar="BASELINE", help="baseline results JSON")
+    ap.add_argument("--current", help="compare this saved results JSON instead of running")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = +25%%)")
+    args = ap.parse_args(argv)
+
+    if args.current:
+        if not args.compare:
+            ap.error("--current needs --compare")
+        current = _load(args.current)
+    else:
+        current = run(quick=args.quick, repeat=args.repeat, only=args.only,
+                      progress=lambda key, r: print(f"{key:<40} {r['us_per_op']:>12.3f} us/op "
+                                                    f"{r['ops_per_s']:>14,.0f} ops/s", file=sys.stderr))
+        text = json.dumps(current, indent=2)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        elif not args.compare:
+            print(text)
+
+    if not args.compare:
+        return 0
+    report = compare(_load(args.compare), current, args.threshold)
+    for key, row in report["cases"].items():
+        mark = {"regression": "!!", "improved": "++", "ok": "  "}[row["status"]]
+        print(f"{mark} {key:<40} {row['baseline_us']:>12.3f} → {row['current_us']:>12.3f} us/op "
+              f"(x{row['ratio']:.2f})")
+    for key in report["missing"]:
+        print(f"-- {key:<40} missing in current run")
+    if report["regressions"]:
+        print(f"{len(report['regressions'])} regression(s) above +{args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+# bench/suite.py
+"""
+Benchmark Suite — SPX-OS v0.2
+Micro and end-to-end benchmarks for KEM, KMS, KMM and the full tick.
+
+Every case is `fn(n) -> (ops, seconds)`: the function builds its fixture for size `n`
+outside the timed region and returns how many operations the timed region performed.
+A case runs `repeat` times per size and keeps the fastest run (least scheduler noise).
+Results are keyed "<case>[<n>]" so a saved baseline can be compared run to run.
+"""
+
+from __future__ import annotations
+import platform
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from kernel.kem import KernelEventMesh
+from kernel.kmm import KernelMemoryModel
+from kernel.kms import KernelMetaScheduler
+from spx_types.event import Event, EventType
+
+SCHEMA = 1
+CaseFn = Callable[[int], Tuple[int, float]]
+
+
+@dataclass
+class _Case:
+    name: str
+    fn: CaseFn
+    sizes: Tuple[int, ...]
+    quick: Tuple[int, ...]
+
+
+CASES: List[_Case] = []
+
+
+def case(name: str, sizes: Sequence[int], quick: Optional[Sequence[int]] = None):
+    def deco(fn: CaseFn) -> CaseFn:
+        CASES.append(_Case(name, fn, tuple(sizes), tuple(quick or sizes[:1])))
+        return fn
+    return deco
+
+
+# ----------------- KEM -----------------
+
+def _kem(policy: str, capacity: int) -> KernelEventMesh:
+    kem = KernelEventMesh.init()
+    kem.configure(subject_max=capacity, policy=policy, subject_quota=capacity)
+    return kem
+
+
+def _publish_consume(policy: str, n: int, capacity: int) -> Tuple[int, float]:
+    kem = _kem(policy, capacity)
+    sids = [f"S{i}" for i in range(16)]
+    events = [Event.subject(sids[i % 16], EventType.PERCEPTION, {"i": i}) for i in range(n)]
+    t0 = perf_counter()
+    for ev in events:
+        try:
+            kem.publish(ev)
+        except RuntimeError:
+            pass          # "reject": переповнення — частина навантаження
+    for sid in sids:
+        while kem.fetch_for(sid, 64):
+            pass
+    return n, perf_counter() - t0
+
+
+for _policy in ("drop_oldest", "reject"):
+    case(f"kem.publish_consume.{_policy}", (10_000, 100_000), (10_000,))(
+        lambda n, p=_policy: _publish_consume(p, n, n))
+    # ємність n/4: три чверті публікацій проходять через політику переповнення
+    case(f"kem.overflow.{_policy}", (10_000, 100_000), (10_000,))(
+        lambda n, p=_policy: _publish_consume(p, n, max(1, n // 4)))
+
+
+def _filled(depth: int) -> KernelEventMesh:
+    kem = _kem("drop_oldest", depth)
+    kem.publish_many(Event.subject_many("S0", EventType.PERCEPTION, [{}] * (depth // 2)))
+    kem.publish_many(Event.subject_many("S1", EventType.PERCEPTION, [{}] * (depth - depth // 2)))
+    return kem
+
+
+@case("kem.drain_for", (100, 1_000, 10_000, 100_000), (100, 10_000))
+def _drain_for(depth: int) -> Tuple[int, float]:
+    kem = _filled(depth)
+    calls = max(10, 200_000 // depth)
+    t0 = perf_counter()
+    for _ in range(calls):
+        kem.drain_for(lambda ev: False)     # повний прохід без видалення — найгірший випадок
+    return calls, perf_counter() - t0
+
+
+@case("kem.subject_len", (100, 1_000, 10_000, 100_000), (100, 10_000))
+def _subject_len(depth: int) -> Tuple[int, float]:
+    kem = _filled(depth)
+    calls = 100_000
+    t0 = perf_counter()
+    for _ in range(calls):
+        kem.subject_len("S0")
+    return calls, perf_counter() - t0
+
+
+# ----------------- KMS -----------------
+
+def _kms_cycle(mode: str, subjects: int) -> Tuple[int, float]:
+    kms = KernelMetaScheduler.init({"hb_period": 0.01, "scheduler": {"mode": mode}})
+    for i in range(subjects):
+        kms.register(f"S{i}")
+    kem = KernelEventMesh.init()
+    kem.configure(subject_max=subjects * 4)
+    # кожен десятий суб'єкт має черговий борг
+    kem.publish_many([Event.subject(f"S{i}", EventType.PERCEPTION, {}) for i in range(0, subjects, 10)])
+    cycles = max(20, 20_000 // subjects)
+    t0 = perf_counter()
+    for _ in range(cycles):
+        kms.on_cycle_begin(kem, None)
+        kms.schedule_cycle_order()
+        kms.on_cycle_end()
+    return cycles, perf_counter() - t0
+
+
+for _mode in ("classic", "heap"):
+    case(f"kms.cycle.{_mode}", (10, 100, 1_000, 10_000), (10, 1_000))(
+        lambda n, m=_mode: _kms_cycle(m, n))
+
+
+# ----------------- KMM -----------------
+
+_KMM_OPS = 2_000
+
+
+def _kmm(nodes: int) -> KernelMemoryModel:
+    kmm = KernelMemoryModel({"wm_keep": 1 << 30})
+    for i in range(nodes):
+        kmm.encode_em(f"n{i}", {"i": i})
+    return kmm
+
+
+@case("kmm.encode_wm", (1_000, 10_000, 100_000), (1_000, 10_000))
+def _encode_wm(nodes: int) -> Tuple[int, float]:
+    kmm = _kmm(nodes)
+    t0 = perf_counter()
+    for i in range(_KMM_OPS):
+        kmm.encode_wm(f"w{i}", {"i": i}, origin="S0")
+    return _KMM_OPS, perf_counter() - t0
+
+
+@case("kmm.encode_em", (1_000, 10_000, 100_000), (1_000, 10_000))
+def _encode_em(nodes: int) -> Tuple[int, float]:
+    kmm = _kmm(nodes)
+    t0 = perf_counter()
+    for i in range(_KMM_OPS):
+        kmm.encode_em(f"e{i}", {"i": i}, origin="S0")
+    return _KMM_OPS, perf_counter() - t0
+
+
+@case("kmm.bind", (1_000, 10_000, 100_000), (1_000, 10_000))
+def _bind(nodes: int) -> Tuple[int, float]:
+    kmm = _kmm(nodes)
+    t0 = perf_counter()
+    for i in range(_KMM_OPS):
+        kmm.bind(f"n{i % nodes}", f"n{(i * 7 + 1) % nodes}", "rel")
+    return _KMM_OPS, perf_counter() - t0
+
+
+@case("kmm.wm_load", (1_000, 10_000, 100_000), (1_000, 10_000))
+def _wm_load(nodes: int) -> Tuple[int, float]:
+    kmm = _kmm(nodes)
+    for i in range(nodes // 10):
+        kmm.encode_wm(f"w{i}", {"i": i})
+    calls = 100_000
+    t0 = perf_counter()
+    for _ in range(calls):
+        kmm.wm_load()
+    return calls, perf_counter() - t0
+
+
+# ----------------- End-to-end -----------------
+
+class SyntheticSubject:
+    """Consumes its events, records one WM node per tick and pings the next subject."""
+
+    def __init__(self, subject_id, kem, kmm, isp, cfg):
+        self.subject_id = subject_id
+        self.kem = kem
+        self.kmm = kmm
+        self.peer = cfg["peer"]
+        self.n = 0
+
+    def hb_cycle(self):
+        got = self.kem.fetch_for(self.subject_id, 8)
+        self.n += 1
+        self.kmm.encode_wm(f"{self.subject_id}:{self.n}", {"got": len(got)}, origin=self.subject_id)
+        self.kem.publish(Event.subject(self.peer, EventType.PERCEPTION, {"n": self.n}))
+
+    def rf_cycle(self):
+        pass
+
+
+@case("e2e.tick", (10, 100, 1_000), (10, 100))
+def _e2e_tick(subjects: int) -> Tuple[int, float]:
+    from bootstrap import spx_bootstrap
+    from kernel.runtime import KernelRuntime
+    from utils.diagnostics import setup_logging
+
+    ctx = spx_bootstrap()
+    setup_logging({"level": "WARNING", "console": False, "file": None})
+    kem, kms, spm = ctx["kem"], ctx["kms"], ctx["spm"]
+    kem.configure(subject_max=subjects * 16, subject_quota=64)
+    for i in range(subjects):
+        kms.register(spm.spawn(SyntheticSubject, kem, ctx["kmm"], ctx["isp"],
+                               {"subject_id": f"SYN{i}", "peer": f"SYN{(i + 1) % subjects}"}))
+    rt = KernelRuntime.from_context(ctx, sleep_fn=lambda s: None, on_kernel_event=lambda ev: None)
+    ticks = max(20, 20_000 // subjects)
+    try:
+        t0 = perf_counter()
+        rt.run(cycles=ticks)
+        dt = perf_counter() - t0
+    finally:
+        rt.close()
+        kem.close()
+    return ticks, dt
+
+
+# ----------------- Runner / compare -----------------
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(*, quick: bool = False, repeat: int = 3, only: Optional[str] = None,
+        progress: Optional[Callable[[str, Dict[str, float]], None]] = None) -> Dict[str, Any]:
+    if repeat <= 0:
+        raise ValueError("Invalid benchmark repeat")
+    results: Dict[str, Dict[str, float]] = {}
+    for c in CASES:
+        if only and only not in c.name:
+            continue
+        for n in (c.quick if quick else c.sizes):
+            best: Optional[Tuple[int, float]] = None
+            for _ in range(repeat):
+                ops, dt = c.fn(n)
+                if best is None or dt / ops < best[1] / best[0]:
+                    best = (ops, dt)
+            ops, dt = best
+            key = f"{c.name}[{n}]"
+            results[key] = {"n": n, "ops": ops, "seconds": dt,
+                            "us_per_op": 1e6 * dt / ops, "ops_per_s": ops / dt if dt else float("inf")}
+            if progress:
+                progress(key, results[key])
+    return {
+        "schema": SCHEMA,
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0], "implementation": platform.python_implementation(),
+            "platform": platform.platform(), "machine": platform.machine(),
+            "git": _git_rev(), "quick": quick, "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.25) -> Dict[str, Any]:
+    """
+    Per common case: ratio = current us_per_op / baseline us_per_op.
+    ratio > 1 + threshold → regression, ratio < 1 / (1 + threshold) → improvement.
+    """
+    if threshold <= 0:
+        raise ValueError("Invalid compare threshold")
+    if baseline.get("schema") != SCHEMA or current.get("schema") != SCHEMA:
+        raise ValueError("Invalid benchmark file schema")
+    base, cur = baseline["results"], current["results"]
+    rows: Dict[str, Dict[str, Any]] = {}
+    for key in sorted(set(base) & set(cur)):
+        ratio = cur[key]["us_per_op"] / base[key]["us_per_op"] if base[key]["us_per_op"] else 1.0
+        status = "regression" if ratio > 1 + threshold else "improved" if ratio < 1 / (1 + threshold) else "ok"
+        rows[key] = {"baseline_us": base[key]["us_per_op"], "current_us": cur[key]["us_per_op"],
+                     "ratio": ratio, "status": status}
+    return {
+        "threshold": threshold,
+        "cases": rows,
+        "regressions": [k for k, r in rows.items() if r["status"] == "regression"],
+        "missing": sorted(set(base) - set(cur)),
+        "new": sorted(set(cur) - set(base)),
+    }
@@ -1,7 +1,10 @@
 from utils.config_loader import load_yaml
-from utils.diagnostics import log_info
+from utils.diagnostics import log_info, setup_logging
+from utils.metrics import MetricsExporter
+from utils.tracing import configure_tracing
 
 from kernel.kem import KernelEventMesh
+from kernel.kem_journal import KEMJournal
 from kernel.kmm import KernelMemoryModel
 from kernel.isp import ISP
 from kernel.kms import KernelMetaScheduler
@@ -14,8 +17,10 @@ from spx_types.event import Event, EventType
 
 
 def spx_bootstrap():
-    log_info("SPX-OS: Loading config...")
     cfg = load_yaml("config/spx_config.yaml")
+    setup_logging(cfg.get("logging"))
+    configure_tracing(cfg.get("tracing"))
+    log_info("SPX-OS: Loaded config.")
     isp_rules = load_yaml("config/isp_rules.yaml")
 
     # ---------------------------------------------------------
@@ -24,18 +29,32 @@ def spx_bootstrap():
     log_info("SPX-OS: Bootstrapping kernel...")
 
     kem = KernelEventMesh.init(dual_queue=True)
-    kmm = KernelMemoryModel.init()
+    kmm = KernelMemoryModel.init(cfg.get("kmm"))
     isp = ISP.load(isp_rules)
-    kms = KernelMetaScheduler.init(cfg["system"])
+    # scheduler: може бути як у system.scheduler, так і секцією верхнього рівня
+    system_cfg = dict(cfg["system"])
+    system_cfg.setdefault("scheduler", cfg.get("scheduler", {}))
+    kms = KernelMetaScheduler.init(system_cfg)
     spm = SubjectProcessManager.init()
 
-    # Apply KEM config (quotas, policies)
+    # Apply KEM config (quotas, policies); per-subject kem_quota is applied by SPM.spawn
     kem_cfg = cfg.get("kem", {})
     kem.configure(
         kernel_max=kem_cfg.get("kernel_max"),
         subject_max=kem_cfg.get("subject_max"),
         policy=kem_cfg.get("policy"),
+        subject_order=kem_cfg.get("subject_order"),
+        subject_quota=kem_cfg.get("subject_quota"),
     )
+    # WAL: replay unconsumed events of the previous run before new boot events
+    if kem_cfg.get("journal_dir"):
+        replayed = kem.attach_journal(KEMJournal.from_config(kem_cfg))
+        log_info("SPX-OS: KEM journal replayed %d events", replayed)
+    # shared-memory ingress for out-of-process producers (EventRing.attach(name))
+    if kem_cfg.get("ingress_ring_kb"):
+        kem.ingress_batch = int(kem_cfg.get("ingress_batch", 1024))
+        ring = kem.open_ingress_ring(kem_cfg.get("ingress_ring_name"), int(kem_cfg["ingress_ring_kb"]) * 1024)
+        log_info("SPX-OS: KEM ingress ring '%s' (%d bytes)", ring.name, ring.capacity)
 
     # kernel boot event
     kem.publish(Event.kernel(
@@ -65,6 +84,11 @@ def spx_bootstrap():
         {"phase": "subjects_initialized", "count": 2}
     ))
 
+    # Prometheus export of utils.metrics.REGISTRY (file and/or local HTTP endpoint)
+    exporter = MetricsExporter.from_config(cfg.get("metrics"))
+    if exporter is not None:
+        log_info("SPX-OS: metrics export (file=%s, port=%d)", exporter.path, exporter.port)
+
     # ---------------------------------------------------------
     # Return context
     # ---------------------------------------------------------
@@ -77,4 +101,5 @@ def spx_bootstrap():
         "spm": spm,
         "pid0": pid0,
         "root": root,
+        "metrics": exporter,
     }
@@ -6,4 +6,4 @@ class LogEffector:
 
     def execute(self, params: Dict[str, Any]) -> None:
         msg = params.get("msg", "")
-        log_info(f"[LogEffector] {msg}")
+        log_info("[LogEffector] %s", msg, sub="effectors")
@@ -0,0 +1,93 @@
+# kernel/akem.py
+"""
+Async Kernel Event Mesh — asyncio front-end over KernelEventMesh.
+  - await publish(): suspends the producer while the target channel/subject is full
+  - await next_event(): suspends the consumer until an event is available
+  - async for over a channel or a subject
+Kernel-first priority and per-channel FIFO come from the wrapped KEM.
+"""
+
+from __future__ import annotations
+import asyncio
+from typing import AsyncIterator, Optional
+from kernel.kem import KernelEventMesh
+from spx_types.event import Event, EventChannel
+
+
+class AsyncKernelEventMesh:
+    """
+    Awaitable publish/consume over a KernelEventMesh.
+    All access must happen from one event loop; backpressure suspends instead of
+    dropping or raising, so the KEM overflow policy is never reached from here.
+    """
+
+    def __init__(self, kem: Optional[KernelEventMesh] = None):
+        self.kem = kem or KernelEventMesh.init()
+        self._lock = asyncio.Lock()
+        self._not_empty = asyncio.Condition(self._lock)
+        self._not_full = asyncio.Condition(self._lock)
+
+    @classmethod
+    def init(cls, kem: Optional[KernelEventMesh] = None) -> "AsyncKernelEventMesh":
+        return cls(kem)
+
+    # ----------------------------------------------------------------------
+    # PUBLISH
+    # ----------------------------------------------------------------------
+    def _has_room(self, event: Event) -> bool:
+        if event.channel == EventChannel.KERNEL:
+            return self.kem.kernel_len() < self.kem.kernel_max
+        return self.kem.has_credit(event.subject_id)
+
+    async def publish(self, event: Event) -> None:
+        async with self._lock:
+            await self._not_full.wait_for(lambda: self._has_room(event))
+            self.kem.publish(event)
+            self._not_empty.notify_all()
+
+    # ----------------------------------------------------------------------
+    # CONSUME
+    # ----------------------------------------------------------------------
+    async def _take(self, ready, pop) -> Event:
+        async with self._lock:
+            await self._not_empty.wait_for(ready)
+            ev = pop()
+            self._not_full.notify_all()
+            return ev
+
+    async def next_event(self) -> Event:
+        """Next event, kernel channel first."""
+        return await self._take(lambda: not self.kem.empty(), self.kem.next_event)
+
+    async def next_kernel_event(self) -> Event:
+        return await self._take(lambda: self.kem.kernel_len() > 0, self.kem.next_kernel_event)
+
+    async def next_subject_event(self) -> Event:
+        return await self._take(lambda: self.kem.subject_total_len() > 0, self.kem.next_subject_event)
+
+    async def next_for(self, subject_id: str) -> Event:
+        """Next subject-channel event addressed to subject_id."""
+        return await self._take(lambda: self.kem.subject_len(subject_id) > 0,
+                                lambda: self.kem.fetch_for(subject_id, 1)[0])
+
+    # ----------------------------------------------------------------------
+    # ITERATION
+    # ----------------------------------------------------------------------
+    async def events(self, *, channel: Optional[EventChannel] = None,
+                     subject_id: Optional[str] = None) -> AsyncIterator[Event]:
+        """
+        Endless async iterator: a subject's events if subject_id is given,
+        one channel if channel is given, otherwise next_event() order.
+        """
+        while True:
+            if subject_id is not None:
+                yield await self.next_for(subject_id)
+            elif channel == EventChannel.KERNEL:
+                yield await self.next_kernel_event()
+            elif channel == EventChannel.SUBJECT:
+                yield await self.next_subject_event()
+            else:
+                yield await self.next_event()
+
+    def __aiter__(self) -> AsyncIterator[Event]:
+        return self.events()
@@ -5,9 +5,454 @@ Dual-Queue Event Manager with kernel-first priority + quotas + backpressure.
 """
 
 from __future__ import annotations
+import heapq
+import threading
 from collections import deque
-from typing import Optional, Dict, List, Callable, Deque, Tuple
-from spx_types.event import Event, EventChannel
+from itertools import islice
+from dataclasses import replace
+from typing import Any, Optional, Dict, List, Callable, Deque, Iterator, Sequence, Tuple
+from spx_types.event import Event, EventChannel, EventType
+from kernel.kem_journal import KEMJournal
+from kernel.kem_ring import EventRing
+from utils.metrics import REGISTRY, Family, Histogram
+from utils.time_utils import get_T0
+
+
+# Event fields with a secondary index in every channel queue.
+_INDEX_FIELDS: Tuple[str, ...] = ("subject_id", "type", "origin")
+
+_QUEUE_DELAY = REGISTRY.histogram("spx_kem_queue_delay_seconds",
+                                  "Time from event creation (ts_T0) to dequeue", ("channel",))
+_DELAY_KERNEL = _QUEUE_DELAY.labels("kernel")
+_DELAY_SUBJECT = _QUEUE_DELAY.labels("subject")
+
+
+def _observe_delay(h: Histogram, events: Sequence[Event]) -> None:
+    if events:
+        now = get_T0()
+        h.observe_many([now - ev.ts_T0 for ev in events])
+
+
+class _Slot:
+    """Queue cell shared by the channel FIFO and its indexes."""
+    __slots__ = ("event", "seq", "alive", "jseq")
+
+    def __init__(self, event: Event, seq: int, jseq: int = 0):
+        self.event = event
+        self.seq = seq
+        self.alive = True
+        self.jseq = jseq          # seq запису в журналі (0 — без журналу)
+
+
+class _EventQueue:
+    """
+    Channel FIFO with secondary indexes on subject_id / type / origin.
+      - `_fifo` keeps global FIFO order of the channel
+      - `_index[field][key]` keeps the same cells in FIFO order per key
+      - optional salience heaps: `_low` (salience, seq) for lowest-salience
+        eviction and `_high` (-salience, seq) for salience-ordered consumption;
+        `seq` keeps FIFO order among equal salience
+      - removal only marks a cell dead; dead cells are skipped at the heads
+        and compacted once they outnumber live ones
+    Exposes the deque subset KEM relies on (len/bool/iter/append/popleft/clear).
+    """
+
+    def __init__(self, fields: Tuple[str, ...] = _INDEX_FIELDS):
+        self._fields = fields
+        self._fifo: Deque[_Slot] = deque()
+        self._index: Dict[str, Dict[Any, Deque[_Slot]]] = {f: {} for f in fields}
+        self._counts: Dict[str, Dict[Any, int]] = {f: {} for f in fields}
+        self._low: Optional[List[Tuple[float, int, _Slot]]] = None
+        self._high: Optional[List[Tuple[float, int, _Slot]]] = None
+        self._seq: int = 0
+        self._len: int = 0
+        self._garbage: int = 0
+        # called as fn(subject_id, depth) whenever a subject's depth changes
+        self.depth_listeners: List[Callable[[Optional[str], int], None]] = []
+        # optional write-ahead journal: on_append / on_remove for every queued event
+        self.journal: Optional[KEMJournal] = None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def __iter__(self) -> Iterator[Event]:
+        return (s.event for s in self._fifo if s.alive)
+
+    # ---- internals ----
+    @staticmethod
+    def _purge(dq: Deque[_Slot]) -> None:
+        while dq and not dq[0].alive:
+            dq.popleft()
+
+    def _kill(self, slot: _Slot) -> Event:
+        ev = self._unlink(slot)
+        if self.depth_listeners:
+            self._notify_depth(ev.subject_id)
+        return ev
+
+    def _unlink(self, slot: _Slot) -> Event:
+        slot.alive = False
+        self._len -= 1
+        self._garbage += 1
+        ev = slot.event
+        if self.journal is not None:
+            self.journal.on_remove(slot.jseq)
+        for f in self._fields:
+            key = getattr(ev, f)
+            buckets, counts = self._index[f], self._counts[f]
+            self._purge(buckets[key])
+            left = counts[key] - 1
+            if left:
+                counts[key] = left
+            else:
+                del counts[key]
+                del buckets[key]
+        return ev
+
+    def _notify_depth(self, subject_id: Optional[str]) -> None:
+        depth = self._counts["subject_id"].get(subject_id, 0)
+        for fn in self.depth_listeners:
+            fn(subject_id, depth)
+
+    def _maybe_compact(self) -> None:
+        if self._garbage <= 2 * self._len + 64:
+            return
+        self._fifo = deque(s for s in self._fifo if s.alive)
+        for buckets in self._index.values():
+            for key, dq in buckets.items():
+                buckets[key] = deque(s for s in dq if s.alive)
+        self._rebuild_heaps()
+        self._garbage = 0
+
+    def _rebuild_heaps(self) -> None:
+        live = [s for s in self._fifo if s.alive]
+        if self._low is not None:
+            self._low = [(s.event.salience, s.seq, s) for s in live]
+            heapq.heapify(self._low)
+        if self._high is not None:
+            self._high = [(-s.event.salience, s.seq, s) for s in live]
+            heapq.heapify(self._high)
+
+    @staticmethod
+    def _heap_head(heap: List[Tuple[float, int, _Slot]]) -> Optional[_Slot]:
+        while heap and not heap[0][2].alive:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    # ---- deque-compatible API ----
+    def append(self, ev: Event) -> None:
+        self._link(ev)
+        if self.depth_listeners:
+            self._notify_depth(ev.subject_id)
+
+    def _link(self, ev: Event) -> _Slot:
+        jseq = self.journal.on_append(ev) if self.journal is not None else 0
+        slot = _Slot(ev, self._seq, jseq)
+        self._seq += 1
+        self._fifo.append(slot)
+        if self._low is not None:
+            heapq.heappush(self._low, (ev.salience, slot.seq, slot))
+        if self._high is not None:
+            heapq.heappush(self._high, (-ev.salience, slot.seq, slot))
+        for f in self._fields:
+            key = getattr(ev, f)
+            dq = self._index[f].get(key)
+            if dq is None:
+                dq = self._index[f][key] = deque()
+            dq.append(slot)
+            counts = self._counts[f]
+            counts[key] = counts.get(key, 0) + 1
+        self._len += 1
+        return slot
+
+    def popleft(self) -> Event:
+        self._purge(self._fifo)
+        if not self._fifo:
+            raise IndexError("pop from an empty queue")
+        ev = self._kill(self._fifo.popleft())
+        # FIFO-споживання лишає мертві записи в купах солієнтності — їх теж треба стискати
+        self._maybe_compact()
+        return ev
+
+    def peek(self) -> Optional[Event]:
+        self._purge(self._fifo)
+        return self._fifo[0].event if self._fifo else None
+
+    def clear(self) -> None:
+        emptied = list(self._counts["subject_id"]) if self.depth_listeners else []
+        self._reset()
+        for sid in emptied:
+            self._notify_depth(sid)
+
+    def _reset(self) -> None:
+        if self.journal is not None:
+            for s in self._fifo:
+                if s.alive:
+                    self.journal.on_remove(s.jseq)
+        self._fifo.clear()
+        for f in self._fields:
+            self._index[f].clear()
+            self._counts[f].clear()
+        if self._low is not None:
+            self._low = []
+        if self._high is not None:
+            self._high = []
+        self._len = 0
+        self._garbage = 0
+
+    # ---- salience ordering ----
+    def track_salience(self, *, lowest: bool, highest: bool) -> None:
+        """Enable/disable the salience heaps (built from the live FIFO when switched on)."""
+        self._low = (self._low if self._low is not None else []) if lowest else None
+        self._high = (self._high if self._high is not None else []) if highest else None
+        self._rebuild_heaps()
+
+    def lowest_salience(self) -> Optional[float]:
+        slot = self._heap_head(self._low)
+        return slot.event.salience if slot else None
+
+    def pop_lowest(self) -> Event:
+        """Remove the lowest-salience event (oldest among equals)."""
+        slot = self._heap_head(self._low)
+        if slot is None:
+            raise IndexError("pop from an empty queue")
+        heapq.heappop(self._low)
+        ev = self._kill(slot)
+        self._maybe_compact()
+        return ev
+
+    def pop_highest(self) -> Event:
+        """Remove the highest-salience event (oldest among equals)."""
+        slot = self._heap_head(self._high)
+        if slot is None:
+            raise IndexError("pop from an empty queue")
+        heapq.heappop(self._high)
+        ev = self._kill(slot)
+        self._maybe_compact()
+        return ev
+
+    # ---- indexed access ----
+    def index_len(self, field: str, key: Any) -> int:
+        return self._counts[field].get(key, 0)
+
+    def subject_len(self, subject_id: Optional[str]) -> int:
+        return self._counts["subject_id"].get(subject_id, 0)
+
+    def take(self, match: Dict[str, Any], limit: Optional[int] = None) -> List[Event]:
+        """
+        Remove up to `limit` events whose indexed fields equal `match`, in FIFO order.
+        Walks only the smallest matching index bucket.
+        """
+        if not match:
+            res: List[Event] = []
+            while self._len and (limit is None or len(res) < limit):
+                res.append(self.popleft())
+            return res
+        field = min(match, key=lambda f: self._counts[f].get(match[f], 0))
+        dq = self._index[field].get(match[field])
+        if not dq:
+            return []
+        rest = [(f, k) for f, k in match.items() if f != field]
+        if not rest:
+            # head of a bucket is always alive
+            res = []
+            while dq and (limit is None or len(res) < limit):
+                res.append(self._kill(dq[0]))
+        else:
+            hits: List[_Slot] = []
+            for slot in dq:
+                if limit is not None and len(hits) >= limit:
+                    break
+                if slot.alive and all(getattr(slot.event, f) == k for f, k in rest):
+                    hits.append(slot)
+            res = [self._kill(slot) for slot in hits]
+        self._maybe_compact()
+        return res
+
+    def remove_if(self, predicate: Callable[[Event], bool], limit: Optional[int] = None) -> List[Event]:
+        res: List[Event] = []
+        for slot in list(self._fifo):
+            if limit is not None and len(res) >= limit:
+                break
+            if slot.alive and predicate(slot.event):
+                res.append(self._kill(slot))
+        self._maybe_compact()
+        return res
+
+
+class _Stripe:
+    """Per-subject state of the subject channel for the subjects hashed to one lock."""
+    __slots__ = ("lock", "buckets", "counts", "touched", "untidy")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets: Dict[Any, Deque[_Slot]] = {}
+        self.counts: Dict[Any, int] = {}
+        self.touched: set = set()   # глибина змінилась — слухачі викликаються в settle()
+        self.untidy: set = set()    # кошики з мертвими комірками посередині
+
+
+class _Exclusive:
+    """Reusable context manager: every stripe of a _SubjectQueue in order, then its glock."""
+    __slots__ = ("q",)
+
+    def __init__(self, q: "_SubjectQueue"):
+        self.q = q
+
+    def __enter__(self) -> None:
+        for st in self.q._stripes:
+            st.lock.acquire()
+        self.q.glock.acquire()
+
+    def __exit__(self, *exc) -> None:
+        q = self.q
+        q.glock.release()
+        try:
+            for st in q._stripes:
+                q.settle(st)
+        finally:
+            for st in reversed(q._stripes):
+                st.lock.release()
+
+
+class _SubjectQueue(_EventQueue):
+    """
+    Subject channel: an _EventQueue whose subject_id index lives in lock stripes.
+      - `stripe(sid)` guards that subject's bucket and count, so its quota and credits
+      - `glock` guards the channel-global part: FIFO and sequence, the length checked
+        against subject_max, the type/origin indexes and the salience heaps
+      - lock order is stripe → glock; a cell is linked or killed with both held (its
+        stripe first), while scans of one subject's bucket need only that stripe
+      - `exclusive` holds every stripe in order and then glock, for the operations that
+        pick victims from the global part (FIFO/heap heads, type/origin drains, clear)
+    Depth listeners and per-bucket compaction run in settle(), under the stripe but
+    after glock is released.
+    """
+
+    def __init__(self, n_stripes: int = 64):
+        super().__init__(fields=("type", "origin"))
+        self.glock = threading.Lock()
+        self._stripes = [_Stripe() for _ in range(n_stripes)]
+        self._mask = n_stripes - 1
+        self.exclusive = _Exclusive(self)
+
+    def stripe(self, subject_id: Optional[str]) -> _Stripe:
+        return self._stripes[hash(subject_id) & self._mask]
+
+    # ---- per-subject part (stripe held) ----
+    def _kill(self, slot: _Slot) -> Event:
+        ev = self._unlink(slot)
+        sid = ev.subject_id
+        st = self.stripe(sid)
+        left = st.counts[sid] - 1
+        if left:
+            st.counts[sid] = left
+            dq = st.buckets[sid]
+            self._purge(dq)
+            if len(dq) > 2 * left + 16:
+                st.untidy.add(sid)
+        else:
+            del st.counts[sid]
+            del st.buckets[sid]
+        if self.depth_listeners:
+            st.touched.add(sid)
+        return ev
+
+    def append(self, ev: Event) -> None:
+        slot = self._link(ev)
+        sid = ev.subject_id
+        st = self.stripe(sid)
+        dq = st.buckets.get(sid)
+        if dq is None:
+            dq = st.buckets[sid] = deque()
+        dq.append(slot)
+        st.counts[sid] = st.counts.get(sid, 0) + 1
+        if self.depth_listeners:
+            st.touched.add(sid)
+
+    def settle(self, st: _Stripe) -> None:
+        """Compact the stripe's untidy buckets and report depth changes (stripe held, glock not)."""
+        if not (st.untidy or st.touched):
+            return
+        for sid in st.untidy:
+            dq = st.buckets.get(sid)
+            if dq is not None:
+                st.buckets[sid] = deque(s for s in dq if s.alive)
+        st.untidy.clear()
+        if st.touched:
+            for sid in st.touched:
+                depth = st.counts.get(sid, 0)
+                for fn in self.depth_listeners:
+                    fn(sid, depth)
+            st.touched.clear()
+
+    def clear(self) -> None:
+        self._reset()
+        for st in self._stripes:
+            if self.depth_listeners:
+                st.touched.update(st.counts)
+            st.buckets.clear()
+            st.counts.clear()
+            st.untidy.clear()
+
+    def index_len(self, field: str, key: Any) -> int:
+        return self.subject_len(key) if field == "subject_id" else super().index_len(field, key)
+
+    def subject_len(self, subject_id: Optional[str]) -> int:
+        return self.stripe(subject_id).counts.get(subject_id, 0)
+
+    def oldest_of(self, subject_id: Optional[str]) -> Optional[_Slot]:
+        dq = self.stripe(subject_id).buckets.get(subject_id)
+        return dq[0] if dq else None   # голова кошика завжди жива
+
+    def lowest_of(self, subject_id: Optional[str]) -> Optional[_Slot]:
+        """The subject's lowest-salience cell (oldest among equals); scans only its bucket."""
+        dq = self.stripe(subject_id).buckets.get(subject_id)
+        if not dq:
+            return None
+        return min((s for s in dq if s.alive), key=lambda s: (s.event.salience, s.seq))
+
+    def pick_subject(self, subject_id: Optional[str], limit: Optional[int] = None,
+                     by_salience: bool = False, rest: Sequence[Tuple[str, Any]] = ()) -> List[_Slot]:
+        """Up to `limit` of the subject's live cells matching `rest`, in FIFO or salience order."""
+        dq = self.stripe(subject_id).buckets.get(subject_id)
+        if not dq:
+            return []
+        if not rest and not by_salience:
+            hits: List[_Slot] = []
+            for s in dq:
+                if s.alive:
+                    hits.append(s)
+                    if len(hits) == limit:
+                        break
+            return hits
+        live = (s for s in dq if s.alive and all(getattr(s.event, f) == k for f, k in rest))
+        if by_salience:
+            key = lambda s: (-s.event.salience, s.seq)
+            return sorted(live, key=key) if limit is None else heapq.nsmallest(limit, live, key=key)
+        return list(live) if limit is None else list(islice(live, limit))
+
+    def take(self, match: Dict[str, Any], limit: Optional[int] = None) -> List[Event]:
+        if "subject_id" not in match:
+            return super().take(match, limit)
+        rest = [(f, k) for f, k in match.items() if f != "subject_id"]
+        return self.kill_many(self.pick_subject(match["subject_id"], limit, rest=rest))
+
+    # ---- global part (glock held, plus the stripes of the killed cells) ----
+    def head(self, by_salience: bool) -> Optional[_Slot]:
+        """Next cell in consume order, left in place."""
+        if by_salience:
+            return self._heap_head(self._high)
+        self._purge(self._fifo)
+        return self._fifo[0] if self._fifo else None
+
+    def kill_many(self, slots: Sequence[_Slot]) -> List[Event]:
+        res = [self._kill(slot) for slot in slots]
+        self._maybe_compact()
+        return res
 
 
 class KernelEventMesh:
@@ -15,27 +460,70 @@ class KernelEventMesh:
     Dual-queue event manager.
     Guarantees:
       - FIFO per channel
+      - FIFO per subject within the subject channel (indexed, O(1) depth)
+      - index-backed selective drains by type / origin / subject_id / channel
       - kernel-first on consumption
       - configurable capacities and backpressure policy
 
     Backpressure policy:
       - "drop_oldest": if full, drop popleft() before append()
       - "reject": if full, raise RuntimeError
+      - "drop_lowest_salience": if full, drop the lowest-salience event among
+        queued + incoming (oldest first among equal salience)
+
+    Per-subject quotas (subject channel):
+      - subject_quotas[sid] (or default_subject_quota) caps one subject's queued events;
+        overflow applies the same policy inside that subject only
+      - credits(sid) reports remaining capacity so producers can skip building events
+
+    Subject consume order:
+      - "fifo": next_event()/fetch_for() follow publish order
+      - "salience": highest salience first, FIFO among equal salience
+
+    Concurrency:
+      - kernel channel: one lock; subject channel: lock stripes keyed by subject_id plus a
+        short global section (_SubjectQueue). Publishes, fetch_for(), credits and quota
+        checks of different subjects meet only in the global section, which is O(1) per
+        event: sequence, subject_max length, FIFO/type/origin links and eviction heaps
+      - evicting another subject's event when the channel is full, drain_subject(),
+        type/origin drains, drain_for() and configure() hold every stripe (rare paths);
+        next_subject_event() locks only the stripe of the event at the head
+      - no mesh-wide lock: the kernel lock and subject-channel locks are never held together;
+        queue-delay metrics are recorded outside the locks
+      - depth listeners run under the subject's stripe (global section released) and must
+        not call back into KEM
     """
 
+    POLICIES = ("drop_oldest", "reject", "drop_lowest_salience")
+    SUBJECT_ORDERS = ("fifo", "salience")
+
     def __init__(self):
-        self.kernel_queue: Deque[Event] = deque()
-        self.subject_queue: Deque[Event] = deque()
+        self.kernel_queue: _EventQueue = _EventQueue()
+        self.subject_queue: _SubjectQueue = _SubjectQueue()
         # defaults (safe for MVP)
         self.kernel_max: int = 1024
         self.subject_max: int = 4096
-        self.policy: str = "drop_oldest"  # or "reject"
+        self.policy: str = "drop_oldest"  # or "reject" | "drop_lowest_salience"
+        self.subject_order: str = "fifo"  # or "salience"
+        self.default_subject_quota: Optional[int] = None  # None → only subject_max applies
+        self.subject_quotas: Dict[str, int] = {}
 
         # simple counters
         self.dropped_kernel: int = 0
         self.dropped_subject: int = 0
         self.rejected_kernel: int = 0
         self.rejected_subject: int = 0
+        self._subject_dropped: Dict[str, int] = {}
+        self._subject_rejected: Dict[str, int] = {}
+
+        self._kernel_lock = threading.Lock()
+        self.journal: Optional[KEMJournal] = None
+        # shared-memory ingress rings (out-of-process producers → subject channel)
+        self.rings: List[EventRing] = []
+        self.ingress_batch: int = 1024
+        self._ingress_lock = threading.Lock()   # кільця SPSC: один споживач одночасно
+        self.ingress_invalid: int = 0
+        REGISTRY.register_collector("kem", self._collect)
 
     @classmethod
     def init(cls, dual_queue: bool = True) -> "KernelEventMesh":
@@ -45,111 +533,458 @@ class KernelEventMesh:
     # CONFIG
     # ----------------------------------------------------------------------
     def configure(self, *, kernel_max: Optional[int] = None, subject_max: Optional[int] = None,
-                  policy: Optional[str] = None) -> None:
+                  policy: Optional[str] = None, subject_order: Optional[str] = None,
+                  subject_quota: Optional[int] = None) -> None:
         if kernel_max is not None and kernel_max > 0:
             self.kernel_max = kernel_max
         if subject_max is not None and subject_max > 0:
             self.subject_max = subject_max
         if policy is not None:
-            if policy not in ("drop_oldest", "reject"):
+            if policy not in self.POLICIES:
                 raise ValueError("Invalid KEM policy")
             self.policy = policy
+        if subject_order is not None:
+            if subject_order not in self.SUBJECT_ORDERS:
+                raise ValueError("Invalid KEM subject_order")
+            self.subject_order = subject_order
+        if subject_quota is not None and subject_quota > 0:
+            self.default_subject_quota = subject_quota
+        # salience heaps are only maintained when something needs them
+        evict_low = self.policy == "drop_lowest_salience"
+        with self._kernel_lock:
+            self.kernel_queue.track_salience(lowest=evict_low, highest=False)
+        with self.subject_queue.exclusive:
+            self.subject_queue.track_salience(lowest=evict_low, highest=self.subject_order == "salience")
+
+    def set_subject_quota(self, subject_id: str, quota: Optional[int]) -> None:
+        """Set (or clear with None) the per-subject cap of the subject channel."""
+        if quota is not None and quota <= 0:
+            raise ValueError("Invalid KEM subject quota")
+        with self.subject_queue.stripe(subject_id).lock:
+            if quota is None:
+                self.subject_quotas.pop(subject_id, None)
+            else:
+                self.subject_quotas[subject_id] = int(quota)
+
+    def quota_for(self, subject_id: Optional[str]) -> Optional[int]:
+        return self.subject_quotas.get(subject_id, self.default_subject_quota)
+
+    def add_depth_listener(self, fn: Callable[[Optional[str], int], None]) -> None:
+        """fn(subject_id, depth) is called on every subject-channel depth change (e.g. KMS heap mode)."""
+        with self.subject_queue.exclusive:
+            if fn not in self.subject_queue.depth_listeners:
+                self.subject_queue.depth_listeners.append(fn)
+
+    def attach_journal(self, journal: KEMJournal) -> int:
+        """
+        Attach a write-ahead journal and replay its live (unconsumed) events.
+        Must be called before the first publish; returns the number of replayed events.
+        Replayed events go through publish() (capacities/quotas apply) but keep their
+        journal records; events the policy refuses are acknowledged as consumed.
+        """
+        if self.journal is not None:
+            raise RuntimeError("KEM journal already attached")
+        events = journal.recover()
+        self.journal = self.kernel_queue.journal = self.subject_queue.journal = journal
+        replayed = 0
+        for ev in events:
+            try:
+                self.publish(ev)
+                replayed += 1
+            except RuntimeError:
+                pass
+        journal.finish_replay()
+        return replayed
+
+    def open_ingress_ring(self, name: Optional[str] = None, capacity: int = 1 << 20) -> EventRing:
+        """Create a shared-memory ingress ring (overflow follows self.policy) and attach it."""
+        ring = EventRing.create(name, capacity, self.policy)
+        with self._ingress_lock:
+            self.rings.append(ring)
+        return ring
+
+    def drain_ingress(self, limit: Optional[int] = None) -> int:
+        """
+        Move up to `limit` (default ingress_batch) events per ring into the subject channel
+        with publish_many(). Records that do not decode (pickled values included), kernel-channel
+        and out-of-range ones are counted as invalid and skipped: external producers may only
+        feed the subject channel. Under policy "reject" events are published one by one while
+        the tail moves, and the first one KEM refuses stops the ring: it stays queued there,
+        so the producer gets RingFull instead of the event being lost.
+        """
+        n_max = self.ingress_batch if limit is None else limit
+        reject = self.policy == "reject"
+        moved = 0
+        with self._ingress_lock:
+            for ring in self.rings:
+                bad = ring.invalid
+                batch = ring.pop_batch(n_max, self._admit_ingress if reject else None)
+                self.ingress_invalid += ring.invalid - bad
+                if not batch:
+                    continue
+                ok = [ev for ev in batch if self._ingress_ok(ev)]
+                self.ingress_invalid += len(batch) - len(ok)
+                moved += len(ok) if reject else self.publish_many(ok)
+        return moved
+
+    @staticmethod
+    def _ingress_ok(ev: Event) -> bool:
+        return (ev.channel == EventChannel.SUBJECT and ev.subject_id is not None
+                and 0.0 <= ev.salience <= 1.0 and 0.0 <= ev.credibility <= 1.0)
+
+    def _admit_ingress(self, ev: Event) -> bool:
+        """pop_batch() hook under policy "reject": publish ev now, or leave it in the ring."""
+        if not self._ingress_ok(ev):
+            return True   # пропускається; drain_ingress рахує як invalid
+        if not self.has_credit(ev.subject_id):
+            return False
+        try:
+            self._publish_subject(ev)
+        except RuntimeError:   # кредит забрав інший видавець між перевіркою й публікацією
+            return False
+        return True
+
+    def close(self) -> None:
+        """Flush and close the journal, unlink ingress rings."""
+        with self._ingress_lock:
+            for ring in self.rings:
+                ring.close()
+            self.rings = []
+        if self.journal is not None:
+            self.journal.close()
+
+    # ----------------------------------------------------------------------
+    # FLOW CONTROL
+    # ----------------------------------------------------------------------
+    def credits(self, subject_id: str) -> int:
+        """
+        Remaining subject-channel capacity for subject_id before backpressure kicks in
+        (min of its quota headroom and the global subject_max headroom).
+        """
+        q = self.subject_queue
+        with q.stripe(subject_id).lock:
+            quota = self.quota_for(subject_id)
+            used = q.subject_len(subject_id)
+        free = self.subject_max - len(q)   # глобальна довжина — одне читання без замка
+        if quota is not None:
+            free = min(free, quota - used)
+        return max(0, free)
+
+    def has_credit(self, subject_id: str, n: int = 1) -> bool:
+        return self.credits(subject_id) >= n
 
     # ----------------------------------------------------------------------
     # PUBLISH
     # ----------------------------------------------------------------------
-    def _append_with_policy(self, q: Deque[Event], ev: Event, limit: int, counters: Tuple[str, str]) -> None:
+    @staticmethod
+    def _bump(counters: Dict[str, int], subject_id: Optional[str]) -> None:
+        if subject_id is not None:
+            counters[subject_id] = counters.get(subject_id, 0) + 1
+
+    def _quota_verdict(self, ev: Event) -> Tuple[str, Optional[_Slot]]:
+        """
+        Policy inside the subject's quota, decided under its stripe: ("ok", None), ("evict",
+        own cell to drop first), ("drop", None) — the incoming event is dropped — or ("reject", None).
+        """
+        q, sid = self.subject_queue, ev.subject_id
+        quota = self.subject_quotas.get(sid, self.default_subject_quota)
+        if quota is None or q.subject_len(sid) < quota:
+            return "ok", None
+        if self.policy == "reject":
+            return "reject", None
+        if self.policy == "drop_oldest":
+            return "evict", q.oldest_of(sid)
+        victim = q.lowest_of(sid)
+        return ("drop", None) if victim.event.salience > ev.salience else ("evict", victim)
+
+    def _admit_subject(self, ev: Event, verdict: str, victim: Optional[_Slot], evict_global: bool) -> bool:
+        """
+        Queue ev after its quota verdict; the caller holds ev's stripe and glock (or every
+        stripe when evict_global). False → the channel is full and the policy has to evict
+        another subject's event, which needs subject_queue.exclusive.
+        """
+        q, sid = self.subject_queue, ev.subject_id
+        if verdict == "ok" and len(q) < self.subject_max:
+            q.append(ev)
+            return True
+        if verdict == "reject":
+            self.rejected_subject += 1
+            self._bump(self._subject_rejected, sid)
+            raise RuntimeError(f"KEM subject quota exceeded ({sid})")
+        if verdict != "ok":
+            self.dropped_subject += 1
+            self._bump(self._subject_dropped, sid)
+            if verdict == "drop":
+                return True
+            q.kill_many((victim,))
+        if not evict_global and self.policy != "reject" and len(q) >= self.subject_max:
+            return False
+        self._append_with_policy(q, ev, self.subject_max, ("subject", "subject"))
+        return True
+
+    def _publish_subject(self, ev: Event) -> None:
+        q = self.subject_queue
+        st = q.stripe(ev.subject_id)
+        with st.lock:
+            try:
+                verdict, victim = self._quota_verdict(ev)
+                with q.glock:
+                    if self._admit_subject(ev, verdict, victim, False):
+                        return
+            finally:
+                q.settle(st)
+        with q.exclusive:
+            self._admit_subject(ev, *self._quota_verdict(ev), True)
+
+    def _append_with_policy(self, q: _EventQueue, ev: Event, limit: int, counters: Tuple[str, str]) -> None:
         full = len(q) >= limit
         if not full:
             q.append(ev)
             return
         # backpressure
-        if self.policy == "drop_oldest":
-            q.popleft()
-            q.append(ev)
+        if self.policy in ("drop_oldest", "drop_lowest_salience"):
+            if self.policy == "drop_oldest":
+                victim = q.popleft()
+                q.append(ev)
+            elif ev.salience >= q.lowest_salience():
+                victim = q.pop_lowest()
+                q.append(ev)
+            else:
+                victim = ev  # incoming event is the lowest-salience one — drop it
             # bump drop counter
             if counters[0] == "kernel":
                 self.dropped_kernel += 1
             else:
                 self.dropped_subject += 1
+                self._bump(self._subject_dropped, victim.subject_id)
         else:  # reject
             if counters[0] == "kernel":
                 self.rejected_kernel += 1
             else:
                 self.rejected_subject += 1
+                self._bump(self._subject_rejected, ev.subject_id)
             raise RuntimeError(f"KEM queue full ({counters[0]})")
 
     def publish(self, event: Event) -> None:
         """Route by event.channel."""
         if event.channel == EventChannel.KERNEL:
-            self._append_with_policy(self.kernel_queue, event, self.kernel_max, ("kernel", "kernel"))
-        else:
-            self._append_with_policy(self.subject_queue, event, self.subject_max, ("subject", "subject"))
+            with self._kernel_lock:
+                self._append_with_policy(self.kernel_queue, event, self.kernel_max, ("kernel", "kernel"))
+            return
+        self._publish_subject(event)
+
+    def _publish_subject_many(self, events: Sequence[Event]) -> int:
+        """
+        Subject part of publish_many(): a stripe is taken once per run of consecutive events
+        that hash to it, glock once per event. Returns the number of rejected events.
+        """
+        q = self.subject_queue
+        rejected, i, n = 0, 0, len(events)
+        while i < n:
+            st = q.stripe(events[i].subject_id)
+            slow = None
+            with st.lock:
+                try:
+                    while i < n and q.stripe(events[i].subject_id) is st:
+                        ev = events[i]
+                        i += 1
+                        try:
+                            verdict, victim = self._quota_verdict(ev)
+                            with q.glock:
+                                if not self._admit_subject(ev, verdict, victim, False):
+                                    slow = ev
+                                    break
+                        except RuntimeError:
+                            rejected += 1
+                finally:
+                    q.settle(st)
+            if slow is not None:
+                with q.exclusive:
+                    try:
+                        self._admit_subject(slow, *self._quota_verdict(slow), True)
+                    except RuntimeError:
+                        rejected += 1
+        return rejected
 
     def publish_kernel_event(self, event: Event) -> None:
-        object.__setattr__(event, "channel", EventChannel.KERNEL)
+        # подія frozen: копія лише якщо канал інший (раніше — мутація через object.__setattr__)
+        if event.channel is not EventChannel.KERNEL:
+            event = replace(event, channel=EventChannel.KERNEL)
         self.publish(event)
 
     def publish_subject_event(self, event: Event) -> None:
-        object.__setattr__(event, "channel", EventChannel.SUBJECT)
+        if event.channel is not EventChannel.SUBJECT:
+            event = replace(event, channel=EventChannel.SUBJECT)
         self.publish(event)
 
+    def publish_many(self, events: Sequence[Event]) -> int:
+        """
+        Batch publish: salience/credibility ranges are checked for the whole batch up front
+        (nothing is queued if any event is out of range), then the kernel lock is taken once
+        and subject events are appended in order, one stripe section per run of events on
+        the same stripe, with the usual quota/policy handling.
+        Same outcome as publish() in a loop; with policy "reject" the RuntimeError is raised
+        after the rest of that channel's batch is attempted. Returns the number of events
+        published without rejection.
+        """
+        if not events:
+            return 0
+        sal = [ev.salience for ev in events]
+        if min(sal) < 0.0 or max(sal) > 1.0:
+            raise ValueError("Invalid salience")
+        cred = [ev.credibility for ev in events]
+        if min(cred) < 0.0 or max(cred) > 1.0:
+            raise ValueError("Invalid credibility")
+        kernel = [ev for ev in events if ev.channel == EventChannel.KERNEL]
+        subject = [ev for ev in events if ev.channel != EventChannel.KERNEL] if kernel else events
+        rejected = 0
+        if kernel:
+            with self._kernel_lock:
+                for ev in kernel:
+                    try:
+                        self._append_with_policy(self.kernel_queue, ev, self.kernel_max, ("kernel", "kernel"))
+                    except RuntimeError:
+                        rejected += 1
+        if subject:
+            rejected += self._publish_subject_many(subject)
+        if rejected:
+            raise RuntimeError(f"KEM queue full ({rejected} of {len(events)} events rejected)")
+        return len(events)
+
     # ----------------------------------------------------------------------
     # CONSUME
     # ----------------------------------------------------------------------
     def next_event(self) -> Optional[Event]:
-        if self.kernel_queue:
-            return self.kernel_queue.popleft()
-        if self.subject_queue:
-            return self.subject_queue.popleft()
-        return None
+        ev = self.next_kernel_event()
+        return ev if ev is not None else self.next_subject_event()
+
+    def next_kernel_event(self) -> Optional[Event]:
+        with self._kernel_lock:
+            if not self.kernel_queue:
+                return None
+            ev = self.kernel_queue.popleft()
+        _DELAY_KERNEL.observe(get_T0() - ev.ts_T0)
+        return ev
+
+    def next_subject_event(self) -> Optional[Event]:
+        q = self.subject_queue
+        by_salience = self.subject_order == "salience"
+        while True:
+            with q.glock:
+                slot = q.head(by_salience)
+            if slot is None:
+                return None
+            # порядок замків stripe → glock: голову перевіряємо ще раз під обома
+            st = q.stripe(slot.event.subject_id)
+            with st.lock:
+                try:
+                    with q.glock:
+                        if slot.alive:
+                            ev = q.kill_many((slot,))[0]
+                            break
+                finally:
+                    q.settle(st)
+        _DELAY_SUBJECT.observe(get_T0() - ev.ts_T0)
+        return ev
 
     def drain_kernel(self) -> List[Event]:
-        items = list(self.kernel_queue)
-        self.kernel_queue.clear()
+        with self._kernel_lock:
+            items = list(self.kernel_queue)
+            self.kernel_queue.clear()
+        _observe_delay(_DELAY_KERNEL, items)
         return items
 
     def drain_subject(self) -> List[Event]:
-        items = list(self.subject_queue)
-        self.subject_queue.clear()
+        with self.subject_queue.exclusive:
+            items = list(self.subject_queue)
+            self.subject_queue.clear()
+        _observe_delay(_DELAY_SUBJECT, items)
         return items
 
     def drain_all(self) -> Dict[str, List[Event]]:
         return {"kernel": self.drain_kernel(), "subject": self.drain_subject()}
 
     def peek_kernel(self) -> Optional[Event]:
-        return self.kernel_queue[0] if self.kernel_queue else None
+        with self._kernel_lock:
+            return self.kernel_queue.peek()
 
     def peek_subject(self) -> Optional[Event]:
-        return self.subject_queue[0] if self.subject_queue else None
+        with self.subject_queue.glock:
+            return self.subject_queue.peek()
 
-    def drain_for(self, predicate: Callable[[Event], bool], limit: Optional[int] = None) -> List[Event]:
+    def fetch_for(self, subject_id: str, limit: Optional[int] = None) -> List[Event]:
         """
-        Selectively drain events that match predicate, preserving order of the rest.
+        Pop up to `limit` queued subject-channel events addressed to subject_id,
+        in subject_order (FIFO or salience). Other subjects' events are not touched.
         """
+        res = self._take_subject(subject_id, limit, self.subject_order == "salience")
+        _observe_delay(_DELAY_SUBJECT, res)
+        return res
+
+    def _take_subject(self, subject_id: Optional[str], limit: Optional[int], by_salience: bool = False,
+                      rest: Sequence[Tuple[str, Any]] = ()) -> List[Event]:
+        """Stripe path: pick the subject's cells under its stripe, unlink them in one global section."""
+        q = self.subject_queue
+        st = q.stripe(subject_id)
+        with st.lock:
+            try:
+                hits = q.pick_subject(subject_id, limit, by_salience, rest)
+                if not hits:
+                    return []
+                with q.glock:
+                    return q.kill_many(hits)
+            finally:
+                q.settle(st)
+
+    def drain_by(self, *, type: Optional[EventType] = None, origin: Optional[str] = None,
+                 subject_id: Optional[str] = None, channel: Optional[EventChannel] = None,
+                 limit: Optional[int] = None) -> List[Event]:
+        """
+        Index-backed drain: remove events matching every given key, kernel channel first,
+        FIFO within a channel. Cost is proportional to the smallest matching index bucket.
+        """
+        match: Dict[str, Any] = {}
+        if type is not None:
+            match["type"] = type
+        if origin is not None:
+            match["origin"] = origin
+        if subject_id is not None:
+            match["subject_id"] = subject_id
         res: List[Event] = []
-        buf_kernel: Deque[Event] = deque()
-        buf_subject: Deque[Event] = deque()
-
-        # kernel
-        while self.kernel_queue:
-            e = self.kernel_queue.popleft()
-            if predicate(e) and (limit is None or len(res) < limit):
-                res.append(e)
+        for q, lock, h in self._channels(channel):
+            if limit is not None and len(res) >= limit:
+                break
+            n = None if limit is None else limit - len(res)
+            if q is self.subject_queue and subject_id is not None:
+                got = self._take_subject(subject_id, n, rest=[(f, k) for f, k in match.items() if f != "subject_id"])
             else:
-                buf_kernel.append(e)
+                with lock:
+                    got = q.take(match, n)
+            _observe_delay(h, got)
+            res += got
+        return res
 
-        # subject
-        while self.subject_queue:
-            e = self.subject_queue.popleft()
-            if predicate(e) and (limit is None or len(res) < limit):
-                res.append(e)
-            else:
-                buf_subject.append(e)
+    def _channels(self, channel: Optional[EventChannel]) -> List[Tuple[_EventQueue, Any, Histogram]]:
+        """(queue, whole-channel lock, queue-delay histogram) for channel (both, kernel first, if None)."""
+        res: List[Tuple[_EventQueue, Any, Histogram]] = []
+        if channel in (None, EventChannel.KERNEL):
+            res.append((self.kernel_queue, self._kernel_lock, _DELAY_KERNEL))
+        if channel in (None, EventChannel.SUBJECT):
+            res.append((self.subject_queue, self.subject_queue.exclusive, _DELAY_SUBJECT))
+        return res
 
-        # restore
-        self.kernel_queue.extendleft(reversed(buf_kernel))
-        self.subject_queue.extendleft(reversed(buf_subject))
+    def drain_for(self, predicate: Callable[[Event], bool], limit: Optional[int] = None) -> List[Event]:
+        """
+        Selectively drain events that match predicate, preserving order of the rest.
+        """
+        res: List[Event] = []
+        for q, lock, h in self._channels(None):
+            if limit is not None and len(res) >= limit:
+                break
+            with lock:
+                got = q.remove_if(predicate, None if limit is None else limit - len(res))
+            _observe_delay(h, got)
+            res += got
         return res
 
     # ----------------------------------------------------------------------
@@ -161,25 +996,79 @@ class KernelEventMesh:
     def empty(self) -> bool:
         return not self.kernel_queue and not self.subject_queue
 
-    def metrics(self) -> Dict[str, int]:
+    def subject_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-subject queue depth, quota and drop/reject counters."""
+        with self.subject_queue.glock:
+            dropped, rejected = dict(self._subject_dropped), dict(self._subject_rejected)
+        sids = set(self.subject_quotas) | set(dropped) | set(rejected)
         return {
-            "kernel_len": len(self.kernel_queue),
-            "subject_len": len(self.subject_queue),
-            "kernel_max": self.kernel_max,
-            "subject_max": self.subject_max,
-            "dropped_kernel": self.dropped_kernel,
-            "dropped_subject": self.dropped_subject,
-            "rejected_kernel": self.rejected_kernel,
-            "rejected_subject": self.rejected_subject,
+            sid: {
+                "len": self.subject_queue.subject_len(sid),
+                "quota": self.quota_for(sid),
+                "dropped": dropped.get(sid, 0),
+                "rejected": rejected.get(sid, 0),
+            }
+            for sid in sorted(sids)
         }
 
+    def metrics(self) -> Dict[str, Any]:
+        with self._kernel_lock:
+            m: Dict[str, Any] = {
+                "kernel_len": len(self.kernel_queue),
+                "kernel_max": self.kernel_max,
+                "dropped_kernel": self.dropped_kernel,
+                "rejected_kernel": self.rejected_kernel,
+            }
+        with self.subject_queue.glock:
+            m.update({
+                "subject_len": len(self.subject_queue),
+                "subject_max": self.subject_max,
+                "dropped_subject": self.dropped_subject,
+                "rejected_subject": self.rejected_subject,
+            })
+        m["subjects"] = self.subject_metrics()
+        if self.journal is not None:
+            m["journal"] = self.journal.metrics()
+        if self.rings:
+            with self._ingress_lock:
+                m["ingress"] = [r.metrics() for r in self.rings]
+            m["ingress_invalid"] = self.ingress_invalid
+        return m
+
+    def _collect(self) -> List[Family]:
+        """Registry collector: queue depths and drop/reject counters, read at scrape time."""
+        ch = ({"channel": "kernel"}, {"channel": "subject"})
+        fams: List[Family] = [
+            ("spx_kem_queue_depth", "gauge", "Queued events per channel",
+             [(ch[0], len(self.kernel_queue)), (ch[1], len(self.subject_queue))]),
+            ("spx_kem_dropped_total", "counter", "Events dropped by the backpressure policy",
+             [(ch[0], self.dropped_kernel), (ch[1], self.dropped_subject)]),
+            ("spx_kem_rejected_total", "counter", "Events rejected by the backpressure policy",
+             [(ch[0], self.rejected_kernel), (ch[1], self.rejected_subject)]),
+        ]
+        if self.journal is not None:
+            j = self.journal.metrics()
+            fams.append(("spx_kem_journal_records_total", "counter", "KEM journal PUBLISH records",
+                         [({}, j["records"])]))
+            fams.append(("spx_kem_journal_fsyncs_total", "counter", "KEM journal fsync calls",
+                         [({}, j["fsyncs"])]))
+        if self.rings:
+            with self._ingress_lock:
+                rings = [r.metrics() for r in self.rings]
+            fams.append(("spx_kem_ingress_depth", "gauge", "Events waiting in an ingress ring",
+                         [({"ring": r["name"]}, r["depth"]) for r in rings]))
+            fams.append(("spx_kem_ingress_dropped_total", "counter", "Events dropped by a full ingress ring",
+                         [({"ring": r["name"]}, r["dropped"]) for r in rings]))
+        return fams
+
     def debug_snapshot(self) -> Dict[str, List[str]]:
-        return {
-            "kernel_queue": [ev.id for ev in self.kernel_queue],
-            "subject_queue": [ev.id for ev in self.subject_queue],
-        }
+        with self._kernel_lock:
+            kq = [ev.id for ev in self.kernel_queue]
+        with self.subject_queue.glock:
+            sq = [ev.id for ev in self.subject_queue]
+        return {"kernel_queue": kq, "subject_queue": sq}
 
-    # ---- subject/kernel lengths for KMS ----
+    # ---- subject/kernel lengths for KMS (lock-free single reads) ----
     def kernel_len(self) -> int:
         return len(self.kernel_queue)
 
@@ -187,5 +1076,5 @@ class KernelEventMesh:
         return len(self.subject_queue)
 
     def subject_len(self, subject_id: str) -> int:
-        return sum(1 for e in self.subject_queue if getattr(e, "subject_id", None) == subject_id)
+        return self.subject_queue.subject_len(subject_id)
 
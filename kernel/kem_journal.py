@@ -0,0 +1,314 @@
+# kernel/kem_journal.py
+"""
+KEM Journal — SPX-OS v0.2
+Optional write-ahead journal for KernelEventMesh: every queued event is appended to
+segmented append-only files, consumption is recorded as batched ACKs, and the live
+queues are rebuilt from the segments at boot.
+
+Frame: "<IIBQ" = body length, crc32(kind + seq + body), kind, seq, then body
+  PUBLISH  seq = journal sequence number, body = spx_types.codec record
+  ACK      seq = 0, body = uint64[] of consumed sequence numbers
+A torn or corrupt frame ends the segment (everything after it is ignored).
+"""
+
+from __future__ import annotations
+import os
+import re
+import struct
+import threading
+import zlib
+from array import array
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from spx_types import codec
+from spx_types.event import Event
+from utils.diagnostics import log_info, log_warn
+from utils.time_utils import get_T0
+
+_FRAME = struct.Struct("<IIBQ")
+PUBLISH, ACK = 1, 2
+_SEG_RE = re.compile(r"^kem-(\d{8})\.wal$")
+
+
+# журнал пише і читає лише ядро — довірені байти, payload будь-якого типу
+def encode_event(ev: Event) -> bytes:
+    return codec.encode(ev, allow_pickle=True)
+
+
+def decode_event(body) -> Event:
+    return codec.decode(body, allow_pickle=True)
+
+
+@dataclass
+class _JournalCfg:
+    directory: str
+    fsync_interval_s: float = 0.05   # group commit: fsync не частіше, ніж раз на інтервал…
+    fsync_batch: int = 256           # …або щойно стільки записів чекають на fsync
+    segment_bytes: int = 8 << 20     # ротація сегмента після цього розміру
+    max_segments: int = 8            # понад це живі події найстарішого сегмента переносяться
+    ack_batch: int = 256             # ACK-и накопичуються і пишуться одним кадром
+
+
+class KEMJournal:
+    """
+    Segmented WAL with group commit.
+      - on_append/on_remove are called by the KEM channel queues (under a channel lock);
+        on_append returns the record's seq, which the queue slot keeps and passes back to
+        on_remove — the same Event object may be queued more than once
+      - the journal has its own lock, so both channels may write concurrently
+      - writes go through a buffered file; flush + fsync happen once fsync_batch records
+        are pending or fsync_interval_s has passed (checked on append and in sync())
+      - live events are tracked per segment; a prefix of segments whose events were all
+        consumed is deleted. If more than max_segments remain, live events of the oldest
+        one are re-appended (same seq) so it can go too
+      - recover() returns live events in original publish order (sorted by seq)
+    """
+
+    def __init__(self, cfg: _JournalCfg):
+        if cfg.fsync_batch <= 0 or cfg.segment_bytes <= 0 or cfg.max_segments < 2:
+            raise ValueError("Invalid KEM journal config")
+        self.cfg = cfg
+        self._lock = threading.Lock()
+        self._seq = 1
+        self._live: Dict[int, Tuple[int, Event]] = {}        # seq → (segment, event)
+        self._seg_live: Dict[int, int] = {}                   # сегмент → к-ть живих подій
+        self._adopted: Dict[int, Tuple[int, int]] = {}        # id(event) → (seq, segment) з replay
+        self._acks = array("Q")
+        self._segno = 0
+        self._f: Optional[BinaryIO] = None
+        self._size = 0
+        self._unsynced = 0
+        self._last_sync = get_T0()
+        self._stats: Dict[str, float] = {
+            "records": 0, "acks": 0, "bytes": 0, "fsyncs": 0,
+            "append_s": 0.0, "sync_s": 0.0, "segments_deleted": 0, "relocated": 0,
+            "replayed": 0,
+        }
+
+    @classmethod
+    def from_config(cls, kem_cfg: Dict[str, Any]) -> "KEMJournal":
+        c = kem_cfg or {}
+        cfg = _JournalCfg(
+            directory=str(c["journal_dir"]),
+            fsync_interval_s=float(c.get("journal_fsync_interval_ms", 50)) / 1000.0,
+            fsync_batch=int(c.get("journal_fsync_batch", 256)),
+            segment_bytes=int(c.get("journal_segment_kb", 8192)) * 1024,
+            max_segments=int(c.get("journal_max_segments", 8)),
+        )
+        return cls(cfg)
+
+    # ----------------- Segments -----------------
+
+    def _segments(self) -> List[int]:
+        if not os.path.isdir(self.cfg.directory):
+            return []
+        return sorted(int(m.group(1)) for m in map(_SEG_RE.match, os.listdir(self.cfg.directory)) if m)
+
+    def _path(self, segno: int) -> str:
+        return os.path.join(self.cfg.directory, f"kem-{segno:08d}.wal")
+
+    def _open_next(self) -> None:
+        if self._f is not None:
+            self._sync_locked()
+            self._f.close()
+        self._segno += 1
+        self._f = open(self._path(self._segno), "ab", buffering=1 << 16)
+        self._size = 0
+        self._seg_live.setdefault(self._segno, 0)
+
+    @staticmethod
+    def _frames(path: str) -> Iterator[Tuple[int, int, memoryview]]:
+        with open(path, "rb") as f:
+            data = memoryview(f.read())
+        pos, n = 0, len(data)
+        while pos + _FRAME.size <= n:
+            ln, crc, kind, seq = _FRAME.unpack_from(data, pos)
+            end = pos + _FRAME.size + ln
+            if end > n:
+                break
+            body = data[pos + _FRAME.size:end]
+            if zlib.crc32(body, zlib.crc32(data[pos + 8:pos + _FRAME.size])) != crc:
+                break
+            yield kind, seq, body
+            pos = end
+        if pos != n:
+            log_warn("KEM journal: torn tail in %s at byte %d", os.path.basename(path), pos, sub="kem")
+
+    # ----------------- Recovery -----------------
+
+    def recover(self) -> List[Event]:
+        """
+        Read all segments, register live events for adoption and start a fresh segment.
+        Returns live events in publish order; KEM re-queues them without re-journaling.
+        """
+        os.makedirs(self.cfg.directory, exist_ok=True)
+        records: Dict[int, Tuple[int, memoryview]] = {}
+        acked = set()
+        segs = self._segments()
+        for segno in segs:
+            for kind, seq, body in self._frames(self._path(segno)):
+                if kind == PUBLISH:
+                    records[seq] = (segno, body)
+                    self._seq = max(self._seq, seq + 1)
+                elif kind == ACK:
+                    acked.update(array("Q", bytes(body)))
+        events: List[Event] = []
+        with self._lock:
+            for seq in sorted(records):
+                if seq in acked:
+                    continue
+                segno, body = records[seq]
+                ev = decode_event(body)
+                self._adopted[id(ev)] = (seq, segno)
+                events.append(ev)
+            self._segno = segs[-1] if segs else 0
+            for segno in segs:
+                self._seg_live[segno] = 0
+            self._open_next()
+        self._stats["replayed"] = len(events)
+        log_info("KEM journal: recovered %d live events from %d segments", len(events), len(segs), sub="kem")
+        return events
+
+    def finish_replay(self) -> None:
+        """Acknowledge recovered events that KEM did not re-queue (policy drop / reject)."""
+        with self._lock:
+            for seq, _ in self._adopted.values():
+                self._acks.append(seq)
+            self._adopted.clear()
+            self._flush_acks()
+            self._sync_locked()
+            self._compact()
+
+    # ----------------- Write path -----------------
+
+    def _write(self, kind: int, seq: int, body: bytes) -> None:
+        head = struct.pack("<BQ", kind, seq)
+        crc = zlib.crc32(body, zlib.crc32(head))
+        self._f.write(struct.pack("<II", len(body), crc) + head)
+        self._f.write(body)
+        n = _FRAME.size + len(body)
+        self._size += n
+        self._stats["bytes"] += n
+        self._unsynced += 1
+
+    def on_append(self, ev: Event) -> int:
+        t0 = perf_counter()
+        with self._lock:
+            adopted = self._adopted.pop(id(ev), None)
+            if adopted is not None:
+                seq, segno = adopted          # уже в журналі (replay) — не дублюємо запис
+            else:
+                if self._f is None:
+                    os.makedirs(self.cfg.directory, exist_ok=True)
+                    self._segno = max(self._segments() or [0])
+                    self._open_next()
+                seq, segno = self._seq, self._segno
+                self._seq += 1
+                self._write(PUBLISH, seq, encode_event(ev))
+                self._stats["records"] += 1
+            self._live[seq] = (segno, ev)
+            self._seg_live[segno] = self._seg_live.get(segno, 0) + 1
+            self._maybe_commit()
+        self._stats["append_s"] += perf_counter() - t0
+        return seq
+
+    def on_remove(self, seq: int) -> None:
+        t0 = perf_counter()
+        with self._lock:
+            rec = self._live.pop(seq, None)
+            if rec is not None:
+                segno = rec[0]
+                self._seg_live[segno] -= 1
+                self._acks.append(seq)
+                if len(self._acks) >= self.cfg.ack_batch:
+                    self._flush_acks()
+                    self._maybe_commit()
+        self._stats["append_s"] += perf_counter() - t0
+
+    def _flush_acks(self) -> None:
+        if self._acks and self._f is not None:
+            self._write(ACK, 0, self._acks.tobytes())
+            self._stats["acks"] += len(self._acks)
+            self._acks = array("Q")
+
+    def _maybe_commit(self) -> None:
+        if self._unsynced >= self.cfg.fsync_batch or get_T0() - self._last_sync >= self.cfg.fsync_interval_s:
+            self._flush_acks()
+            self._sync_locked()
+            if self._size >= self.cfg.segment_bytes:
+                self._open_next()
+            self._compact()
+
+    def _sync_locked(self) -> None:
+        if self._f is None or not self._unsynced:
+            self._last_sync = get_T0()
+            return
+        t0 = perf_counter()
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._stats["sync_s"] += perf_counter() - t0
+        self._stats["fsyncs"] += 1
+        self._unsynced = 0
+        self._last_sync = get_T0()
+
+    def sync(self, force: bool = False) -> None:
+        """Group-commit point for idle periods (runtime calls it every tick)."""
+        with self._lock:
+            if force:
+                self._flush_acks()
+                self._sync_locked()
+                self._compact()
+            elif self._unsynced or self._acks:
+                self._maybe_commit()
+
+    # ----------------- Compaction -----------------
+
+    def _compact(self) -> None:
+        segs = [s for s in sorted(self._seg_live) if s != self._segno]
+        if len(segs) + 1 > self.cfg.max_segments and segs and self._seg_live[segs[0]]:
+            self._relocate(segs[0])
+        for s in segs:
+            if self._seg_live[s]:
+                break
+            try:
+                os.remove(self._path(s))
+            except FileNotFoundError:
+                pass
+            del self._seg_live[s]
+            self._stats["segments_deleted"] += 1
+
+    def _relocate(self, segno: int) -> None:
+        """Re-append live events of an old segment (same seq) into the active one."""
+        moved = 0
+        for seq, (s, ev) in list(self._live.items()):
+            if s != segno:
+                continue
+            self._write(PUBLISH, seq, encode_event(ev))
+            self._live[seq] = (self._segno, ev)
+            moved += 1
+        self._seg_live[segno] -= moved
+        self._seg_live[self._segno] += moved
+        self._stats["relocated"] += moved
+        self._sync_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_acks()
+            self._sync_locked()
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+    # ----------------- Diagnostics -----------------
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            m: Dict[str, Any] = dict(self._stats)
+            m["live"] = len(self._live)
+            m["segments"] = len(self._seg_live)
+            m["active_segment_bytes"] = self._size
+            m["unsynced"] = self._unsynced
+        n = m["records"] + m["acks"]
+        m["overhead_us_per_record"] = 1e6 * (m["append_s"] + m["sync_s"]) / n if n else 0.0
+        return m
@@ -0,0 +1,221 @@
+# kernel/kem_ring.py
+"""
+KEM Ingress Ring — SPX-OS v0.2
+Single-producer / single-consumer ring buffer in shared memory through which an
+out-of-process perception source feeds the KEM subject channel.
+
+Layout (multiprocessing.shared_memory, positions are monotonically growing byte counters):
+  [0,   64)  "<8sIIQ"   magic, version, policy code, data capacity (power of two)
+  [64, 128)  "<QQQQ"    producer line: head, records written, dropped, rejected
+  [128,192)  "<QQ"      consumer line: tail, records read
+  [192, …)   data: records "<II" (length, 0) + spx_types.codec Event, padded to 8 bytes;
+             length 0xFFFFFFFF marks the unused end of the buffer before a wrap
+The producer only writes its line and the data, the consumer only its line; head/tail are
+stored after the record bytes as aligned 8-byte writes, which become visible in program
+order on x86-64 (TSO), so the processes share no lock.
+"""
+
+from __future__ import annotations
+import struct
+from dataclasses import dataclass
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from spx_types import codec
+from spx_types.event import Event
+from utils.time_utils import get_T0
+
+MAGIC = b"SPXRING\x00"
+VERSION = 1
+POLICIES = ("drop_oldest", "reject", "drop_lowest_salience")
+
+_META = struct.Struct("<8sIIQ")
+_PROD = struct.Struct("<QQQQ")
+_CONS = struct.Struct("<QQ")
+_REC = struct.Struct("<II")
+_U64 = struct.Struct("<Q")
+_PROD_OFF, _CONS_OFF, _DATA_OFF = 64, 128, 192
+_WRAP = 0xFFFFFFFF
+
+
+class RingFull(RuntimeError):
+    """Raised to the producer when the ring is full and the KEM policy is "reject"."""
+
+
+@dataclass
+class RingStats:
+    written: int
+    read: int
+    dropped: int
+    rejected: int
+    used_bytes: int
+    capacity: int
+
+
+class EventRing:
+    """
+    SPSC shared-memory ring of encoded Events.
+      - kernel side: EventRing.create(name, capacity, policy) → owner, consumer (pop_batch)
+      - producer side: EventRing.attach(name) → push / push_many
+      - overflow follows the KEM policy written into the header by the kernel:
+          "reject"         push raises RingFull (backpressure reaches the producer: the
+                           kernel leaves records KEM would refuse in the ring)
+          "drop_oldest" /
+          "drop_lowest_salience"  the incoming event is dropped and counted — only the
+                           consumer may move the tail, so the producer cannot evict; once
+                           drained, KEM capacities and quotas apply the policy as usual
+    """
+
+    def __init__(self, shm: SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        magic, version, policy, cap = _META.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Invalid KEM ring header")
+        self.name = shm.name
+        self.policy = POLICIES[policy]
+        self.capacity = cap
+        self._mask = cap - 1
+        self.last_lag_s = 0.0
+        self.drained = 0
+        self.invalid = 0   # записи, що не декодувались (рахує споживач)
+
+    @classmethod
+    def create(cls, name: Optional[str] = None, capacity: int = 1 << 20,
+               policy: str = "drop_oldest") -> "EventRing":
+        if capacity < 4096 or capacity & (capacity - 1):
+            raise ValueError("Invalid KEM ring capacity (power of two ≥ 4096)")
+        if policy not in POLICIES:
+            raise ValueError("Invalid KEM ring policy")
+        shm = SharedMemory(name=name, create=True, size=_DATA_OFF + capacity)
+        shm.buf[:_DATA_OFF] = bytes(_DATA_OFF)
+        _META.pack_into(shm.buf, 0, MAGIC, VERSION, POLICIES.index(policy), capacity)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "EventRing":
+        # до Python 3.13 власний resource_tracker незалежного процесу вважає приєднаний сегмент
+        # своїм і знищує його при виході; дочірні процеси multiprocessing ділять трекер ядра
+        independent = getattr(resource_tracker._resource_tracker, "_fd", None) is None
+        shm = SharedMemory(name=name)
+        if independent:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    # ----------------- Producer -----------------
+
+    def push(self, ev: Event) -> bool:
+        """Write one event; False if it was dropped because the ring is full."""
+        return self._push(codec.encode(ev))
+
+    def push_many(self, events: Sequence[Event]) -> int:
+        """Write events in order; returns how many were written (stops at the first overflow)."""
+        n = 0
+        for ev in events:
+            if not self._push(codec.encode(ev)):
+                break
+            n += 1
+        return n
+
+    def _push(self, body: bytes) -> bool:
+        buf, cap = self.buf, self.capacity
+        need = (_REC.size + len(body) + 7) & ~7
+        if need > cap // 2:
+            raise ValueError("Invalid KEM ring record: larger than half the ring")
+        head, written, dropped, rejected = _PROD.unpack_from(buf, _PROD_OFF)
+        tail = _U64.unpack_from(buf, _CONS_OFF)[0]
+        idx = head & self._mask
+        pad = cap - idx if idx + need > cap else 0
+        if head + pad + need - tail > cap:
+            if self.policy == "reject":
+                _PROD.pack_into(buf, _PROD_OFF, head, written, dropped, rejected + 1)
+                raise RingFull(f"KEM ring {self.name} full")
+            _PROD.pack_into(buf, _PROD_OFF, head, written, dropped + 1, rejected)
+            return False
+        if pad:
+            _REC.pack_into(buf, _DATA_OFF + idx, _WRAP, 0)
+            head += pad
+            idx = 0
+        start = _DATA_OFF + idx
+        buf[start + _REC.size:start + _REC.size + len(body)] = body
+        _REC.pack_into(buf, start, len(body), 0)
+        # head публікується останнім — споживач бачить лише повністю записані записи
+        _PROD.pack_into(buf, _PROD_OFF, head + need, written + 1, dropped, rejected)
+        return True
+
+    # ----------------- Consumer -----------------
+
+    def pop_batch(self, max_records: int = 1024,
+                  admit: Optional[Callable[[Event], bool]] = None) -> List[Event]:
+        """
+        Decode up to max_records events and move the tail past them. Ring bytes come from
+        another process and are decoded strictly (no pickle): a record that does not decode
+        is skipped and counted in self.invalid; a corrupt length drops the rest of the data.
+        admit(ev), if given, is asked for every decoded event before the tail passes it:
+        False stops the batch and leaves that record and the rest in the ring.
+        """
+        buf, mask, cap = self.buf, self._mask, self.capacity
+        head = _U64.unpack_from(buf, _PROD_OFF)[0]
+        tail, read = _CONS.unpack_from(buf, _CONS_OFF)
+        out: List[Event] = []
+        n = 0
+        while tail < head and n < max_records:
+            idx = tail & mask
+            ln = _REC.unpack_from(buf, _DATA_OFF + idx)[0]
+            if ln == _WRAP:
+                tail = min(head, tail + cap - idx)
+                continue
+            step = (_REC.size + ln + 7) & ~7
+            if idx + _REC.size + ln > cap or tail + step > head:
+                # довжина виходить за буфер — межі наступних записів невідомі
+                self.invalid += 1
+                n += 1
+                tail = head
+                break
+            start = _DATA_OFF + idx + _REC.size
+            try:
+                ev = codec.decode(buf[start:start + ln])
+            except Exception:  # noqa: BLE001 — довільні байти від зовнішнього виробника
+                self.invalid += 1
+            else:
+                if admit is not None and not admit(ev):
+                    break
+                out.append(ev)
+            n += 1
+            tail += step
+        _CONS.pack_into(buf, _CONS_OFF, tail, read + n)
+        if out:
+            self.last_lag_s = max(0.0, get_T0() - out[0].ts_T0)
+            self.drained += len(out)
+        return out
+
+    # ----------------- Diagnostics / lifecycle -----------------
+
+    def stats(self) -> RingStats:
+        head, written, dropped, rejected = _PROD.unpack_from(self.buf, _PROD_OFF)
+        tail, read = _CONS.unpack_from(self.buf, _CONS_OFF)
+        return RingStats(written, read, dropped, rejected, head - tail, self.capacity)
+
+    def depth(self) -> int:
+        st = self.stats()
+        return st.written - st.read
+
+    def metrics(self) -> Dict[str, Any]:
+        st = self.stats()
+        return {
+            "name": self.name, "policy": self.policy, "depth": st.written - st.read,
+            "used_bytes": st.used_bytes, "capacity": st.capacity, "written": st.written,
+            "read": st.read, "dropped": st.dropped, "rejected": st.rejected,
+            "lag_s": self.last_lag_s,
+        }
+
+    def close(self) -> None:
+        """Detach; the owner (kernel) also unlinks the segment."""
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
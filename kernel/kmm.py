@@ -1,30 +1,224 @@
-import networkx as nx
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+from kernel.kmm_columns import NodeColumns
+from kernel.kmm_consolidation import ConsolidationEngine
+from kernel.kmm_graph import CompactGraph
+from kernel.kmm_index import MemoryIndex
+from kernel.kmm_snapshot import KMMSnapshotStore
+from spx_types.memory import MemoryOp, MemoryOpType
 from utils.diagnostics import log_info
+from utils.metrics import REGISTRY, Family
+from utils.time_utils import get_T0
+
+# ключі MemoryOp.indices, які retrieve() приймає як фільтри
+_RETRIEVE_KEYS = ("origin", "where", "has", "t_from", "t_to", "around", "hops",
+                  "direction", "rel_type", "limit")
+
+_CONSOLIDATE = REGISTRY.histogram("spx_kmm_consolidation_seconds", "Duration of one bounded WM → EM step")
+_CONSOLIDATED = REGISTRY.counter("spx_kmm_consolidated_total", "WM nodes processed by consolidation")
+_FORGOTTEN = REGISTRY.counter("spx_kmm_forgotten_total", "Nodes forgotten below forget_threshold")
 
 class KernelMemoryModel:
-    def __init__(self) -> None:
-        self.graph = nx.DiGraph()
-        self.pending_consolidations = 0
+    def __init__(self, cfg: Optional[Dict[str, Any]] = None) -> None:
+        cfg = cfg or {}
+        self.cfg = cfg
+        self.graph = CompactGraph()
+        self.columns = NodeColumns.from_config(cfg)
+        self.index = MemoryIndex(self.graph, self.columns)
+        self._last_decay: Optional[float] = None
+        self.consolidator = ConsolidationEngine.from_config(self, cfg)
+
+        # знімки: kmm.snapshot_dir (None = вимкнено)
+        sdir = cfg.get("snapshot_dir")
+        self.snapshots = KMMSnapshotStore(sdir, int(cfg.get("snapshot_full_every", 8))) if sdir else None
+        if self.snapshots is not None:
+            self.columns.track_changes()      # дельти пишуть лише змінені рядки колонок
+        self._checkpoint_interval = float(cfg.get("checkpoint_interval_s", 30.0))
+        self._last_checkpoint: Optional[float] = None
+        REGISTRY.register_collector("kmm", self._collect)
 
     @classmethod
-    def init(cls) -> "KernelMemoryModel":
-        kmm = cls()
-        log_info("KMM: initialized (WM+EM views on single T-TPG).")
+    def init(cls, cfg: Optional[Dict[str, Any]] = None) -> "KernelMemoryModel":
+        kmm = cls(cfg)
+        if kmm.snapshots is not None and kmm.cfg.get("warm_start", True):
+            t0 = get_T0()
+            gen = kmm.snapshots.restore(kmm)
+            if gen is not None:
+                log_info("KMM: warm start from generation %d (%d nodes, %.3fs).",
+                         gen, kmm.total_nodes(), get_T0() - t0, sub="kmm")
+        log_info("KMM: initialized (WM+EM views on single T-TPG).", sub="kmm")
         return kmm
 
+    def _adopt_graph(self, graph: CompactGraph) -> None:
+        """Swap in a restored graph; derived views are reset (index parts rebuild lazily)."""
+        self.graph = graph
+        self.index = MemoryIndex(graph, self.columns)
+        self.index.invalidate()
+        self.consolidator = ConsolidationEngine(self, self.consolidator.cfg)
+
+    @property
+    def pending_consolidations(self) -> int:
+        return self.consolidator.pending()
+
     # Simplified operations
-    def encode_wm(self, node_id: str, payload: Dict[str, Any]) -> None:
-        self.graph.add_node(node_id, **payload, scope="WM")
+    def _encode(self, node_id: str, payload: Dict[str, Any], scope: str,
+                origin: Optional[str], ts_T1: Optional[float], hit: bool = True) -> None:
+        i = self.graph.intern(node_id)
+        self.index.on_encode(i, self.graph.payload_at(i), payload, origin, ts_T1)
+        self.graph.add_node(node_id, payload, scope=scope)
+        now = get_T0()
+        self.columns.on_encode(i, payload, ts_T1, origin, now, hit)
+        if scope == "WM" and hit:
+            self.consolidator.touch(i)
+
+    def _clear(self, idx: int) -> None:
+        """Remove a node (forget / duplicate merge): index entries, edges, columns."""
+        self.index.on_remove(idx, self.graph.payload_at(idx))
+        self.graph.remove_node(idx)
+        self.columns.clear(idx)
 
-    def encode_em(self, node_id: str, payload: Dict[str, Any]) -> None:
-        self.graph.add_node(node_id, **payload, scope="EM")
+    def encode_wm(self, node_id: str, payload: Dict[str, Any],
+                  origin: Optional[str] = None, ts_T1: Optional[float] = None) -> None:
+        self._encode(node_id, payload, "WM", origin, ts_T1)
+
+    def encode_em(self, node_id: str, payload: Dict[str, Any],
+                  origin: Optional[str] = None, ts_T1: Optional[float] = None) -> None:
+        self._encode(node_id, payload, "EM", origin, ts_T1)
 
     def bind(self, src: str, dst: str, rel_type: str) -> None:
         self.graph.add_edge(src, dst, rel_type=rel_type)
 
+    # Retrieval
+    def retrieve(self, scope: Optional[str] = None, *, origin: Optional[str] = None,
+                 where: Optional[Dict[str, Any]] = None, has: Iterable[str] = (),
+                 t_from: Optional[float] = None, t_to: Optional[float] = None,
+                 around: Union[str, Iterable[str]] = (), hops: int = 1,
+                 direction: str = "both", rel_type: Optional[str] = None,
+                 limit: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Index-backed lookup; every given filter must match:
+          scope / origin / where={key: value} / has=[key] / t_from..t_to (ts_T1, inclusive) /
+          around=node(s) within `hops` bind() edges (direction out|in|both, optional rel_type).
+        Returns (node_id, attrs) ordered by ts_T1.
+        """
+        if direction not in ("out", "in", "both"):
+            raise ValueError("Invalid retrieve direction")
+        if hops < 0:
+            raise ValueError("Invalid retrieve hops")
+        if isinstance(around, str):
+            around = (around,)
+        if isinstance(has, str):
+            has = (has,)
+        idxs = self.index.query(scope=scope, origin=origin, where=where, has=has,
+                                t_from=t_from, t_to=t_to, around=around, hops=hops,
+                                direction=direction, rel_type=rel_type, limit=limit)
+        if idxs:
+            self.columns.hit_many(np.asarray(idxs, dtype=np.int64), get_T0())
+        scope_at, touch = self.graph.scope_at, self.consolidator.touch
+        for i in idxs:
+            if scope_at(i) == "WM":
+                touch(i)
+        name_of = self.graph.name_of
+        return [(name_of(i), self.graph.node(name_of(i))) for i in idxs]
+
+    def execute(self, op: MemoryOp) -> Any:
+        """
+        Apply a MemoryOp:
+          ENCODE   → node id = indices["node_id"] or op.id; returns node id
+          BIND     → indices {"src", "dst", "rel_type"}
+          RETRIEVE → indices carry retrieve() filters; op.scope restricts the scope if set
+        """
+        if not op.valid:
+            raise ValueError("Invalid MemoryOp (valid=False)")
+        if op.op is MemoryOpType.ENCODE:
+            if op.scope not in ("WM", "EM"):
+                raise ValueError("Invalid MemoryOp scope")
+            node_id = op.indices.get("node_id", op.id)
+            self._encode(node_id, op.payload, op.scope, op.origin, op.ts_T1)
+            return node_id
+        if op.op is MemoryOpType.BIND:
+            try:
+                src, dst = op.indices["src"], op.indices["dst"]
+            except KeyError:
+                raise ValueError("Invalid MemoryOp: bind requires src and dst")
+            self.bind(src, dst, op.indices.get("rel_type", "related"))
+            return None
+        if op.op is MemoryOpType.RETRIEVE:
+            unknown = set(op.indices) - set(_RETRIEVE_KEYS)
+            if unknown:
+                raise ValueError(f"Invalid retrieve indices: {sorted(unknown)}")
+            return self.retrieve(op.scope or None, **op.indices)
+        raise ValueError("Invalid MemoryOp type")
+
+    # Consolidation (RF)
+    def consolidate(self, budget_s: Optional[float] = None) -> int:
+        """Bounded WM → EM step; see ConsolidationEngine."""
+        t0 = get_T0()
+        n = self.consolidator.consolidate(budget_s)
+        _CONSOLIDATE.observe(get_T0() - t0)
+        _CONSOLIDATED.inc(n)
+        return n
+
+    def forget(self, now: Optional[float] = None) -> int:
+        """
+        Decay salience of every node by the time elapsed since the previous call, then
+        clear nodes below forget_threshold in one batch. Returns the number forgotten.
+        """
+        now = get_T0() if now is None else now
+        if self._last_decay is not None:
+            self.columns.decay(now - self._last_decay)
+        self._last_decay = now
+        victims = self.columns.below()
+        for i in victims.tolist():
+            self._clear(i)
+        _FORGOTTEN.inc(len(victims))
+        return len(victims)
+
+    def top_salient(self, k: int, scope: Optional[str] = None) -> List[str]:
+        """k most salient node ids (optionally within a scope), most salient first."""
+        mask = self.columns.mask_of(self.graph.scope_members(scope)) if scope else None
+        return [self.graph.name_of(i) for i in self.columns.top_k(k, mask).tolist()]
+
+    # Snapshots
+    def checkpoint(self, full: bool = False, background: bool = False) -> Optional[str]:
+        """
+        Write a delta (or full) snapshot; None if snapshots are disabled.
+        background=True hands a full snapshot's encoding and I/O to a writer thread.
+        """
+        if self.snapshots is None:
+            return None
+        self._last_checkpoint = get_T0()
+        return self.snapshots.checkpoint(self, full=full, background=background)
+
+    def maybe_checkpoint(self, now: Optional[float] = None) -> Optional[str]:
+        """
+        checkpoint() once checkpoint_interval_s has passed since the previous one (RF tick).
+        Full snapshots are written in the background; while one is in flight this is a no-op.
+        """
+        if self.snapshots is None or self.snapshots.busy:
+            return None
+        now = get_T0() if now is None else now
+        if self._last_checkpoint is None:
+            self._last_checkpoint = now
+            return None
+        if now - self._last_checkpoint < self._checkpoint_interval:
+            return None
+        return self.checkpoint(background=True)
+
+    def memory_entropy(self) -> float:
+        return self.consolidator.entropy()
+
     def wm_load(self) -> int:
-        return sum(1 for _, data in self.graph.nodes(data=True) if data.get("scope") == "WM")
+        return self.graph.scope_size("WM")
 
     def total_nodes(self) -> int:
-        return self.graph.number_of_nodes()
+        return self.graph.number_of_nodes() - self.graph.number_of_removed()
+
+    def _collect(self) -> List[Family]:
+        """Registry collector: memory size and pending RF work."""
+        return [
+            ("spx_kmm_nodes", "gauge", "KMM nodes by scope",
+             [({"scope": "WM"}, self.wm_load()), ({"scope": "all"}, self.total_nodes())]),
+            ("spx_kmm_pending_consolidations", "gauge", "WM nodes waiting for consolidation",
+             [({}, self.pending_consolidations)]),
+        ]
@@ -0,0 +1,282 @@
+# kernel/kmm_columns.py
+"""
+KMM columnar side store — SPX-OS v0.2
+Per-node numeric fields (salience, last access, access count, creation time) in NumPy
+columns indexed by the CompactGraph node index. Decay, thresholding and top-k run as
+batched array operations instead of per-node Python loops.
+"""
+
+from __future__ import annotations
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+
+@dataclass
+class _ColumnsCfg:
+    initial_salience: float = 1.0     # якщо payload не містить salience_key
+    salience_key: str = "salience"
+    access_boost: float = 0.2         # підсилення salience при кожному доступі (стеля 1.0)
+    half_life_s: float = 60.0         # напіврозпад salience (0 = без затухання)
+    forget_threshold: float = 0.05    # вузли з salience нижче — забуваються у RF
+
+
+class NodeColumns:
+    """
+    Columns (length = capacity ≥ number of graph nodes, grown geometrically):
+      salience    float64   decays as 0.5 ** (dt / half_life_s)
+      last_access float64   T0 of the last encode/retrieve hit
+      access      int64     encode/retrieve hits
+      created     float64   ts_T1 of the first encode
+      live        bool      node has a scope (bind()-only and cleared nodes are not live)
+      ts          float64   explicit ts_T1 (NaN if never given) — MemoryIndex reads it from here
+      origin      int32     id in origin_names (−1 if none)
+    With track_changes() on, changed rows and decay factors are recorded so a delta snapshot
+    carries only those rows.
+    """
+
+    COLUMNS = ("salience", "last_access", "access", "created", "live", "ts", "origin")
+    _FILL = {"ts": np.nan, "origin": -1}
+
+    def __init__(self, cfg: Optional[_ColumnsCfg] = None):
+        self.cfg = cfg or _ColumnsCfg()
+        if self.cfg.half_life_s < 0 or not 0.0 <= self.cfg.forget_threshold <= 1.0:
+            raise ValueError("Invalid KMM salience config")
+        self._cap = 0
+        self.salience = np.zeros(0, dtype=np.float64)
+        self.last_access = np.zeros(0, dtype=np.float64)
+        self.access = np.zeros(0, dtype=np.int64)
+        self.created = np.zeros(0, dtype=np.float64)
+        self.live = np.zeros(0, dtype=bool)
+        self.ts = np.zeros(0, dtype=np.float64)
+        self.origin = np.zeros(0, dtype=np.int32)
+        self.origin_names: List[str] = []
+        self._origin_ids: Dict[str, int] = {}
+        self.halvings = 0.0               # сумарне затухання з моменту створення, у напіврозпадах
+        # облік змін для дельта-знімків (track_changes): змінені рядки і множники затухання
+        self._dirty: Optional[np.ndarray] = None
+        self._decays: List[float] = []
+        self._ckpt_origins = 0
+
+    @classmethod
+    def from_config(cls, kmm_cfg: Optional[Dict[str, Any]]) -> "NodeColumns":
+        c = kmm_cfg or {}
+        cfg = _ColumnsCfg(
+            initial_salience=float(c.get("initial_salience", 1.0)),
+            salience_key=str(c.get("salience_key", "salience")),
+            access_boost=float(c.get("access_boost", 0.2)),
+            half_life_s=float(c.get("salience_half_life_s", 60.0)),
+            forget_threshold=float(c.get("forget_threshold", 0.05)),
+        )
+        return cls(cfg)
+
+    def _ensure(self, idx: int) -> None:
+        if idx < self._cap:
+            return
+        cap = max(idx + 1, 2 * self._cap, 1024)
+        for name in self.COLUMNS:
+            old = getattr(self, name)
+            new = np.full(cap, self._FILL.get(name, 0), dtype=old.dtype)
+            new[:self._cap] = old
+            setattr(self, name, new)
+        if self._dirty is not None:
+            dirty = np.zeros(cap, dtype=bool)
+            dirty[:self._cap] = self._dirty
+            self._dirty = dirty
+        self._cap = cap
+
+    # ----------------- Per-node updates -----------------
+
+    def on_encode(self, idx: int, payload: Dict[str, Any], ts_T1: Optional[float],
+                  origin: Optional[str], now: float, hit: bool = True) -> None:
+        self._ensure(idx)
+        if self._dirty is not None:
+            self._dirty[idx] = True
+        v = payload.get(self.cfg.salience_key)
+        if not self.live[idx]:
+            self.live[idx] = True
+            self.created[idx] = now if ts_T1 is None else ts_T1
+            self.salience[idx] = self.cfg.initial_salience
+        if ts_T1 is not None:
+            self.ts[idx] = ts_T1
+        if origin is not None:
+            o = self._origin_ids.get(origin)
+            if o is None:
+                o = self._origin_ids[origin] = len(self.origin_names)
+                self.origin_names.append(origin)
+            self.origin[idx] = o
+        if hit:
+            self.hit(idx, now)
+        if v is not None:
+            # явна salience у payload має пріоритет над підсиленням доступом
+            try:
+                self.salience[idx] = min(1.0, max(0.0, float(v)))
+            except (TypeError, ValueError):
+                pass
+
+    def hit(self, idx: int, now: float) -> None:
+        if self._dirty is not None:
+            self._dirty[idx] = True
+        self.access[idx] += 1
+        self.last_access[idx] = now
+        self.salience[idx] = min(1.0, self.salience[idx] + self.cfg.access_boost)
+
+    def hit_many(self, idxs: np.ndarray, now: float) -> None:
+        if self._dirty is not None:
+            self._dirty[idxs] = True
+        np.add.at(self.access, idxs, 1)
+        self.last_access[idxs] = now
+        # індекси унікальні (результат retrieve), тому звичайне присвоєння коректне
+        self.salience[idxs] = np.minimum(self.salience[idxs] + self.cfg.access_boost, 1.0)
+
+    def merge(self, into: int, other: int) -> None:
+        """Fold `other` into `into` (duplicate merge during consolidation)."""
+        if self._dirty is not None:
+            self._dirty[into] = True
+        self.salience[into] = max(self.salience[into], self.salience[other])
+        self.access[into] += self.access[other]
+        self.last_access[into] = max(self.last_access[into], self.last_access[other])
+        self.created[into] = min(self.created[into], self.created[other])
+
+    def clear(self, idx: int) -> None:
+        if idx < self._cap:
+            if self._dirty is not None:
+                self._dirty[idx] = True
+            self.live[idx] = False
+            self.salience[idx] = 0.0
+            self.access[idx] = 0
+            self.ts[idx] = np.nan
+            self.origin[idx] = -1
+
+    def load(self, arrays: Dict[str, np.ndarray], origin_names: List[str]) -> None:
+        """Replace all columns (snapshot restore); arrays are copied so they stay writable."""
+        n = len(arrays["live"])
+        for name in self.COLUMNS:
+            setattr(self, name, np.array(arrays[name][:n], dtype=getattr(self, name).dtype))
+        self._cap = n
+        if self._dirty is not None:
+            self._dirty = np.zeros(n, dtype=bool)
+        self.origin_names = list(origin_names)
+        self._origin_ids = {o: i for i, o in enumerate(self.origin_names)}
+        self.mark_checkpoint()
+
+    # ----------------- Delta snapshots -----------------
+
+    def track_changes(self) -> None:
+        """Start recording changed rows and decay factors (KMM with snapshots enabled)."""
+        if self._dirty is None:
+            self._dirty = np.zeros(self._cap, dtype=bool)
+        self.mark_checkpoint()
+
+    def take_delta(self, n: int) -> Tuple[np.ndarray, List[float], int]:
+        """
+        Changes since the previous checkpoint, then start a new interval:
+          (changed rows < n, decay factors in order, first new origin name)
+        Rows that only decayed are not listed — replaying the factors reproduces them.
+        """
+        rows = np.flatnonzero(self._dirty[:n]) if self._dirty is not None else np.arange(min(n, self._cap))
+        delta = (rows, list(self._decays), self._ckpt_origins)
+        self.mark_checkpoint()
+        return delta
+
+    def mark_checkpoint(self) -> None:
+        if self._dirty is not None:
+            self._dirty[:] = False
+        self._decays = []
+        self._ckpt_origins = len(self.origin_names)
+
+    def apply_delta(self, n: int, rows: np.ndarray, arrays: Dict[str, np.ndarray],
+                    decays: List[float], new_origins: List[str]) -> None:
+        """Replay take_delta() output on top of the restored columns (n = node count)."""
+        if n:
+            self._ensure(n - 1)
+        for f in decays:
+            self.salience *= f
+        for name in self.COLUMNS:
+            getattr(self, name)[rows] = arrays[name]
+        for o in new_origins:
+            self._origin_ids[o] = len(self.origin_names)
+            self.origin_names.append(o)
+        self.mark_checkpoint()
+
+    def ts_of(self, idx: int) -> Optional[float]:
+        if idx >= self._cap:
+            return None
+        t = float(self.ts[idx])
+        return None if t != t else t
+
+    def ts_many(self, idxs: np.ndarray) -> np.ndarray:
+        """ts_T1 of many nodes (NaN if none), rows beyond the columns included."""
+        out = np.full(len(idxs), np.nan)
+        ok = idxs < self._cap
+        out[ok] = self.ts[idxs[ok]]
+        return out
+
+    def ts_order(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(nodes, ts_T1) of live nodes with a ts_T1, sorted by ts_T1 (index among equals)."""
+        timed = np.flatnonzero(self.live & ~np.isnan(self.ts))
+        nodes = timed[np.argsort(self.ts[timed], kind="stable")]
+        return nodes, self.ts[nodes]
+
+    def origin_of(self, idx: int) -> Optional[str]:
+        if idx >= self._cap:
+            return None
+        o = int(self.origin[idx])
+        return self.origin_names[o] if o >= 0 else None
+
+    def with_origin(self, origin: str) -> np.ndarray:
+        """Indices of live nodes whose origin is `origin`."""
+        o = self._origin_ids.get(origin)
+        if o is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.live & (self.origin == o))
+
+    def salience_of(self, idx: int) -> float:
+        return float(self.salience[idx]) if idx < self._cap else 0.0
+
+    def salience_rank(self, idx: int) -> float:
+        """
+        log2(salience) + halvings: the salience rescaled to the state before any decay.
+        Decay multiplies every node by the same factor, so ranks taken at different times
+        compare the same way the current saliences do.
+        """
+        s = self.salience_of(idx)
+        return math.log2(s) + self.halvings if s > 0.0 else -math.inf
+
+    # ----------------- Batched operations -----------------
+
+    def decay(self, dt_s: float) -> None:
+        """salience *= 0.5 ** (dt / half_life) over all nodes (non-live ones are 0 anyway)."""
+        if dt_s <= 0 or self.cfg.half_life_s == 0:
+            return
+        self.halvings += dt_s / self.cfg.half_life_s
+        f = 0.5 ** (dt_s / self.cfg.half_life_s)
+        self.salience *= f
+        if self._dirty is not None:
+            self._decays.append(f)
+
+    def below(self, threshold: Optional[float] = None, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Indices of live nodes with salience < threshold (default forget_threshold)."""
+        thr = self.cfg.forget_threshold if threshold is None else threshold
+        sel = self.live & (self.salience < thr)
+        if mask is not None:
+            sel &= mask
+        return np.flatnonzero(sel)
+
+    def top_k(self, k: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Indices of the k most salient live nodes, most salient first."""
+        sel = self.live if mask is None else self.live & mask
+        cand = np.flatnonzero(sel)
+        if k <= 0 or not len(cand):
+            return cand[:0]
+        if k < len(cand):
+            part = np.argpartition(-self.salience[cand], k - 1)[:k]
+            cand = cand[part]
+        order = np.lexsort((cand, -self.salience[cand]))
+        return cand[order]
+
+    def mask_of(self, idxs) -> np.ndarray:
+        m = np.zeros(self._cap, dtype=bool)
+        m[np.fromiter(idxs, dtype=np.int64)] = True
+        return m
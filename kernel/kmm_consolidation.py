@@ -0,0 +1,199 @@
+# kernel/kmm_consolidation.py
+"""
+KMM Consolidation — SPX-OS v0.2
+Incremental WM → EM consolidation, run by the runtime during RF ticks.
+Bounded batches under a time budget, duplicate merging, LRU/salience eviction order,
+pending-work and entropy figures for the KMS RF triggers.
+"""
+
+from __future__ import annotations
+import heapq
+from dataclasses import dataclass
+from itertools import count
+from time import perf_counter
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+from utils.metrics import compute_memory_entropy
+
+SUPPORT_KEY = "support"   # скільки дублікатів злито у канонічний EM-вузол
+
+
+@dataclass
+class _ConsolidationCfg:
+    wm_keep: int = 256            # робочий набір WM; усе понад нього — pending
+    batch_max: int = 64           # максимум вузлів за один виклик consolidate()
+    budget_s: float = 0.005       # бюджет часу одного виклику
+    eviction: str = "lru"         # "lru" | "salience" (спершу найменш salient, далі LRU)
+
+
+class ConsolidationEngine:
+    """
+    Moves cold WM nodes into EM.
+      - every WM encode/retrieve touches the node (access sequence number)
+      - pending = max(0, wm_load − wm_keep); victims are taken from a lazy min-heap
+        keyed by (salience?, last access): "lru" → oldest access first,
+        "salience" → lowest salience (kmm.columns) first, ties by oldest access; the key is
+        the decay-invariant salience_rank, so nodes touched at different times compare by
+        their current salience
+      - a victim whose payload (without SUPPORT_KEY) equals an EM node consolidated
+        earlier is merged into it: edges are re-bound to the canonical node, its
+        SUPPORT_KEY is incremented, ts_T1 is advanced, and the duplicate is cleared
+      - one consolidate() call handles at most batch_max victims and stops at budget_s
+      - entropy = compute_memory_entropy(WM nodes touched since the last run, wm_load)
+    """
+
+    EVICTIONS = ("lru", "salience")
+
+    def __init__(self, kmm, cfg: Optional[_ConsolidationCfg] = None):
+        self.cfg = cfg or _ConsolidationCfg()
+        if self.cfg.eviction not in self.EVICTIONS:
+            raise ValueError("Invalid consolidation eviction policy")
+        if self.cfg.wm_keep < 0 or self.cfg.batch_max <= 0 or self.cfg.budget_s <= 0:
+            raise ValueError("Invalid consolidation limits")
+        self.kmm = kmm
+        self._seq = count()
+        self._last: Dict[int, int] = {}                       # idx → seq останнього доступу
+        self._heap: List[Tuple[float, int, int]] = []         # (ключ, seq, idx), ліниве видалення
+        self._recent: Set[int] = set()
+        self._canon: Dict[FrozenSet[Tuple[str, Hashable]], int] = {}
+        self._stats: Dict[str, float] = {
+            "runs": 0, "consolidated": 0, "merged": 0,
+            "budget_stops": 0, "last_run_s": 0.0, "max_run_s": 0.0,
+        }
+
+    @classmethod
+    def from_config(cls, kmm, kmm_cfg: Optional[Dict[str, Any]]) -> "ConsolidationEngine":
+        c = kmm_cfg or {}
+        cfg = _ConsolidationCfg(
+            wm_keep=int(c.get("wm_keep", 256)),
+            batch_max=int(c.get("consolidation_batch", 64)),
+            budget_s=float(c.get("consolidation_budget_ms", 5)) / 1000.0,
+            eviction=str(c.get("eviction", "lru")),
+        )
+        return cls(kmm, cfg)
+
+    # ----------------- Access tracking -----------------
+
+    def touch(self, idx: int) -> None:
+        """Record an access to a WM node."""
+        seq = next(self._seq)
+        self._last[idx] = seq
+        self._recent.add(idx)
+        key = self.kmm.columns.salience_rank(idx) if self.cfg.eviction == "salience" else 0.0
+        heapq.heappush(self._heap, (key, seq, idx))
+        if len(self._heap) > 2 * len(self._last) + 64:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        wm = self.kmm.graph.scope_members("WM")
+        self._last = {i: s for i, s in self._last.items() if i in wm}
+        self._heap = [e for e in self._heap if self._last.get(e[2]) == e[1]]
+        heapq.heapify(self._heap)
+
+    def _next_victim(self) -> Optional[int]:
+        wm = self.kmm.graph.scope_members("WM")
+        h = self._heap
+        while h:
+            _, seq, idx = heapq.heappop(h)
+            if self._last.get(idx) == seq:
+                del self._last[idx]
+                if idx in wm:
+                    return idx
+        # вузли WM без доступу через KMM (напр. напряму через graph) — будь-який
+        for idx in wm:
+            return idx
+        return None
+
+    # ----------------- Figures -----------------
+
+    def pending(self) -> int:
+        return max(0, self.kmm.wm_load() - self.cfg.wm_keep)
+
+    def entropy(self) -> float:
+        wm = self.kmm.wm_load()
+        if not wm:
+            return 0.0
+        # без матеріалізації множини WM: після warm start вона лінива
+        scope_at = self.kmm.graph.scope_at
+        self._recent = {i for i in self._recent if scope_at(i) == "WM"}
+        return compute_memory_entropy(len(self._recent), wm)
+
+    # ----------------- Consolidation -----------------
+
+    def _signature(self, payload: Dict[str, Any]) -> Optional[FrozenSet[Tuple[str, Hashable]]]:
+        items = [(k, v) for k, v in payload.items() if k != SUPPORT_KEY]
+        if not items:
+            return None
+        try:
+            return frozenset(items)
+        except TypeError:
+            return None
+
+    def _canonical(self, sig) -> Optional[int]:
+        c = self._canon.get(sig)
+        if c is None:
+            return None
+        g = self.kmm.graph
+        if g.scope_of(g.name_of(c)) == "EM" and self._signature(g.payload_at(c)) == sig:
+            return c
+        del self._canon[sig]
+        return None
+
+    def _consolidate_one(self, idx: int) -> None:
+        kmm, g = self.kmm, self.kmm.graph
+        payload = g.payload_at(idx)
+        sig = self._signature(payload)
+        canon = self._canonical(sig) if sig is not None else None
+        name = g.name_of(idx)
+        if canon is None:
+            kmm._encode(name, {}, "EM", None, None, hit=False)   # перенесення — не доступ
+            if sig is not None:
+                self._canon[sig] = idx
+            self._stats["consolidated"] += 1
+            return
+        # злиття дубліката у канонічний EM-вузол
+        cname = g.name_of(canon)
+        for v, rel in list(g.out_edges(idx)):
+            if v != canon:
+                kmm.bind(cname, g.name_of(v), rel)
+        for u, rel in list(g.in_edges(idx)):
+            if u != canon:
+                kmm.bind(g.name_of(u), cname, rel)
+        support = int(g.payload_at(canon).get(SUPPORT_KEY, 1)) + int(payload.get(SUPPORT_KEY, 1))
+        ts = kmm.columns.ts_of(idx)
+        cts = kmm.columns.ts_of(canon)
+        newer = ts if ts is not None and (cts is None or ts > cts) else None
+        kmm._encode(cname, {SUPPORT_KEY: support}, "EM", None, newer, hit=False)
+        kmm.columns.merge(canon, idx)
+        kmm._clear(idx)
+        self._stats["merged"] += 1
+
+    def consolidate(self, budget_s: Optional[float] = None, batch_max: Optional[int] = None) -> int:
+        """One bounded step; returns the number of WM nodes handled."""
+        budget = self.cfg.budget_s if budget_s is None else budget_s
+        n_max = min(self.cfg.batch_max if batch_max is None else batch_max, self.pending())
+        t0 = perf_counter()
+        done = 0
+        while done < n_max:
+            idx = self._next_victim()
+            if idx is None:
+                break
+            self._consolidate_one(idx)
+            done += 1
+            if perf_counter() - t0 >= budget:
+                if done < n_max:
+                    self._stats["budget_stops"] += 1
+                break
+        dt = perf_counter() - t0
+        st = self._stats
+        st["runs"] += 1
+        st["last_run_s"] = dt
+        st["max_run_s"] = max(st["max_run_s"], dt)
+        self._recent.clear()
+        return done
+
+    def snapshot(self) -> Dict[str, Any]:
+        st: Dict[str, Any] = dict(self._stats)
+        st["pending"] = self.pending()
+        st["wm_load"] = self.kmm.wm_load()
+        st["entropy"] = self.entropy()
+        return st
@@ -0,0 +1,372 @@
+# kernel/kmm_graph.py
+"""
+Compact graph store for KMM — SPX-OS v0.2
+Interned node ids, integer-indexed adjacency in flat arrays (CSR + delta),
+per-scope membership sets and interned edge types. Replaces networkx.DiGraph.
+Removed nodes and edges are tombstones: indices stay reserved (columns and snapshots
+are indexed by them) and are revived in place when the same id / pair is used again.
+"""
+
+from __future__ import annotations
+from array import array
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+SCOPES = ("WM", "EM")
+_NO_SCOPE = 0          # вузол, створений лише через bind()
+_SCOPE_CODE = {"WM": 1, "EM": 2}
+_SCOPE_NAME = {1: "WM", 2: "EM"}
+_REMOVED = 3           # вузол видалено (forget / злиття): без scope, payload і ребер
+_DEAD_REL = -1         # надгробок ребра в _erel
+
+
+class _Adjacency:
+    """
+    One direction of adjacency.
+      - CSR base: off[u]..off[u+1] slice of `nbr` / `edge` (edge = index into edge arrays)
+      - delta: edges added since the last rebuild, per node
+    Rebuilt (counting sort, O(N+E)) once the delta outgrows half of N+E,
+    so rebuild cost stays amortized O(1) per added edge.
+    """
+
+    def __init__(self):
+        self.off = array("q", [0])
+        self.nbr = array("q")
+        self.edge = array("q")
+        self.delta: Dict[int, List[Tuple[int, int]]] = {}
+        self.delta_size = 0
+
+    def add(self, u: int, v: int, e: int) -> None:
+        self.delta.setdefault(u, []).append((v, e))
+        self.delta_size += 1
+
+    def needs_rebuild(self, n_nodes: int) -> bool:
+        return self.delta_size > max(4096, (n_nodes + len(self.nbr)) // 2)
+
+    def rebuild(self, n_nodes: int, heads: array, tails: array) -> None:
+        """heads/tails: per-edge (u, v) for this direction."""
+        deg = array("q", bytes(8 * (n_nodes + 1)))
+        for u in heads:
+            deg[u + 1] += 1
+        off = array("q", accumulate(deg))
+        counts = array("q", off)
+        nbr = array("q", bytes(8 * len(heads)))
+        edge = array("q", bytes(8 * len(heads)))
+        for e, (u, v) in enumerate(zip(heads, tails)):
+            pos = counts[u]
+            nbr[pos] = v
+            edge[pos] = e
+            counts[u] = pos + 1
+        self.off, self.nbr, self.edge = off, nbr, edge
+        self.delta = {}
+        self.delta_size = 0
+
+    def iter(self, u: int) -> Iterator[Tuple[int, int]]:
+        """(neighbor, edge) pairs of node u."""
+        if u + 1 < len(self.off):
+            for i in range(self.off[u], self.off[u + 1]):
+                yield self.nbr[i], self.edge[i]
+        d = self.delta.get(u)
+        if d:
+            yield from d
+
+    def degree(self, u: int) -> int:
+        base = self.off[u + 1] - self.off[u] if u + 1 < len(self.off) else 0
+        return base + len(self.delta.get(u, ()))
+
+
+class CompactGraph:
+    """
+    Directed graph with interned string node ids.
+      - nodes: `_names[i]` ↔ `_ids[name]`, scope code in a bytearray, payload dict per node
+      - edges: parallel arrays src/dst/rel (rel interned), one edge per (src, dst) like DiGraph;
+        re-binding updates rel_type
+      - per-scope member sets give O(1) scope sizes (wm_load)
+      - payload dicts are replaced, never mutated, so a captured payload list stays valid
+      - remove_node() drops payload, scope and incident edges; the node is then absent for
+        has_node/index_of/node/nodes and every edge view until intern() revives it
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._scope = bytearray()
+        self._payload: List[Optional[Dict[str, Any]]] = []
+        # None = ще не матеріалізовано (після warm start); джерело істини — _scope
+        self._members: Dict[str, Optional[Set[int]]] = {s: set() for s in SCOPES}
+        self._counts: Dict[str, int] = {s: 0 for s in SCOPES}
+        self._removed = 0
+
+        self._esrc = array("q")
+        self._edst = array("q")
+        self._erel = array("q")
+        self._edge_ids: Dict[int, int] = {}     # (src << 32) | dst → edge index
+        self._rel_ids: Dict[str, int] = {}
+        self._rel_names: List[str] = []
+        self._dead_edges = 0
+        self._out = _Adjacency()
+        self._in = _Adjacency()
+
+        # облік змін для дельта-знімків (kernel/kmm_snapshot.py)
+        self._ckpt_nodes = 0
+        self._ckpt_edges = 0
+        self._ckpt_rels = 0
+        self._dirty_nodes: Set[int] = set()
+        self._dirty_edges: Set[int] = set()
+        self._edges_mapped = False      # _esrc/_edst/_erel ще є read-only видами знімка
+
+    # ----------------- Nodes -----------------
+
+    def intern(self, node_id: str) -> int:
+        """Index of node_id, creating (or reviving) a scope-less node if needed."""
+        i = self._ids.get(node_id)
+        if i is None:
+            i = self._ids[node_id] = len(self._names)
+            self._names.append(node_id)
+            self._scope.append(_NO_SCOPE)
+            self._payload.append(None)
+        elif self._scope[i] == _REMOVED:
+            self._scope[i] = _NO_SCOPE
+            self._removed -= 1
+            if i < self._ckpt_nodes:
+                self._dirty_nodes.add(i)
+        return i
+
+    def index_of(self, node_id: str) -> Optional[int]:
+        i = self._ids.get(node_id)
+        return None if i is None or self._scope[i] == _REMOVED else i
+
+    def name_of(self, idx: int) -> str:
+        return self._names[idx]
+
+    def add_node(self, node_id: str, payload: Dict[str, Any], scope: str) -> int:
+        """Insert or update a node (payload keys are merged, like DiGraph.add_node)."""
+        code = _SCOPE_CODE[scope]
+        i = self.intern(node_id)
+        old = self._scope[i]
+        if old != code:
+            if old != _NO_SCOPE:
+                self._member_discard(_SCOPE_NAME[old], i)
+            self._member_add(scope, i)
+            self._scope[i] = code
+        cur = self._payload[i]
+        # новий dict замість update(): захоплений фоновим знімком payload не змінюється
+        self._payload[i] = dict(payload) if cur is None else {**cur, **payload}
+        if i < self._ckpt_nodes:
+            self._dirty_nodes.add(i)
+        return i
+
+    def _member_add(self, scope: str, i: int) -> None:
+        m = self._members[scope]
+        if m is not None:
+            m.add(i)
+        self._counts[scope] += 1
+
+    def _member_discard(self, scope: str, i: int) -> None:
+        m = self._members[scope]
+        if m is not None:
+            m.discard(i)
+        self._counts[scope] -= 1
+
+    def clear_node(self, idx: int) -> None:
+        """Drop scope and payload of a node (its id and edges stay, like a bind()-only node)."""
+        old = self._scope[idx]
+        if old != _NO_SCOPE:
+            self._member_discard(_SCOPE_NAME[old], idx)
+            self._scope[idx] = _NO_SCOPE
+        self._payload[idx] = None
+        if idx < self._ckpt_nodes:
+            self._dirty_nodes.add(idx)
+
+    def remove_node(self, idx: int) -> None:
+        """Clear a node and tombstone it together with all its edges."""
+        if self._scope[idx] == _REMOVED:
+            return
+        self.clear_node(idx)
+        for adj in (self._out, self._in):
+            for _, e in adj.iter(idx):
+                self._set_rel(e, _DEAD_REL)
+        self._scope[idx] = _REMOVED
+        self._removed += 1
+
+    def restore_node(self, idx: int, code: int, payload: Optional[Dict[str, Any]]) -> None:
+        """Set the scope code and payload verbatim (snapshot replay)."""
+        old = self._scope[idx]
+        if old != code:
+            if old in _SCOPE_NAME:
+                self._member_discard(_SCOPE_NAME[old], idx)
+            elif old == _REMOVED:
+                self._removed -= 1
+            if code in _SCOPE_NAME:
+                self._member_add(_SCOPE_NAME[code], idx)
+            elif code == _REMOVED:
+                self._removed += 1
+            self._scope[idx] = code
+        self._payload[idx] = payload
+
+    def has_node(self, node_id: str) -> bool:
+        return self.index_of(node_id) is not None
+
+    def scope_of(self, node_id: str) -> Optional[str]:
+        i = self._ids.get(node_id)
+        return None if i is None else _SCOPE_NAME.get(self._scope[i])
+
+    def node(self, node_id: str) -> Optional[Dict[str, Any]]:
+        """Attribute view of a node (payload + scope), as networkx would return it."""
+        i = self.index_of(node_id)
+        if i is None:
+            return None
+        data = dict(self._payload[i] or {})
+        scope = _SCOPE_NAME.get(self._scope[i])
+        if scope:
+            data["scope"] = scope
+        return data
+
+    def scope_at(self, idx: int) -> Optional[str]:
+        return _SCOPE_NAME.get(self._scope[idx])
+
+    def payload_at(self, idx: int) -> Dict[str, Any]:
+        return self._payload[idx] or {}
+
+    def scope_members(self, scope: str) -> Set[int]:
+        m = self._members[scope]
+        if m is None:
+            code = _SCOPE_CODE[scope]
+            m = self._members[scope] = {i for i, c in enumerate(self._scope) if c == code}
+        return m
+
+    def scope_size(self, scope: str) -> int:
+        return self._counts[scope]
+
+    def number_of_nodes(self) -> int:
+        """Size of the node index space (removed nodes included)."""
+        return len(self._names)
+
+    def number_of_removed(self) -> int:
+        return self._removed
+
+    def nodes(self) -> Iterator[str]:
+        scope = self._scope
+        return (name for i, name in enumerate(self._names) if scope[i] != _REMOVED)
+
+    # ----------------- Edges -----------------
+
+    def _rel_id(self, rel_type: str) -> int:
+        r = self._rel_ids.get(rel_type)
+        if r is None:
+            r = self._rel_ids[rel_type] = len(self._rel_names)
+            self._rel_names.append(rel_type)
+        return r
+
+    def add_edge(self, src: str, dst: str, rel_type: str) -> int:
+        return self._link(self.intern(src), self.intern(dst), self._rel_id(rel_type))
+
+    def _link(self, u: int, v: int, rel: int) -> int:
+        """Add edge u → v or set its rel (a tombstoned edge is revived in place)."""
+        key = (u << 32) | v
+        e = self._edge_ids.get(key)
+        if e is not None:
+            self._set_rel(e, rel)
+            return e
+        self._own_edges()
+        e = self._edge_ids[key] = len(self._esrc)
+        self._esrc.append(u)
+        self._edst.append(v)
+        self._erel.append(rel)
+        if rel == _DEAD_REL:
+            self._dead_edges += 1
+        self._out.add(u, v, e)
+        self._in.add(v, u, e)
+        if self._out.needs_rebuild(len(self._names)):
+            self.compact()
+        return e
+
+    def _set_rel(self, e: int, rel: int) -> None:
+        old = self._erel[e]
+        if old == rel:
+            return
+        self._own_edges()
+        self._erel[e] = rel
+        self._dead_edges += (rel == _DEAD_REL) - (old == _DEAD_REL)
+        if e < self._ckpt_edges:
+            self._dirty_edges.add(e)
+
+    def _own_edges(self) -> None:
+        """Copy snapshot-mapped edge arrays into writable arrays (first write after warm start)."""
+        if self._edges_mapped:
+            owned = []
+            for a in (self._esrc, self._edst, self._erel):
+                b = array("q")
+                b.frombytes(memoryview(a).cast("B"))
+                owned.append(b)
+            self._esrc, self._edst, self._erel = owned
+            self._edges_mapped = False
+
+    def compact(self) -> None:
+        """Fold pending edges into the CSR arrays."""
+        n = len(self._names)
+        self._out.rebuild(n, self._esrc, self._edst)
+        self._in.rebuild(n, self._edst, self._esrc)
+
+    def has_edge(self, src: str, dst: str) -> bool:
+        return self.rel_type(src, dst) is not None
+
+    def rel_type(self, src: str, dst: str) -> Optional[str]:
+        u, v = self._ids.get(src), self._ids.get(dst)
+        e = self._edge_ids.get((u << 32) | v) if u is not None and v is not None else None
+        r = _DEAD_REL if e is None else self._erel[e]
+        return None if r == _DEAD_REL else self._rel_names[r]
+
+    def number_of_edges(self) -> int:
+        return len(self._esrc) - self._dead_edges
+
+    def out_edges(self, idx: int) -> Iterator[Tuple[int, str]]:
+        """(dst index, rel_type) of node idx."""
+        erel, rels = self._erel, self._rel_names
+        for v, e in self._out.iter(idx):
+            r = erel[e]
+            if r != _DEAD_REL:
+                yield v, rels[r]
+
+    def in_edges(self, idx: int) -> Iterator[Tuple[int, str]]:
+        """(src index, rel_type) of node idx."""
+        erel, rels = self._erel, self._rel_names
+        for u, e in self._in.iter(idx):
+            r = erel[e]
+            if r != _DEAD_REL:
+                yield u, rels[r]
+
+    def successors(self, node_id: str) -> List[str]:
+        i = self.index_of(node_id)
+        return [] if i is None else [self._names[v] for v, _ in self.out_edges(i)]
+
+    def predecessors(self, node_id: str) -> List[str]:
+        i = self.index_of(node_id)
+        return [] if i is None else [self._names[u] for u, _ in self.in_edges(i)]
+
+    def edges(self) -> Iterator[Tuple[str, str, str]]:
+        names, rels = self._names, self._rel_names
+        for u, v, r in zip(self._esrc, self._edst, self._erel):
+            if r != _DEAD_REL:
+                yield names[u], names[v], rels[r]
+
+    # ----------------- Checkpoint bookkeeping -----------------
+
+    def take_delta(self) -> Tuple[int, List[int], int, List[int], int]:
+        """
+        Changes since the previous checkpoint:
+          (first new node, sorted dirty older nodes, first new edge, sorted re-typed older edges,
+           first new rel_type)
+        and start a new checkpoint interval.
+        """
+        delta = (self._ckpt_nodes, sorted(self._dirty_nodes), self._ckpt_edges, sorted(self._dirty_edges),
+                 self._ckpt_rels)
+        self.mark_checkpoint()
+        return delta
+
+    def mark_checkpoint(self) -> None:
+        self._ckpt_nodes = len(self._names)
+        self._ckpt_edges = len(self._esrc)
+        self._ckpt_rels = len(self._rel_names)
+        self._dirty_nodes = set()
+        self._dirty_edges = set()
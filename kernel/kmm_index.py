@@ -0,0 +1,272 @@
+# kernel/kmm_index.py
+"""
+KMM retrieval indexes — SPX-OS v0.2
+Inverted indexes (payload key=value, payload key, origin), a sorted ts_T1 index
+and k-hop expansion over bind() edges. Updated incrementally on encode/bind.
+"""
+
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from kernel.kmm_graph import CompactGraph
+
+_MISSING = object()
+_DIRECT_MAX = 4096      # до стількох кандидатів where/has перевіряються без payload-індексів
+
+
+def _hashable(v: Any) -> bool:
+    try:
+        hash(v)
+    except TypeError:
+        return False
+    return True
+
+
+class MemoryIndex:
+    """
+    Secondary indexes over CompactGraph node indices.
+      - `_by_kv[(key, value)]` / `_by_key[key]`: payload lookups (unhashable values are
+        only indexed by key)
+      - `_by_origin[origin]`: node set per origin
+      - `_ts_keys` / `_ts_nodes`: parallel lists sorted by ts_T1 for range scans
+    A node's ts_T1 and origin are read from NodeColumns, so maintenance calls must come
+    before the columns are updated. Queries start from the smallest candidate set and
+    filter by membership, so their cost follows result size, not total memory size.
+    After a snapshot restore (invalidate()) every part is lazy, nothing is built at boot:
+    an origin set is scanned from the origin column when first asked for, the ts order is
+    argsorted from the ts column on the first range scan, and the payload indexes (which
+    unpickle every payload) are built only for a where/has query whose other constraints
+    leave more than _DIRECT_MAX candidates — smaller candidate sets are checked against their
+    payloads directly. Maintenance skips the parts that are not built yet.
+    """
+
+    def __init__(self, graph: CompactGraph, columns):
+        self.graph = graph
+        self.columns = columns
+        self._kv_built = True
+        self._ts_built = True
+        self._origins_lazy = False      # True: відсутній ключ _by_origin — ще не скановано
+        self._by_kv: Dict[Tuple[str, Hashable], Set[int]] = {}
+        self._by_key: Dict[str, Set[int]] = {}
+        self._by_origin: Dict[str, Set[int]] = {}
+        self._ts_keys: List[float] = []
+        self._ts_nodes: List[int] = []
+
+    # ----------------- Maintenance -----------------
+
+    def on_encode(self, idx: int, old_payload: Dict[str, Any], payload: Dict[str, Any],
+                  origin: Optional[str], ts: Optional[float]) -> None:
+        """Call before the graph merges `payload` into a node that had `old_payload`."""
+        if self._kv_built:
+            for k, v in payload.items():
+                old = old_payload.get(k, _MISSING)
+                if old is not _MISSING:
+                    if old == v:
+                        continue
+                    if _hashable(old):
+                        self._discard(self._by_kv, (k, old), idx)
+                else:
+                    self._by_key.setdefault(k, set()).add(idx)
+                if _hashable(v):
+                    self._by_kv.setdefault((k, v), set()).add(idx)
+        if origin is not None:
+            prev = self.origin_of(idx)
+            if prev != origin:
+                if prev is not None:
+                    self._discard(self._by_origin, prev, idx)
+                members = self._by_origin.get(origin)
+                if members is not None:
+                    members.add(idx)
+                elif not self._origins_lazy:
+                    self._by_origin[origin] = {idx}
+        if ts is not None and self._ts_built:
+            prev = self.ts_of(idx)
+            if prev != ts:
+                self._drop_ts(idx, prev)
+                self._insert_ts(idx, ts)
+
+    def on_remove(self, idx: int, payload: Dict[str, Any]) -> None:
+        """Forget a node whose payload is being cleared."""
+        if self._kv_built:
+            for k, v in payload.items():
+                self._discard(self._by_key, k, idx)
+                if _hashable(v):
+                    self._discard(self._by_kv, (k, v), idx)
+        origin = self.origin_of(idx)
+        if origin is not None:
+            self._discard(self._by_origin, origin, idx)
+        if self._ts_built:
+            self._drop_ts(idx, self.ts_of(idx))
+
+    def _drop_ts(self, idx: int, prev: Optional[float]) -> None:
+        if prev is not None:
+            i = bisect_left(self._ts_keys, prev)
+            while self._ts_nodes[i] != idx:
+                i += 1
+            del self._ts_keys[i]
+            del self._ts_nodes[i]
+
+    def _insert_ts(self, idx: int, ts: float) -> None:
+        # порядок (ts, idx) — такий самий, як після ts_order() і в сортуванні query()
+        keys, nodes = self._ts_keys, self._ts_nodes
+        if not keys or ts > keys[-1] or (ts == keys[-1] and idx > nodes[-1]):
+            keys.append(ts)
+            nodes.append(idx)
+        else:
+            i = bisect_left(keys, ts)
+            while i < len(keys) and keys[i] == ts and nodes[i] < idx:
+                i += 1
+            keys.insert(i, ts)
+            nodes.insert(i, idx)
+
+    def invalidate(self) -> None:
+        """Drop everything; each part is rebuilt lazily from the graph and the columns."""
+        self._by_kv, self._by_key, self._by_origin = {}, {}, {}
+        self._ts_keys, self._ts_nodes = [], []
+        self._kv_built = self._ts_built = False
+        self._origins_lazy = True
+
+    def build(self) -> None:
+        """Build the lazy parts now (payload indexes and ts order); origin sets stay lazy."""
+        self._ensure_kv()
+        self._ensure_ts()
+
+    def _ensure_kv(self) -> None:
+        if self._kv_built:
+            return
+        g = self.graph
+        for i in np.flatnonzero(self.columns.live[:g.number_of_nodes()]).tolist():
+            for k, v in g.payload_at(i).items():
+                self._by_key.setdefault(k, set()).add(i)
+                if _hashable(v):
+                    self._by_kv.setdefault((k, v), set()).add(i)
+        self._kv_built = True
+
+    def _ensure_ts(self) -> None:
+        if self._ts_built:
+            return
+        nodes, keys = self.columns.ts_order()
+        self._ts_nodes, self._ts_keys = nodes.tolist(), keys.tolist()
+        self._ts_built = True
+
+    def _origin_set(self, origin: str) -> Set[int]:
+        members = self._by_origin.get(origin)
+        if members is None:
+            if not self._origins_lazy:
+                return set()
+            members = set(self.columns.with_origin(origin).tolist())
+            if members:
+                self._by_origin[origin] = members
+        return members
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[int]], key: Any, idx: int) -> None:
+        s = index.get(key)
+        if s is not None:
+            s.discard(idx)
+            if not s:
+                del index[key]
+
+    # ----------------- Lookups -----------------
+
+    def ts_of(self, idx: int) -> Optional[float]:
+        return self.columns.ts_of(idx)
+
+    def origin_of(self, idx: int) -> Optional[str]:
+        return self.columns.origin_of(idx)
+
+    def time_range(self, t_from: Optional[float], t_to: Optional[float]) -> List[int]:
+        self._ensure_ts()
+        lo = 0 if t_from is None else bisect_left(self._ts_keys, t_from)
+        hi = len(self._ts_keys) if t_to is None else bisect_right(self._ts_keys, t_to)
+        return self._ts_nodes[lo:hi]
+
+    def neighborhood(self, seeds: Iterable[int], hops: int, direction: str = "both",
+                     rel_type: Optional[str] = None) -> Set[int]:
+        """Nodes within `hops` bind() edges of the seeds (seeds included)."""
+        g = self.graph
+        seen: Set[int] = set(seeds)
+        frontier = deque((s, 0) for s in seen)
+        while frontier:
+            u, d = frontier.popleft()
+            if d >= hops:
+                continue
+            edges = []
+            if direction in ("out", "both"):
+                edges.append(g.out_edges(u))
+            if direction in ("in", "both"):
+                edges.append(g.in_edges(u))
+            for it in edges:
+                for v, rel in it:
+                    if v in seen or (rel_type is not None and rel != rel_type):
+                        continue
+                    seen.add(v)
+                    frontier.append((v, d + 1))
+        return seen
+
+    def query(self, *, scope: Optional[str] = None, origin: Optional[str] = None,
+              where: Optional[Dict[str, Any]] = None, has: Iterable[str] = (),
+              t_from: Optional[float] = None, t_to: Optional[float] = None,
+              around: Iterable[str] = (), hops: int = 1, direction: str = "both",
+              rel_type: Optional[str] = None, limit: Optional[int] = None) -> List[int]:
+        """Node indices matching every constraint, ordered by ts_T1 (untimed nodes last)."""
+        sets: List[Set[int]] = []
+        if scope is not None:
+            sets.append(self.graph.scope_members(scope))
+        if origin is not None:
+            sets.append(self._origin_set(origin))
+        seeds = [i for i in (self.graph.index_of(n) for n in around) if i is not None]
+        if around:
+            sets.append(self.neighborhood(seeds, hops, direction, rel_type))
+        timed = t_from is not None or t_to is not None
+        where = list((where or {}).items())
+        has = list(has)
+        if not sets and not timed and not where and not has:
+            raise ValueError("KMM.retrieve: at least one constraint is required")
+        direct = False
+        if (where or has) and not self._kv_built:
+            # payload кандидатів перевіряється напряму, поки їх мало; інакше індекси будуються
+            sizes = [len(s) for s in sets]
+            if timed:
+                sizes.append(len(self.time_range(t_from, t_to)))
+            direct = bool(sizes) and min(sizes) <= _DIRECT_MAX
+        if not direct:
+            if where or has:
+                self._ensure_kv()
+            for k, v in where:
+                sets.append(self._by_kv.get((k, v), set()) if _hashable(v) else set())
+            for k in has:
+                sets.append(self._by_key.get(k, set()))
+
+        sets.sort(key=len)
+        n_timed = len(self._ts_keys) if self._ts_built else self.graph.number_of_nodes()
+        if timed and (not sets or len(sets[0]) > n_timed // 8):
+            # часовий діапазон як базовий набір — вже відсортований
+            res = [i for i in self.time_range(t_from, t_to) if all(i in s for s in sets)]
+        else:
+            base, rest = sets[0], sets[1:]
+            res = [i for i in base if all(i in s for s in rest)]
+            if res:
+                idx = np.asarray(res, dtype=np.int64)
+                ts = self.columns.ts_many(idx)
+                if timed:
+                    lo = -np.inf if t_from is None else t_from
+                    hi = np.inf if t_to is None else t_to
+                    keep = (ts >= lo) & (ts <= hi)
+                    idx, ts = idx[keep], ts[keep]
+                ts[np.isnan(ts)] = np.inf
+                res = idx[np.lexsort((idx, ts))].tolist()
+        if direct:
+            payload_at = self.graph.payload_at
+            res = [i for i in res if _payload_matches(payload_at(i), where, has)]
+        return res if limit is None else res[:limit]
+
+
+def _payload_matches(p: Dict[str, Any], where: List[Tuple[str, Any]], has: List[str]) -> bool:
+    """Same answer as the payload indexes: hashable `where` values only."""
+    for k, v in where:
+        if not _hashable(v) or p.get(k, _MISSING) != v:
+            return False
+    return all(k in p for k in has)
@@ -0,0 +1,612 @@
+# kernel/kmm_snapshot.py
+"""
+KMM Snapshots — SPX-OS v0.2
+Versioned on-disk snapshots of KernelMemoryModel, opened through mmap.
+
+File = header + section directory + 8-byte aligned sections:
+  header  "<8sIIQQQQI": magic, version, kind (1 full | 2 delta), generation,
+          base generation, nodes, edges, number of sections
+  dir     "<24sQQ" per section: name, offset, length
+Full snapshot sections:
+  names.off/names.blob   node id string table (int64 offsets + utf-8 blob)
+  ids.table              open-addressing table crc32(name) → idx + 1 (0 = empty)
+  scope                  uint8 per node (0 none, 1 WM, 2 EM)
+  payload.off/.blob      pickled payload per node (empty = no payload)
+  esrc/edst/erel         int64 edge arrays; ekeys/eperm: sorted (src << 32 | dst) → edge
+  out.*/in.*             CSR adjacency (off/nbr/edge)
+  rels.*/origins.*       string tables; col.*: NodeColumns arrays
+Delta sections: meta (first new node, edge, rel_type and origin name), new.* / dirty.*
+node records, new.e* edges, dirty.e* re-typed edges, the rels/origins added since the base,
+and the column rows changed since the base (col.rows + col.*) with the decay factors applied
+in between (col.decay) — rows that only decayed are rebuilt by replaying the factors, so a
+delta costs O(changes), not O(nodes).
+
+Full snapshots taken from the RF tick are split: _FullCapture copies references and
+arrays on the tick thread (payload dicts are never mutated in place, so no pickling),
+then a writer thread encodes and writes the file; deltas wait for it to land.
+
+Restore maps the latest full snapshot: numeric arrays are zero-copy views, node ids and
+payloads are decoded on first access, id lookups probe the on-disk hash table, edge
+lookups binary-search ekeys. Deltas after it are replayed through CompactGraph.
+Payloads are pickled, so snapshot directories must be trusted.
+"""
+
+from __future__ import annotations
+import mmap
+import os
+import pickle
+import re
+import struct
+import threading
+import zlib
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from kernel.kmm_graph import CompactGraph, SCOPES, _DEAD_REL, _REMOVED, _SCOPE_CODE
+from utils.diagnostics import log_error, log_info, log_warn
+
+MAGIC = b"SPXKMM\x00\x01"
+FORMAT_VERSION = 2
+KIND_FULL, KIND_DELTA = 1, 2
+_HEADER = struct.Struct("<8sIIQQQQI")
+_DIRENT = struct.Struct("<24sQQ")
+_FILE_RE = re.compile(r"^kmm-(\d{8})\.(full|delta)$")
+_COLUMN_DTYPES = {
+    "salience": np.float64, "last_access": np.float64, "access": np.int64,
+    "created": np.float64, "live": np.bool_, "ts": np.float64, "origin": np.int32,
+}
+
+
+# ----------------- Encoding helpers -----------------
+
+def _pack_strings(items: Sequence[bytes]) -> Tuple[np.ndarray, bytes]:
+    off = np.zeros(len(items) + 1, dtype=np.int64)
+    if items:
+        np.cumsum(np.fromiter((len(b) for b in items), dtype=np.int64, count=len(items)), out=off[1:])
+    return off, b"".join(items)
+
+
+def _encode_payload(p: Optional[Dict[str, Any]]) -> bytes:
+    return b"" if p is None else pickle.dumps(p, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _decode_payload(b) -> Optional[Dict[str, Any]]:
+    return pickle.loads(b) if len(b) else None
+
+
+def _hash_table(names: Sequence[bytes]) -> np.ndarray:
+    size = 8
+    while size < 2 * len(names):
+        size *= 2
+    mask = size - 1
+    table = [0] * size
+    for i, b in enumerate(names):
+        h = zlib.crc32(b) & mask
+        while table[h]:
+            h = (h + 1) & mask
+        table[h] = i + 1
+    return np.array(table, dtype=np.int64)
+
+
+class _Writer:
+    def __init__(self):
+        self.sections: List[Tuple[str, Any]] = []
+
+    def add(self, name: str, data) -> None:
+        if len(name) > 24:
+            raise ValueError(f"Invalid snapshot section name: {name}")
+        if isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data).tobytes()
+        elif isinstance(data, array):
+            data = data.tobytes()
+        self.sections.append((name, data))
+
+    def write(self, path: str, kind: int, generation: int, base: int, n_nodes: int, n_edges: int) -> None:
+        pos = _HEADER.size + _DIRENT.size * len(self.sections)
+        entries = []
+        for name, data in self.sections:
+            pos = (pos + 7) & ~7
+            entries.append((name, pos, len(data)))
+            pos += len(data)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, kind, generation, base, n_nodes, n_edges, len(entries)))
+            for name, off, ln in entries:
+                f.write(_DIRENT.pack(name.encode("ascii"), off, ln))
+            for (name, data), (_, off, _) in zip(self.sections, entries):
+                f.write(b"\0" * (off - f.tell()))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+
+class SnapshotFile:
+    """mmap-backed reader; sections are returned as zero-copy views."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        head = _HEADER.unpack_from(self._mm, 0)
+        magic, version, self.kind, self.generation, self.base, self.n_nodes, self.n_edges, n_sec = head
+        if magic != MAGIC:
+            raise ValueError(f"Invalid KMM snapshot: {path}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported KMM snapshot version {version}: {path}")
+        self._dir: Dict[str, Tuple[int, int]] = {}
+        for k in range(n_sec):
+            name, off, ln = _DIRENT.unpack_from(self._mm, _HEADER.size + k * _DIRENT.size)
+            self._dir[name.rstrip(b"\0").decode("ascii")] = (off, ln)
+
+    def raw(self, name: str) -> memoryview:
+        off, ln = self._dir[name]
+        return memoryview(self._mm)[off:off + ln]
+
+    def arr(self, name: str, dtype=np.int64) -> np.ndarray:
+        off, ln = self._dir[name]
+        dt = np.dtype(dtype)
+        return np.frombuffer(self._mm, dtype=dt, count=ln // dt.itemsize, offset=off)
+
+    def strings(self, prefix: str) -> List[str]:
+        off, blob = self.arr(prefix + ".off"), self.raw(prefix + ".blob")
+        return [str(blob[off[i]:off[i + 1]], "utf-8") for i in range(len(off) - 1)]
+
+    def payloads(self, prefix: str) -> Iterator[Optional[Dict[str, Any]]]:
+        off, blob = self.arr(prefix + ".off"), self.raw(prefix + ".blob")
+        for i in range(len(off) - 1):
+            yield _decode_payload(blob[off[i]:off[i + 1]])
+
+
+# ----------------- Lazy containers (duck-typed for CompactGraph) -----------------
+
+class _NameTable:
+    """Node ids: snapshot base decoded on access + appended overlay."""
+
+    def __init__(self, off: np.ndarray, blob: memoryview):
+        self._off, self._blob = off, blob
+        self._n = len(off) - 1
+        self._extra: List[str] = []
+
+    def raw(self, i: int) -> bytes:
+        if i < self._n:
+            return bytes(self._blob[self._off[i]:self._off[i + 1]])
+        return self._extra[i - self._n].encode("utf-8")
+
+    def __getitem__(self, i: int) -> str:
+        if i < self._n:
+            return str(self._blob[self._off[i]:self._off[i + 1]], "utf-8")
+        return self._extra[i - self._n]
+
+    def __len__(self) -> int:
+        return self._n + len(self._extra)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, name: str) -> None:
+        self._extra.append(name)
+
+    def clone(self) -> "_NameTable":
+        c = _NameTable.__new__(_NameTable)
+        c._off, c._blob, c._n, c._extra = self._off, self._blob, self._n, list(self._extra)
+        return c
+
+
+class _IdMap:
+    """name → idx: probes the snapshot hash table, new names live in a dict."""
+
+    def __init__(self, table: np.ndarray, names: _NameTable):
+        self._table, self._mask, self._names = table, len(table) - 1, names
+        self._extra: Dict[str, int] = {}
+
+    def get(self, name: str, default=None):
+        i = self._extra.get(name)
+        if i is not None:
+            return i
+        b = name.encode("utf-8")
+        h = zlib.crc32(b) & self._mask
+        t = self._table
+        while True:
+            v = int(t[h])
+            if v == 0:
+                return default
+            if self._names.raw(v - 1) == b:
+                return v - 1
+            h = (h + 1) & self._mask
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def __setitem__(self, name: str, idx: int) -> None:
+        self._extra[name] = idx
+
+
+class _PayloadTable:
+    """Payload dicts: unpickled on first access (then cached and mutable)."""
+
+    def __init__(self, off: np.ndarray, blob: memoryview):
+        self._off, self._blob = off, blob
+        self._n = len(off) - 1
+        self._cache: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._extra: List[Optional[Dict[str, Any]]] = []
+
+    def raw(self, i: int) -> Optional[bytes]:
+        """Encoded payload if still untouched in the snapshot, else None."""
+        if i < self._n and i not in self._cache:
+            return bytes(self._blob[self._off[i]:self._off[i + 1]])
+        return None
+
+    def __getitem__(self, i: int):
+        if i >= self._n:
+            return self._extra[i - self._n]
+        try:
+            return self._cache[i]
+        except KeyError:
+            p = self._cache[i] = _decode_payload(self._blob[self._off[i]:self._off[i + 1]])
+            return p
+
+    def __setitem__(self, i: int, v) -> None:
+        if i < self._n:
+            self._cache[i] = v
+        else:
+            self._extra[i - self._n] = v
+
+    def __len__(self) -> int:
+        return self._n + len(self._extra)
+
+    def append(self, v) -> None:
+        self._extra.append(v)
+
+    def clone(self) -> "_PayloadTable":
+        c = _PayloadTable.__new__(_PayloadTable)
+        c._off, c._blob, c._n = self._off, self._blob, self._n
+        c._cache, c._extra = dict(self._cache), list(self._extra)
+        return c
+
+
+class _EdgeMap:
+    """(src << 32 | dst) → edge: binary search over sorted snapshot keys + dict overlay."""
+
+    def __init__(self, keys: np.ndarray, perm: np.ndarray):
+        self._keys, self._perm = keys, perm
+        self._extra: Dict[int, int] = {}
+
+    def get(self, key: int, default=None):
+        e = self._extra.get(key)
+        if e is not None:
+            return e
+        j = int(np.searchsorted(self._keys, key))
+        if j < len(self._keys) and self._keys[j] == key:
+            return int(self._perm[j])
+        return default
+
+    def __contains__(self, key: int) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key: int, e: int) -> None:
+        self._extra[key] = e
+
+
+# ----------------- Graph ⇄ sections -----------------
+
+def _name_bytes(names, i: int) -> bytes:
+    return names.raw(i) if isinstance(names, _NameTable) else names[i].encode("utf-8")
+
+
+def _payload_bytes(payloads, i: int) -> bytes:
+    if isinstance(payloads, _PayloadTable):
+        b = payloads.raw(i)
+        if b is not None:
+            return b
+    return _encode_payload(payloads[i])
+
+
+def _column_arrays(kmm, n: int) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """Copies of the first n rows of every column plus the origin names."""
+    cols = kmm.columns
+    if n:
+        cols._ensure(n - 1)         # вузли лише з bind() ще не мають рядка в колонках
+    arrays = {name: np.array(getattr(cols, name)[:n], dtype=dt) for name, dt in _COLUMN_DTYPES.items()}
+    return arrays, list(cols.origin_names)
+
+
+def _add_columns(w: _Writer, arrays: Dict[str, np.ndarray], origins: List[str]) -> None:
+    for name, a in arrays.items():
+        w.add("col." + name, a)
+    off, blob = _pack_strings([o.encode("utf-8") for o in origins])
+    w.add("origins.off", off)
+    w.add("origins.blob", blob)
+
+
+def _add_rels(w: _Writer, rel_names: Sequence[str]) -> None:
+    off, blob = _pack_strings([r.encode("utf-8") for r in rel_names])
+    w.add("rels.off", off)
+    w.add("rels.blob", blob)
+
+
+def _add_nodes(w: _Writer, prefix: str, g: CompactGraph, idxs: Sequence[int], names: bool) -> None:
+    if names:
+        off, blob = _pack_strings([_name_bytes(g._names, i) for i in idxs])
+        w.add(prefix + "names.off", off)
+        w.add(prefix + "names.blob", blob)
+    w.add(prefix + "scope", bytes(g._scope[i] for i in idxs))
+    off, blob = _pack_strings([_payload_bytes(g._payload, i) for i in idxs])
+    w.add(prefix + "payload.off", off)
+    w.add(prefix + "payload.blob", blob)
+
+
+def _edge_array(a, e: int) -> np.ndarray:
+    return np.frombuffer(memoryview(a).cast("B"), dtype=np.int64).copy() if e else np.zeros(0, np.int64)
+
+
+def _csr(n: int, heads: np.ndarray, tails: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(off, nbr, edge) like _Adjacency.rebuild: edges of a node in edge-index order."""
+    off = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=n), out=off[1:])
+    edge = np.argsort(heads, kind="stable").astype(np.int64)
+    return off, tails[edge], edge
+
+
+class _FullCapture:
+    """
+    Point-in-time copy of what a full snapshot contains, taken on the tick thread.
+    O(nodes) reference and array copies, no encoding: the name/payload containers are
+    shallow-copied (payload dicts are replaced on update, never mutated), edges and
+    columns are memcpy'd.
+    """
+
+    def __init__(self, kmm):
+        g: CompactGraph = kmm.graph
+        self.n, self.e = g.number_of_nodes(), len(g._esrc)      # з надгробками: індекси стабільні
+        clone = lambda c: c.clone() if isinstance(c, (_NameTable, _PayloadTable)) else list(c)
+        self.names = clone(g._names)
+        self.payloads = clone(g._payload)
+        self.scope = bytes(g._scope)
+        self.esrc, self.edst, self.erel = (_edge_array(a, self.e) for a in (g._esrc, g._edst, g._erel))
+        self.rels = list(g._rel_names)
+        self.columns, self.origins = _column_arrays(kmm, self.n)
+
+
+def write_full(path: str, cap: _FullCapture, generation: int) -> None:
+    n, e = cap.n, cap.e
+    w = _Writer()
+    name_bytes = [_name_bytes(cap.names, i) for i in range(n)]
+    off, blob = _pack_strings(name_bytes)
+    w.add("names.off", off)
+    w.add("names.blob", blob)
+    w.add("ids.table", _hash_table(name_bytes))
+    del name_bytes
+    w.add("scope", cap.scope)
+    off, blob = _pack_strings([_payload_bytes(cap.payloads, i) for i in range(n)])
+    w.add("payload.off", off)
+    w.add("payload.blob", blob)
+
+    src, dst = cap.esrc, cap.edst
+    w.add("esrc", src)
+    w.add("edst", dst)
+    w.add("erel", cap.erel)
+    keys = (src << 32) | dst
+    perm = np.argsort(keys, kind="stable")
+    w.add("ekeys", keys[perm])
+    w.add("eperm", perm.astype(np.int64))
+    for tag, (heads, tails) in (("out", (src, dst)), ("in", (dst, src))):
+        for k, a in zip(("off", "nbr", "edge"), _csr(n, heads, tails)):
+            w.add(f"{tag}.{k}", a)
+    _add_rels(w, cap.rels)
+    _add_columns(w, cap.columns, cap.origins)
+    w.write(path, KIND_FULL, generation, generation, n, e)
+
+
+def write_delta(path: str, kmm, generation: int, base: int) -> None:
+    g: CompactGraph = kmm.graph
+    cols = kmm.columns
+    first_n, dirty, first_e, dirty_e, first_rel = g.take_delta()
+    n, e = g.number_of_nodes(), len(g._esrc)
+    rows, decays, first_origin = cols.take_delta(n)
+    w = _Writer()
+    w.add("meta", np.array([first_n, first_e, first_rel, first_origin], dtype=np.int64))
+    _add_nodes(w, "new.", g, range(first_n, n), names=True)
+    w.add("dirty.idx", np.array(dirty, dtype=np.int64))
+    _add_nodes(w, "dirty.", g, dirty, names=False)
+    w.add("new.esrc", np.array(g._esrc[first_e:], dtype=np.int64))
+    w.add("new.edst", np.array(g._edst[first_e:], dtype=np.int64))
+    w.add("new.erel", np.array(g._erel[first_e:], dtype=np.int64))
+    w.add("dirty.eidx", np.array(dirty_e, dtype=np.int64))
+    w.add("dirty.erel", np.array([g._erel[k] for k in dirty_e], dtype=np.int64))
+    _add_rels(w, g._rel_names[first_rel:])
+    w.add("col.rows", rows.astype(np.int64))
+    _add_columns(w, {name: getattr(cols, name)[rows] for name in _COLUMN_DTYPES},
+                 cols.origin_names[first_origin:])
+    w.add("col.decay", np.array(decays, dtype=np.float64))
+    w.write(path, KIND_DELTA, generation, base, n, e)
+
+
+def _load_columns(kmm, snap: SnapshotFile) -> None:
+    arrays = {name: snap.arr("col." + name, dt) for name, dt in _COLUMN_DTYPES.items()}
+    kmm.columns.load(arrays, snap.strings("origins"))
+
+
+def open_full(kmm, snap: SnapshotFile) -> CompactGraph:
+    """Graph backed by the mapped snapshot (nothing is decoded up front)."""
+    g = CompactGraph()
+    names = _NameTable(snap.arr("names.off"), snap.raw("names.blob"))
+    g._names = names
+    g._ids = _IdMap(snap.arr("ids.table"), names)
+    g._scope = bytearray(snap.raw("scope"))
+    g._payload = _PayloadTable(snap.arr("payload.off"), snap.raw("payload.blob"))
+    g._members = {s: None for s in SCOPES}
+    g._counts = {s: g._scope.count(_SCOPE_CODE[s]) for s in SCOPES}
+    g._removed = g._scope.count(_REMOVED)
+    g._esrc, g._edst, g._erel = (snap.raw(k).cast("q") for k in ("esrc", "edst", "erel"))
+    g._edges_mapped = True
+    g._dead_edges = int(np.count_nonzero(snap.arr("erel") == _DEAD_REL))
+    g._edge_ids = _EdgeMap(snap.arr("ekeys"), snap.arr("eperm"))
+    g._rel_names = snap.strings("rels")
+    g._rel_ids = {r: i for i, r in enumerate(g._rel_names)}
+    for tag, adj in (("out", g._out), ("in", g._in)):
+        adj.off, adj.nbr, adj.edge = (snap.raw(f"{tag}.{k}").cast("q") for k in ("off", "nbr", "edge"))
+    g.mark_checkpoint()
+    _load_columns(kmm, snap)
+    return g
+
+
+def apply_delta(kmm, snap: SnapshotFile) -> None:
+    g: CompactGraph = kmm.graph
+    cols = kmm.columns
+    first_n, first_e, first_rel, first_origin = (int(x) for x in snap.arr("meta"))
+    if (first_n, first_e, first_rel, first_origin) != (g.number_of_nodes(), len(g._esrc),
+                                                       len(g._rel_names), len(cols.origin_names)):
+        raise ValueError(f"KMM delta does not match its base: {snap.path}")
+    for r in snap.strings("rels"):
+        g._rel_id(r)
+    scopes = bytes(snap.raw("new.scope"))
+    for k, (name, payload) in enumerate(zip(snap.strings("new.names"), snap.payloads("new.payload"))):
+        g.restore_node(g.intern(name), scopes[k], payload)
+    scopes = bytes(snap.raw("dirty.scope"))
+    for k, (i, payload) in enumerate(zip(snap.arr("dirty.idx").tolist(), snap.payloads("dirty.payload"))):
+        g.restore_node(i, scopes[k], payload)
+    # за індексами, а не add_edge(): intern() оживив би видалені вузли
+    for u, v, r in zip(snap.arr("new.esrc").tolist(), snap.arr("new.edst").tolist(), snap.arr("new.erel").tolist()):
+        g._link(u, v, r)
+    for k, r in zip(snap.arr("dirty.eidx").tolist(), snap.arr("dirty.erel").tolist()):
+        g._set_rel(k, r)
+    g.mark_checkpoint()
+    arrays = {name: snap.arr("col." + name, dt) for name, dt in _COLUMN_DTYPES.items()}
+    cols.apply_delta(snap.n_nodes, snap.arr("col.rows"), arrays, snap.arr("col.decay", np.float64).tolist(),
+                     snap.strings("origins"))
+
+
+# ----------------- Store -----------------
+
+class KMMSnapshotStore:
+    """
+    Directory of kmm-<generation>.full / kmm-<generation>.delta files.
+      - checkpoint(): a delta on top of the current chain, or a full snapshot when there is
+        no base yet, the chain has `full_every` deltas, or full=True
+      - restore(): latest full snapshot + its contiguous deltas
+      - after a full snapshot, chains older than the previous full one are deleted
+      - background=True: a full snapshot is captured on the caller's thread and written by
+        a writer thread; the next checkpoint() waits for it (busy tells whether it is running)
+    """
+
+    def __init__(self, directory: str, full_every: int = 8):
+        if full_every < 1:
+            raise ValueError("Invalid snapshot full_every")
+        self.directory = directory
+        self.full_every = full_every
+        self.generation: Optional[int] = None     # останнє покоління, що відповідає пам'яті
+        self._deltas_since_full = 0
+        self._files: List[SnapshotFile] = []      # тримаємо mmap відкритими
+        self._writer: Optional[threading.Thread] = None
+
+    def _path(self, gen: int, kind: str) -> str:
+        return os.path.join(self.directory, f"kmm-{gen:08d}.{kind}")
+
+    def _listing(self) -> List[Tuple[int, str]]:
+        if not os.path.isdir(self.directory):
+            return []
+        out = []
+        for f in os.listdir(self.directory):
+            m = _FILE_RE.match(f)
+            if m:
+                out.append((int(m.group(1)), m.group(2)))
+        return sorted(out)
+
+    def latest_chain(self) -> List[str]:
+        files = self._listing()
+        fulls = [g for g, k in files if k == "full"]
+        if not fulls:
+            return []
+        start = fulls[-1]
+        chain = [self._path(start, "full")]
+        for g, k in files:
+            if g > start and k == "delta":
+                chain.append(self._path(g, k))
+        return chain
+
+    def restore(self, kmm) -> Optional[int]:
+        chain = self.latest_chain()
+        if not chain:
+            return None
+        full = SnapshotFile(chain[0])
+        kmm._adopt_graph(open_full(kmm, full))
+        self._files = [full]
+        gen = full.generation
+        for path in chain[1:]:
+            snap = SnapshotFile(path)
+            if snap.base != gen:
+                log_warn("KMM snapshot: broken delta chain at %s, stopping", path, sub="kmm")
+                break
+            apply_delta(kmm, snap)
+            self._files.append(snap)
+            gen = snap.generation
+        self.generation = gen
+        self._deltas_since_full = len(self._files) - 1
+        return gen
+
+    @property
+    def busy(self) -> bool:
+        return self._writer is not None and self._writer.is_alive()
+
+    def wait(self) -> None:
+        """Block until a background full snapshot (if any) is on disk."""
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+
+    def _write_full(self, path: str, cap: _FullCapture, gen: int) -> None:
+        write_full(path, cap, gen)
+        self._prune(gen)
+        log_info("KMM: checkpoint %s", os.path.basename(path), sub="kmm")
+
+    def _write_full_bg(self, path: str, cap: _FullCapture, gen: int) -> None:
+        try:
+            self._write_full(path, cap, gen)
+        except Exception as e:
+            self.generation = None           # дельти без бази не пишемо → наступний знімок повний
+            log_error("KMM snapshot: background %s failed: %r", os.path.basename(path), e, sub="kmm")
+
+    def checkpoint(self, kmm, full: bool = False, background: bool = False) -> str:
+        self.wait()
+        os.makedirs(self.directory, exist_ok=True)
+        last = self._listing()
+        gen = (last[-1][0] if last else 0) + 1
+        if full or self.generation is None or self._deltas_since_full >= self.full_every:
+            path = self._path(gen, "full")
+            cap = _FullCapture(kmm)
+            kmm.graph.mark_checkpoint()
+            kmm.columns.mark_checkpoint()
+            self._deltas_since_full = 0
+            self.generation = gen
+            if background:
+                self._writer = threading.Thread(target=self._write_full_bg, args=(path, cap, gen),
+                                                name="spx-kmm-snapshot")
+                self._writer.start()
+                return path
+            try:
+                self._write_full(path, cap, gen)
+            except BaseException:
+                self.generation = None
+                raise
+            return path
+        path = self._path(gen, "delta")
+        try:
+            write_delta(path, kmm, gen, self.generation)
+        except BaseException:
+            self.generation = None           # облік змін уже скинуто → наступний знімок повний
+            raise
+        self._deltas_since_full += 1
+        self.generation = gen
+        log_info("KMM: checkpoint %s", os.path.basename(path), sub="kmm")
+        return path
+
+    def _prune(self, newest_full: int) -> None:
+        fulls = [g for g, k in self._listing() if k == "full" and g < newest_full]
+        if not fulls:
+            return
+        keep_from = fulls[-1]
+        for g, k in self._listing():
+            if g < keep_from:
+                os.remove(self._path(g, k))
@@ -1,9 +1,19 @@
 # kernel/kms.py
 from __future__ import annotations
+import heapq
+import threading
 from dataclasses import dataclass
-from time import monotonic
-from typing import List, Dict, Any, Union, Optional
+from itertools import count
+from typing import List, Dict, Any, Union, Optional, Iterator, Tuple
 from utils.diagnostics import log_info
+from utils.metrics import REGISTRY, Family, compute_cognitive_debt
+from utils.time_utils import get_T0
+from utils.tracing import instant
+
+SYSTEM_ORDER = ("PID0", "ROOT")   # у RF завжди першими, у такому порядку
+
+_RF_ENTRIES = REGISTRY.counter("spx_kms_rf_entries_total", "HB → RF transitions")
+_RF_SECONDS = REGISTRY.histogram("spx_kms_rf_slot_seconds", "Duration of one RF slot (enter → exit)")
 
 @dataclass
 class _KMSCfg:
@@ -12,86 +22,270 @@ class _KMSCfg:
     rf_max_cycles: int = 2
     kernel_overload_threshold: int = 6
     fairness_decay: float = 0.85
+    mode: str = "classic"          # "classic" | "heap"
+    rf_window_max: int = 64        # лише для heap: скільки кандидатів бере RF window
+    hb_policy: str = "rr"          # "rr" | "weighted" (DRR за T1_multiplier)
+    cost_weight: float = 1.0       # внесок виміряної вартості (частка бюджету) у debt
+    cost_alpha: float = 0.3        # EWMA-згладжування вартості
+    debt_threshold: int = 0        # system.rf_triggers: когнітивний борг (0 = вимкнено)
+    entropy_threshold: float = 0.0 # system.rf_triggers: ентропія WM (0 = вимкнено)
+    rf_cooldown: float = 0.0       # system.rf_cooldown: сек після виходу з RF без нового входу
 
 class KernelMetaScheduler:
     """
     KMS v0.2 (Hybrid):
       - HB: round-robin hb_cycle()
       - RF: вікно суб'єктів з найбільшим debt; rf_cycle(); fairness decay
-      - Тригери входу в RF: debt ≥ rf_trigger_debt або kernel_overload
+      - debt = max(0, subject_len − hb_processed) + cost_weight · EWMA(wall / budget)
+      - Тригери входу в RF: debt ≥ rf_trigger_debt, kernel_overload або когнітивні
+        тригери system.rf_triggers:
+          compute_cognitive_debt(subject_total_len + kmm.pending_consolidations,
+                                 debt_threshold) ≥ 1.0
+          kmm.memory_entropy() ≥ entropy_threshold (лише коли є pending консолідації)
+        когнітивний тригер входить у RF навіть з порожнім вікном (консолідація — справа ядра)
+      - Після виходу з RF нові входи блокуються на rf_cooldown секунд
       - Вікно RF обмежене rf_max_cycles; після — повернення у HB
+      - RF порядок: PID0 → ROOT (якщо зареєстровані) → інші з вікна
+
+    Режими обліку debt:
+      - "classic": debt перераховується з kem.subject_len() для кожного суб'єкта щотакту
+      - "heap": KEM повідомляє зміни глибини черги суб'єкта; debt оновлюється
+        інкрементально, RF-кандидати беруться з max-heap за debt (≤ rf_window_max)
+    Політика HB:
+      - "rr": кожен суб'єкт отримує рівно один HB-слот за такт; суб'єкт з вагою < 1
+        (watchdog demote) пропускає такти: deficit += weight, слот — коли deficit ≥ 1
+      - "weighted": deficit round robin; T1_multiplier суб'єкта — його частка.
+        За такт deficit += weight, суб'єкт отримує floor(deficit) слотів,
+        слоти чергуються раундами (A B A B …), дробова частина переноситься
+    Реєстрація/дереєстрація O(1); порядок такту віддається ітератором.
     """
 
+    MODES = ("classic", "heap")
+    HB_POLICIES = ("rr", "weighted")
+
     def __init__(self, cfg: _KMSCfg):
+        if cfg.mode not in self.MODES:
+            raise ValueError("Invalid KMS mode")
+        if cfg.hb_policy not in self.HB_POLICIES:
+            raise ValueError("Invalid KMS hb_policy")
         self.cfg = cfg
-        self._subjects: List[str] = []
+        # кільце реєстрації: _ring може містити "дірки" після deregister()
+        self._ring: List[str] = []
+        self._members: Dict[str, int] = {}     # sid -> позиція у _ring
         self._rr_idx: int = 0
 
         self._phase: str = "HB"         # "HB" | "RF"
         self._rf_started_at: Optional[float] = None
+        self._rf_exited_at: Optional[float] = None
         self._rf_cycles_left: int = 0
         self._rf_window: List[str] = []
+        self._cognitive: Dict[str, float] = {"debt": 0.0, "entropy": 0.0, "pending": 0}
 
         # прості метрики
         self._hb_processed: Dict[str, int] = {}   # к-ть циклів HB суб'єкта
+        self._hb_served: Dict[str, int] = {}      # к-ть HB-слотів, виданих планувальником
         self._last_debt: Dict[str, float] = {}    # відслідковуємо debt
+        self._cost: Dict[str, float] = {}         # EWMA вартості викликів (у частках бюджету)
+
+        # weighted HB (DRR)
+        self._weights: Dict[str, float] = {}
+        self._deficit: Dict[str, float] = {}
+
+        # heap-режим: інкрементальний debt
+        self._kem = None
+        self._qlen: Dict[str, int] = {}
+        self._debt_heap: List[Tuple[float, int, str]] = []   # (-debt, seq, sid), ліниве видалення
+        self._heap_seq = count()
+        # облік debt може оновлюватись з потоків KEM/воркерів HB
+        self._debt_lock = threading.RLock()
+        REGISTRY.register_collector("kms", self._collect)
 
     @classmethod
     def init(cls, system_cfg: Dict[str, Any]) -> "KernelMetaScheduler":
         # зберігаємо зворотну сумісність (старі ключі можуть бути у system_cfg)
         sched = (system_cfg or {}).get("scheduler", {}) or {}
+        triggers = (system_cfg or {}).get("rf_triggers", {}) or {}
         cfg = _KMSCfg(
             hb_period=float(system_cfg.get("hb_period", 0.15)),
             rf_trigger_debt=int(sched.get("rf_trigger_debt", 4)),
             rf_max_cycles=int(sched.get("rf_max_cycles", 2)),
             kernel_overload_threshold=int(sched.get("kernel_overload_threshold", 6)),
             fairness_decay=float(sched.get("fairness_decay", 0.85)),
+            mode=str(sched.get("mode", "classic")),
+            rf_window_max=int(sched.get("rf_window_max", 64)),
+            hb_policy=str(sched.get("hb_policy", "rr")),
+            cost_weight=float(sched.get("cost_weight", 1.0)),
+            cost_alpha=float(sched.get("cost_alpha", 0.3)),
+            debt_threshold=int(triggers.get("debt_threshold", 0)),
+            entropy_threshold=float(triggers.get("entropy_threshold", 0.0)),
+            rf_cooldown=float(system_cfg.get("rf_cooldown", 0.0)),
         )
         return cls(cfg)
 
     # ----------------- Registration -----------------
 
-    def register(self, subject_or_id: Union[str, Any]) -> None:
+    @staticmethod
+    def _weight_of(subject_or_id: Union[str, Any]) -> float:
+        # SubjectMetadata.t1_multiplier або cfg["T1_multiplier"] суб'єкта; інакше 1.0
+        w = getattr(subject_or_id, "t1_multiplier", None)
+        if w is None:
+            cfg = getattr(subject_or_id, "cfg", None)
+            if isinstance(cfg, dict):
+                w = cfg.get("T1_multiplier")
+        return float(w) if w is not None else 1.0
+
+    def register(self, subject_or_id: Union[str, Any], weight: Optional[float] = None) -> None:
         sid = subject_or_id if isinstance(subject_or_id, str) else getattr(subject_or_id, "subject_id", None)
         if not sid:
             raise ValueError("KMS.register: subject id not provided")
-        if sid not in self._subjects:
-            self._subjects.append(sid)
+        if sid not in self._members:
+            self._members[sid] = len(self._ring)
+            self._ring.append(sid)
             self._hb_processed.setdefault(sid, 0)
+            self._hb_served.setdefault(sid, 0)
             self._last_debt.setdefault(sid, 0.0)
+            self.set_weight(sid, weight if weight is not None else self._weight_of(subject_or_id))
+            if self._kem is not None:
+                self._on_depth(sid, self._kem.subject_len(sid))
+
+    def deregister(self, subject_id: str) -> None:
+        if self._members.pop(subject_id, None) is None:
+            return
+        self._hb_processed.pop(subject_id, None)
+        self._hb_served.pop(subject_id, None)
+        self._weights.pop(subject_id, None)
+        self._deficit.pop(subject_id, None)
+        self._cost.pop(subject_id, None)
+        self._last_debt.pop(subject_id, None)
+        self._qlen.pop(subject_id, None)
+        if subject_id in self._rf_window:
+            self._rf_window.remove(subject_id)
+
+    def set_weight(self, subject_id: str, weight: float) -> None:
+        if weight <= 0:
+            raise ValueError("KMS.set_weight: weight must be > 0")
+        self._weights[subject_id] = float(weight)
+
+    def weight(self, subject_id: str) -> float:
+        return self._weights.get(subject_id, 1.0)
+
+    def _maybe_compact_ring(self) -> None:
+        holes = len(self._ring) - len(self._members)
+        if holes <= len(self._members) + 16:
+            return
+        live_before_rr = sum(1 for i in range(min(self._rr_idx, len(self._ring))) if self._is_live(i))
+        self._ring = [sid for i, sid in enumerate(self._ring) if self._is_live(i)]
+        self._members = {sid: i for i, sid in enumerate(self._ring)}
+        self._rr_idx = live_before_rr % len(self._ring) if self._ring else 0
+
+    def _is_live(self, pos: int) -> bool:
+        return self._members.get(self._ring[pos]) == pos
+
+    def subjects(self) -> List[str]:
+        return [sid for i, sid in enumerate(self._ring) if self._is_live(i)]
 
     # ----------------- Debt model -----------------
 
     def _compute_debt(self, kem) -> Dict[str, float]:
         debt: Dict[str, float] = {}
-        for sid in self._subjects:
+        for sid in self._members:
             qlen = kem.subject_len(sid)
             hb = self._hb_processed.get(sid, 0)
-            debt[sid] = max(0.0, float(qlen - hb))
+            debt[sid] = max(0.0, float(qlen - hb)) + self.cfg.cost_weight * self._cost.get(sid, 0.0)
         return debt
 
+    def _cooling_down(self) -> bool:
+        return self._rf_exited_at is not None and get_T0() - self._rf_exited_at < self.cfg.rf_cooldown
+
+    def _cognitive_trigger(self, kem, kmm) -> bool:
+        c = self.cfg
+        if c.debt_threshold <= 0 and c.entropy_threshold <= 0:
+            return False
+        backlog = kem.subject_total_len() if kem is not None else 0
+        pending = kmm.pending_consolidations if kmm is not None else 0
+        debt = compute_cognitive_debt(backlog + pending, c.debt_threshold)
+        entropy = kmm.memory_entropy() if kmm is not None else 0.0
+        self._cognitive = {"debt": debt, "entropy": entropy, "pending": pending}
+        return debt >= 1.0 or (pending > 0 and 0 < c.entropy_threshold <= entropy)
+
     def _kernel_overloaded(self, kem) -> bool:
         try:
             return kem.kernel_len() >= self.cfg.kernel_overload_threshold
         except Exception:
             return False
 
+    # heap-режим
+
+    def _attach(self, kem) -> None:
+        self._kem = kem
+        kem.add_depth_listener(self._on_depth)
+        for sid in self._members:
+            self._on_depth(sid, kem.subject_len(sid))
+
+    def _on_depth(self, subject_id: Optional[str], depth: int) -> None:
+        if subject_id not in self._members:
+            return
+        with self._debt_lock:
+            self._qlen[subject_id] = depth
+            self._refresh_debt(subject_id)
+
+    def _refresh_debt(self, sid: str) -> None:
+        d = max(0.0, float(self._qlen.get(sid, 0) - self._hb_processed.get(sid, 0)))
+        d += self.cfg.cost_weight * self._cost.get(sid, 0.0)
+        if d == self._last_debt.get(sid):
+            return
+        self._last_debt[sid] = d
+        if d > 0.0:
+            heapq.heappush(self._debt_heap, (-d, next(self._heap_seq), sid))
+            if len(self._debt_heap) > 4 * len(self._members) + 64:
+                self._debt_heap = [(-v, next(self._heap_seq), s) for s, v in self._last_debt.items() if v > 0.0]
+                heapq.heapify(self._debt_heap)
+
+    def _heap_valid(self, entry: Tuple[float, int, str]) -> bool:
+        return entry[2] in self._members and self._last_debt.get(entry[2]) == -entry[0]
+
+    def _max_debt(self) -> float:
+        h = self._debt_heap
+        while h and not self._heap_valid(h[0]):
+            heapq.heappop(h)
+        return -h[0][0] if h else 0.0
+
+    def _top_debtors(self, k: int) -> List[str]:
+        """До k суб'єктів з найбільшим debt > 0 (heap лишається незмінним)."""
+        taken: List[Tuple[float, int, str]] = []
+        seen = set()
+        h = self._debt_heap
+        while h and len(taken) < k:
+            e = heapq.heappop(h)
+            if self._heap_valid(e) and e[2] not in seen:
+                seen.add(e[2])
+                taken.append(e)
+        for e in taken:
+            heapq.heappush(h, e)
+        return [e[2] for e in taken]
+
     # ----------------- Phase control -----------------
 
     def phase(self) -> str:
         return self._phase
 
     def on_cycle_begin(self, kem, kmm) -> None:
+        if self.cfg.mode == "heap":
+            self._on_cycle_begin_heap(kem, kmm)
+            return
         # Переоцінюємо debt перед кожним зовнішнім тактом
         debt = self._compute_debt(kem)
 
         if self._phase == "HB":
-            # Тригери входу в RF
-            if any(v >= self.cfg.rf_trigger_debt for v in debt.values()) or self._kernel_overloaded(kem):
+            # Тригери входу в RF (не під час rf_cooldown)
+            cognitive = not self._cooling_down() and self._cognitive_trigger(kem, kmm)
+            if not self._cooling_down() and (
+                    any(v >= self.cfg.rf_trigger_debt for v in debt.values())
+                    or self._kernel_overloaded(kem) or cognitive):
                 # Вибір RF window: суб'єкти з найбільшим debt (стабільне сортування)
-                ranked = sorted(self._subjects, key=lambda s: debt.get(s, 0.0), reverse=True)
-                self._rf_window = [s for s in ranked if debt.get(s, 0.0) > 0.0]
-                if self._rf_window:
+                ranked = sorted(self.subjects(), key=lambda s: debt.get(s, 0.0), reverse=True)
+                self._rf_window = self._with_system_first([s for s in ranked if debt.get(s, 0.0) > 0.0])
+                if self._rf_window or cognitive:
                     self._enter_rf()
         else:
             # У RF працюємо обмежену к-сть циклів
@@ -106,51 +300,163 @@ class KernelMetaScheduler:
         # зберігаємо останню оцінку debt для діагностики
         self._last_debt = debt
 
+    def _on_cycle_begin_heap(self, kem, kmm) -> None:
+        if self._kem is not kem:
+            self._attach(kem)
+        if self._phase == "HB":
+            if self._cooling_down():
+                return
+            with self._debt_lock:
+                trigger = self._max_debt() >= self.cfg.rf_trigger_debt
+            cognitive = self._cognitive_trigger(kem, kmm)
+            if trigger or self._kernel_overloaded(kem) or cognitive:
+                with self._debt_lock:
+                    top = self._top_debtors(self.cfg.rf_window_max)
+                self._rf_window = self._with_system_first(top)
+                if self._rf_window or cognitive:
+                    self._enter_rf()
+        elif self._rf_cycles_left <= 0:
+            self._exit_rf()
+        else:
+            self._rf_cycles_left -= 1
+
+    def _with_system_first(self, window: List[str]) -> List[str]:
+        """PID0 → ROOT (якщо зареєстровані) → решта вікна в заданому порядку, за один прохід."""
+        head = [s for s in SYSTEM_ORDER if s in self._members]
+        if not head:
+            return window
+        return head + [s for s in window if s not in SYSTEM_ORDER]
+
     def on_cycle_end(self) -> None:
         pass
 
     def _enter_rf(self) -> None:
         self._phase = "RF"
-        self._rf_started_at = monotonic()
+        self._rf_started_at = get_T0()
         self._rf_cycles_left = self.cfg.rf_max_cycles
-        log_info(f"KMS: entering RF (window={self._rf_window})")
+        _RF_ENTRIES.inc()
+        instant("kms.enter_rf", "kms", window=len(self._rf_window))
+        log_info("KMS: entering RF (window=%s)", self._rf_window, sub="kms")
 
     def _exit_rf(self) -> None:
+        if self._rf_started_at is not None:
+            _RF_SECONDS.observe(get_T0() - self._rf_started_at)
+        instant("kms.exit_rf", "kms")
         self._phase = "HB"
         self._rf_started_at = None
+        self._rf_exited_at = get_T0()
         self._rf_cycles_left = 0
         self._rf_window = []
-        log_info("KMS: exiting RF → HB")
+        log_info("KMS: exiting RF → HB", sub="kms")
 
     # ----------------- Scheduling order -----------------
 
-    def schedule_cycle_order(self) -> List[str]:
-        if not self._subjects:
-            return []
+    def iter_cycle_order(self) -> Iterator[str]:
+        """
+        Порядок поточного такту як ітератор (без копії списку суб'єктів).
+        HB: round-robin з кроком 1 за такт; RF: вікно RF (PID0 → ROOT → інші).
+        """
+        if not self._members:
+            return iter(())
         if self._phase == "RF":
-            # PID0 → ROOT → інші з RF window у такому ж порядку
-            pid0_first = [s for s in self._rf_window if s.upper() == "PID0"]
-            root_second = [s for s in self._rf_window if s.upper() == "ROOT"]
-            others = [s for s in self._rf_window if s.upper() not in ("PID0", "ROOT")]
-            order = pid0_first + root_second + others
-            return order if order else self._subjects[:]  # fallback
-        # HB: round-robin
-        order = self._subjects[self._rr_idx:] + self._subjects[:self._rr_idx]
-        self._rr_idx = (self._rr_idx + 1) % len(self._subjects)
-        return order
+            return iter(self._rf_window) if self._rf_window else self._rr_iter(0)
+        self._maybe_compact_ring()
+        start = self._rr_idx % len(self._ring)
+        self._rr_idx = (start + 1) % len(self._ring)
+        if self.cfg.hb_policy == "weighted":
+            return self._drr_iter(start)
+        order = self._rr_iter(start)
+        return self._served(self._rr_throttled(order) if self._weights else order)
+
+    def _served(self, order: Iterator[str]) -> Iterator[str]:
+        served = self._hb_served
+        for sid in order:
+            served[sid] += 1
+            yield sid
+
+    def _rr_throttled(self, order: Iterator[str]) -> Iterator[str]:
+        # rr: вага < 1 (напр. watchdog demote) — слот лише коли deficit досягає 1
+        for sid in order:
+            w = self._weights.get(sid, 1.0)
+            if w < 1.0:
+                d = self._deficit.get(sid, 0.0) + w
+                if d < 1.0:
+                    self._deficit[sid] = d
+                    continue
+                self._deficit[sid] = d - 1.0
+            yield sid
+
+    def _drr_iter(self, start: int) -> Iterator[str]:
+        turns: List[Tuple[str, int]] = []
+        most = 0
+        for sid in self._rr_iter(start):
+            d = self._deficit.get(sid, 0.0) + self._weights.get(sid, 1.0)
+            n = int(d)
+            self._deficit[sid] = d - n
+            if n:
+                turns.append((sid, n))
+                most = max(most, n)
+        served = self._hb_served
+        for r in range(most):
+            for sid, n in turns:
+                if n > r:
+                    served[sid] += 1
+                    yield sid
+
+    def _rr_iter(self, start: int) -> Iterator[str]:
+        ring, members = self._ring, self._members
+        n = len(ring)
+        for k in range(n):
+            pos = (start + k) % n
+            sid = ring[pos]
+            if members.get(sid) == pos:
+                yield sid
+
+    def schedule_cycle_order(self) -> List[str]:
+        return list(self.iter_cycle_order())
 
     # ----------------- Bookkeeping API -----------------
 
     def notify_hb_processed(self, subject_id: str) -> None:
-        self._hb_processed[subject_id] = self._hb_processed.get(subject_id, 0) + 1
+        with self._debt_lock:
+            self._hb_processed[subject_id] = self._hb_processed.get(subject_id, 0) + 1
+            if self._kem is not None:
+                self._refresh_debt(subject_id)
+
+    def report_cost(self, subject_id: str, budget_ratio: float) -> None:
+        """Виміряна вартість виклику суб'єкта як частка його бюджету (1.0 = рівно бюджет)."""
+        if subject_id not in self._members:
+            return
+        with self._debt_lock:
+            prev = self._cost.get(subject_id)
+            a = self.cfg.cost_alpha
+            self._cost[subject_id] = budget_ratio if prev is None else prev + a * (budget_ratio - prev)
+            if self._kem is not None:
+                self._refresh_debt(subject_id)
+
+    def _collect(self) -> List[Family]:
+        """Registry collector: current phase and the cognitive signals behind RF decisions."""
+        cog = self._cognitive
+        return [
+            ("spx_kms_phase", "gauge", "1 for the current KMS phase",
+             [({"phase": p}, float(self._phase == p)) for p in ("HB", "RF")]),
+            ("spx_kms_subjects", "gauge", "Subjects registered with KMS", [({}, len(self._members))]),
+            ("spx_kms_cognitive_debt", "gauge", "KMM pending consolidations / trigger", [({}, cog["debt"])]),
+            ("spx_kms_memory_entropy", "gauge", "KMM memory entropy", [({}, cog["entropy"])]),
+        ]
 
     # для діагностики
     def snapshot(self) -> Dict[str, Any]:
         return {
             "phase": self._phase,
-            "subjects": self._subjects[:],
+            "mode": self.cfg.mode,
+            "subjects": self.subjects(),
             "hb_processed": dict(self._hb_processed),
+            "hb_served": dict(self._hb_served),
+            "weights": dict(self._weights),
+            "cost": dict(self._cost),
             "last_debt": dict(self._last_debt),
             "rf_window": self._rf_window[:],
             "rf_cycles_left": self._rf_cycles_left,
+            "cognitive": dict(self._cognitive),
         }
@@ -0,0 +1,304 @@
+# kernel/runtime.py
+"""
+Kernel Runtime — SPX-OS v0.2
+Owns the external tick: KMS begin → kernel drain → (RF: KMM consolidation, forgetting,
+periodic snapshot) → order → HB/RF dispatch → KMS end.
+Ticks are paced against absolute deadlines of utils.time_utils (real or virtual clock);
+the sleep is skipped while work is pending.
+"""
+
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from math import ceil
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from kernel.kms import SYSTEM_ORDER
+from kernel.watchdog import SubjectWatchdog
+from spx_types.event import Event, EventChannel
+from utils.diagnostics import log_info
+from utils.metrics import REGISTRY, Family
+from utils.tracing import span
+from utils.time_utils import get_T0, sleep
+
+_CYCLE = REGISTRY.histogram("spx_cycle_seconds", "Kernel tick duration by KMS phase", ("phase",))
+_CYCLE_BY_PHASE = {"HB": _CYCLE.labels("HB"), "RF": _CYCLE.labels("RF")}
+
+
+@dataclass
+class _RuntimeCfg:
+    hb_period: float = 0.15
+    kernel_drain_min: int = 2        # мінімум kernel-подій за такт
+    kernel_drain_max: int = 64       # стеля, щоб ядро не з'їдало весь такт
+    kernel_drain_share: float = 0.5  # частка kernel-черги, що дренується за такт
+    executor: str = "serial"         # "serial" | "threads"
+    max_workers: int = 4             # розмір пулу для executor="threads"
+
+
+class KernelRuntime:
+    """
+    Deadline-driven tick loop.
+      - tick k is due at t0 + k*hb_period; the loop sleeps only up to that deadline
+      - if queues are non-empty after a tick that made progress (drained events),
+        the next tick starts immediately; stuck queues do not cause spinning
+      - a tick that ends past its deadline counts as an overrun; the grid is then
+        re-anchored at the end of the late tick (no catch-up bursts)
+      - kernel drain budget = clamp(ceil(kernel_len * share), min, max)
+      - every subject call runs under SubjectWatchdog (budget, overrun penalty,
+        cost fed to KMS); subjects under a "skip" penalty miss their HB turns
+      - executor="threads": HB subjects run concurrently on a bounded pool (a subject's
+        turns stay sequential within one task); in RF, PID0 → ROOT run first in order,
+        the rest of the window concurrently; the tick waits on all of them (barrier)
+        before on_cycle_end(); workers still serialize on the KEM subject-channel lock for
+        their publish/fetch calls, so the pool pays off for blocking subject work, not for
+        KEM throughput
+    """
+
+    EXECUTORS = ("serial", "threads")
+
+    def __init__(self, kem, kmm, kms, spm, cfg: Optional[_RuntimeCfg] = None, *,
+                 clock: Callable[[], float] = get_T0, sleep_fn: Callable[[float], None] = sleep,
+                 on_kernel_event: Optional[Callable[[Event], None]] = None,
+                 watchdog: Optional[SubjectWatchdog] = None):
+        self.kem = kem
+        self.kmm = kmm
+        self.kms = kms
+        self.spm = spm
+        self.cfg = cfg or _RuntimeCfg(hb_period=kms.cfg.hb_period)
+        if self.cfg.executor not in self.EXECUTORS:
+            raise ValueError("Invalid runtime executor")
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if self.cfg.executor == "threads":
+            self._pool = ThreadPoolExecutor(max_workers=max(1, self.cfg.max_workers),
+                                            thread_name_prefix="spx-hb")
+        self._clock = clock
+        self._sleep = sleep_fn
+        self._on_kernel_event = on_kernel_event or self._log_kernel_event
+        self.watchdog = watchdog or SubjectWatchdog(kms=kms)
+        self._budget_seen: Set[str] = set()
+
+        self._next_deadline: Optional[float] = None
+        self._stats: Dict[str, float] = {
+            "ticks": 0,
+            "busy_ticks": 0,          # sleep skipped because work was pending
+            "overruns": 0,
+            "overrun_total_s": 0.0,
+            "overrun_max_s": 0.0,
+            "work_total_s": 0.0,
+            "sleep_total_s": 0.0,
+            "kernel_dispatched": 0,
+            "ingress": 0,             # подій, перенесених із shared-memory кілець KEM
+            "consolidated": 0,        # WM-вузли, оброблені консолідацією KMM у RF
+            "forgotten": 0,           # вузли, забуті через низьку salience у RF
+        }
+        REGISTRY.register_collector("runtime", self._collect)
+
+    @classmethod
+    def from_context(cls, ctx: Dict[str, Any], **kwargs) -> "KernelRuntime":
+        kms = ctx["kms"]
+        rt = (ctx.get("cfg") or {}).get("runtime", {}) or {}
+        cfg = _RuntimeCfg(
+            hb_period=kms.cfg.hb_period,
+            kernel_drain_min=int(rt.get("kernel_drain_min", 2)),
+            kernel_drain_max=int(rt.get("kernel_drain_max", 64)),
+            kernel_drain_share=float(rt.get("kernel_drain_share", 0.5)),
+            executor=str(rt.get("executor", "serial")),
+            max_workers=int(rt.get("max_workers", 4)),
+        )
+        kwargs.setdefault("watchdog", SubjectWatchdog.from_config(rt, kms))
+        return cls(ctx["kem"], ctx["kmm"], kms, ctx["spm"], cfg, **kwargs)
+
+    # ----------------- Tick -----------------
+
+    @staticmethod
+    def _log_kernel_event(ev: Event) -> None:
+        log_info("KEM: dispatched kernel event %s", ev.id, sub="kem")
+
+    def kernel_budget(self) -> int:
+        c = self.cfg
+        want = ceil(self.kem.kernel_len() * c.kernel_drain_share)
+        return max(c.kernel_drain_min, min(c.kernel_drain_max, want))
+
+    def _subject(self, sid: str):
+        subj = self.spm.get(sid)
+        if subj is not None and sid not in self._budget_seen:
+            # бюджет суб'єкта з його конфігу (subjects.<name>.hb_budget_ms)
+            self._budget_seen.add(sid)
+            ms = (getattr(subj, "cfg", None) or {}).get("hb_budget_ms")
+            if ms:
+                self.watchdog.set_budget(sid, float(ms) / 1000.0)
+        return subj
+
+    def _dispatch(self, order: Iterable[str]) -> None:
+        if self._pool is not None:
+            self._dispatch_concurrent(order)
+            return
+        wd = self.watchdog
+        if self.kms.phase() == "HB":
+            for sid in order:
+                subj = self._subject(sid)
+                if subj and wd.allow(sid):
+                    wd.run(sid, subj.hb_cycle)
+                    self.kms.notify_hb_processed(subj.subject_id)
+        else:
+            for sid in order:
+                subj = self._subject(sid)
+                if subj:
+                    if hasattr(subj, "rf_cycle"):
+                        wd.run(sid, subj.rf_cycle)
+                    else:
+                        wd.run(sid, subj.hb_cycle)
+
+    def _run_turns(self, sid: str, fn: Callable[[], Any], n: int) -> None:
+        for _ in range(n):
+            self.watchdog.run(sid, fn)
+
+    @staticmethod
+    def _barrier(jobs: List[Tuple[str, int, Future]], on_done: Optional[Callable[[str, int], None]] = None) -> None:
+        """Wait for every job; re-raise the first failure only after all of them finished."""
+        error: Optional[BaseException] = None
+        for sid, n, fut in jobs:
+            try:
+                fut.result()
+            except BaseException as e:  # noqa: BLE001 — re-raised after the barrier
+                error = error or e
+                continue
+            if on_done:
+                on_done(sid, n)
+        if error is not None:
+            raise error
+
+    def _notify_hb(self, sid: str, n: int) -> None:
+        for _ in range(n):
+            self.kms.notify_hb_processed(sid)
+
+    def _dispatch_concurrent(self, order: Iterable[str]) -> None:
+        wd, pool = self.watchdog, self._pool
+        jobs: List[Tuple[str, int, Future]] = []
+        if self.kms.phase() == "HB":
+            turns: Dict[str, int] = {}
+            for sid in order:
+                turns[sid] = turns.get(sid, 0) + 1
+            for sid, n in turns.items():
+                subj = self._subject(sid)
+                if subj and wd.allow(sid):
+                    jobs.append((subj.subject_id, n, pool.submit(self._run_turns, sid, subj.hb_cycle, n)))
+            self._barrier(jobs, self._notify_hb)
+            return
+        # RF: системні суб'єкти строго по черзі, решта вікна — паралельно
+        for sid in order:
+            subj = self._subject(sid)
+            if not subj:
+                continue
+            fn = subj.rf_cycle if hasattr(subj, "rf_cycle") else subj.hb_cycle
+            if sid in SYSTEM_ORDER and not jobs:
+                wd.run(sid, fn)
+            else:
+                jobs.append((sid, 1, pool.submit(wd.run, sid, fn)))
+        self._barrier(jobs)
+
+    def close(self) -> None:
+        """Shut down the HB worker pool (if any)."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _pending(self) -> int:
+        return self.kem.kernel_len() + self.kem.subject_total_len()
+
+    def tick(self) -> int:
+        """One full cycle, without pacing. Returns the number of kernel events dispatched."""
+        if self.kem.rings:
+            # пакетний дренаж зовнішніх продюсерів до рішень KMS про фазу/порядок
+            with span("kem.ingress"):
+                self._stats["ingress"] += self.kem.drain_ingress()
+        with span("kms.on_cycle_begin"):
+            self.kms.on_cycle_begin(self.kem, self.kmm)
+
+        with span("kem.kernel_drain"):
+            drained = self.kem.drain_by(channel=EventChannel.KERNEL, limit=self.kernel_budget())
+            for ev in drained:
+                self._on_kernel_event(ev)
+        self._stats["kernel_dispatched"] += len(drained)
+
+        phase = self.kms.phase()
+        if phase == "RF" and self.kmm is not None:
+            # обмежений крок WM → EM (бюджет — kmm.consolidation_budget_ms)
+            with span("kmm.consolidate"):
+                self._stats["consolidated"] += self.kmm.consolidate()
+                self._stats["forgotten"] += self.kmm.forget()
+                self.kmm.maybe_checkpoint()
+
+        with span(phase, "phase"):
+            self._dispatch(self.kms.iter_cycle_order())
+        self.watchdog.on_tick_end()
+        if self.kem.journal is not None:
+            self.kem.journal.sync()   # group commit для тихих тактів
+        self.kms.on_cycle_end()
+        return len(drained)
+
+    # ----------------- Loop -----------------
+
+    def step(self) -> None:
+        """Tick once, then wait for the next deadline (unless work is pending)."""
+        period = self.cfg.hb_period
+        start = self._clock()
+        if self._next_deadline is None:
+            self._next_deadline = start
+        before = self._pending()
+        with span("tick", "cycle", n=int(self._stats["ticks"])):
+            dispatched = self.tick()
+        pending = self._pending()
+        end = self._clock()
+
+        st = self._stats
+        st["ticks"] += 1
+        st["work_total_s"] += end - start
+        _CYCLE_BY_PHASE[self.kms.phase()].observe(end - start)
+        self._next_deadline += period
+
+        late = end - self._next_deadline
+        if late > 0:
+            st["overruns"] += 1
+            st["overrun_total_s"] += late
+            st["overrun_max_s"] = max(st["overrun_max_s"], late)
+            self._next_deadline = end
+        elif pending and (dispatched or pending < before):
+            st["busy_ticks"] += 1
+            self._next_deadline = end
+        else:
+            st["sleep_total_s"] += -late
+            self._sleep(-late)
+
+    def run(self, cycles: Optional[int] = None, until: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """Run `cycles` ticks (or forever) until `until()` is true; returns stats()."""
+        n = 0
+        while (cycles is None or n < cycles) and not (until and until()):
+            self.step()
+            n += 1
+        return self.stats()
+
+    def _collect(self) -> List[Family]:
+        """Registry collector: loop counters and per-subject cost from the watchdog."""
+        st, subj = self._stats, self.watchdog.snapshot()
+        fams: List[Family] = [
+            ("spx_runtime_ticks_total", "counter", "Kernel ticks", [({}, st["ticks"])]),
+            ("spx_runtime_overruns_total", "counter", "Ticks that ended past their deadline",
+             [({}, st["overruns"])]),
+            ("spx_runtime_kernel_dispatched_total", "counter", "Kernel events dispatched",
+             [({}, st["kernel_dispatched"])]),
+        ]
+        for name, key, help_ in (
+                ("spx_subject_calls_total", "calls", "hb_cycle/rf_cycle calls per subject"),
+                ("spx_subject_wall_seconds_total", "wall_total_s", "Wall time spent in subject cycles"),
+                ("spx_subject_cpu_seconds_total", "cpu_total_s", "CPU time spent in subject cycles"),
+                ("spx_subject_overruns_total", "overruns", "Subject calls over their budget")):
+            fams.append((name, "counter", help_, [({"subject": sid}, c[key]) for sid, c in subj.items()]))
+        return fams
+
+    def stats(self) -> Dict[str, Any]:
+        st: Dict[str, Any] = dict(self._stats)
+        st["work_avg_s"] = st["work_total_s"] / st["ticks"] if st["ticks"] else 0.0
+        st["subjects"] = self.watchdog.snapshot()
+        if self.kmm is not None:
+            st["kmm"] = self.kmm.consolidator.snapshot()
+        return st
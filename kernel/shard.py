@@ -0,0 +1,495 @@
+# kernel/shard.py
+"""
+Sharded Runtime — SPX-OS v0.2
+Multi-process deployment on one host: subjects run in worker processes, each with a
+local KEM shard and KMM; the coordinator (kernel process) keeps the KMS, the kernel
+channel, the watchdog and a bridge that moves events between shards.
+
+Bridge: one stream socket per worker (Unix socket in a private temp dir, or TCP on
+127.0.0.1), no broker. Frames are "<IB" (body length, kind) + body; events travel as
+spx_types.codec batches, control messages as JSON. One tick = one round trip per shard:
+  coordinator → shard   EVENTS (kernel broadcast + subject events routed by subject_id)
+                        TICK   {phase, order, consolidate}
+  shard → coordinator   EVENTS (outbox: kernel events + events for other shards' subjects)
+                        DONE   {calls: [[sid, wall_s, cpu_s]], depth, pending, entropy, …}
+Bridge peers are the kernel's own worker processes, so event batches are trusted and may
+carry any payload value (codec allow_pickle=True).
+"""
+
+from __future__ import annotations
+import json
+import multiprocessing as mp
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import zlib
+from dataclasses import dataclass
+from importlib import import_module
+from time import perf_counter, thread_time
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from kernel.kem import KernelEventMesh
+from kernel.kms import SYSTEM_ORDER
+from kernel.runtime import KernelRuntime, _RuntimeCfg
+from spx_types import codec
+from spx_types.event import Event, EventChannel
+from utils.diagnostics import log_info, setup_logging
+from utils.tracing import span
+
+_FRAME = struct.Struct("<IB")
+HELLO, SPAWN, EVENTS, TICK, DONE, STOP = range(1, 7)
+
+
+def _send(sock: socket.socket, frames: Sequence[Tuple[int, bytes]]) -> int:
+    """Write several frames with one sendall (batched frame write); returns bytes sent."""
+    data = b"".join(_FRAME.pack(len(body), kind) + body for kind, body in frames)
+    sock.sendall(data)
+    return len(data)
+
+
+def _recv(rfile: BinaryIO) -> Tuple[int, bytes]:
+    head = rfile.read(_FRAME.size)
+    if len(head) < _FRAME.size:
+        raise ConnectionError("KEM bridge: peer closed the connection")
+    n, kind = _FRAME.unpack(head)
+    body = rfile.read(n)
+    if len(body) < n:
+        raise ConnectionError("KEM bridge: truncated frame")
+    return kind, body
+
+
+def _json(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _class_path(cls_: type) -> str:
+    return f"{cls_.__module__}:{cls_.__qualname__}"
+
+
+def _load_class(path: str) -> type:
+    mod, _, name = path.partition(":")
+    obj: Any = import_module(mod)
+    for part in name.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+# ======================================================================
+# Worker side
+# ======================================================================
+
+class ShardMesh(KernelEventMesh):
+    """
+    Worker-local KEM shard. Subject events for local subjects are queued as usual;
+    kernel events and events addressed to subjects of other shards go to `outbox`
+    and are handed to the coordinator at the end of the tick.
+    deliver() queues events coming from the bridge (including broadcast kernel events).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.local: Set[str] = set()
+        self.outbox: List[Event] = []
+
+    def _is_local(self, ev: Event) -> bool:
+        return ev.channel != EventChannel.KERNEL and ev.subject_id in self.local
+
+    def publish(self, event: Event) -> None:
+        if self._is_local(event):
+            super().publish(event)
+        else:
+            self.outbox.append(event)
+
+    def publish_many(self, events: Sequence[Event]) -> int:
+        local = [ev for ev in events if self._is_local(ev)]
+        if len(local) != len(events):
+            self.outbox.extend(ev for ev in events if not self._is_local(ev))
+        return super().publish_many(local) + len(events) - len(local)
+
+    def deliver(self, events: Sequence[Event]) -> None:
+        try:
+            KernelEventMesh.publish_many(self, events)
+        except RuntimeError:
+            pass   # policy "reject": лічильники rejected_* шарда вже оновлено
+
+
+def _worker_main(shard_id: int, family: int, address: Any, app_cfg: Dict[str, Any], isp) -> None:
+    from kernel.kmm import KernelMemoryModel
+
+    setup_logging(app_cfg.get("logging"))
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.connect(address)
+    if family == socket.AF_INET:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    _send(sock, [(HELLO, struct.pack("<I", shard_id))])
+    rfile = sock.makefile("rb")
+
+    kem = ShardMesh()
+    kem_cfg = app_cfg.get("kem") or {}
+    kem.configure(kernel_max=kem_cfg.get("kernel_max"), subject_max=kem_cfg.get("subject_max"),
+                  policy=kem_cfg.get("policy"), subject_order=kem_cfg.get("subject_order"),
+                  subject_quota=kem_cfg.get("subject_quota"))
+    kmm_cfg = dict(app_cfg.get("kmm") or {})
+    if kmm_cfg.get("snapshot_dir"):
+        kmm_cfg["snapshot_dir"] = os.path.join(kmm_cfg["snapshot_dir"], f"shard-{shard_id}")
+    kmm = KernelMemoryModel.init(kmm_cfg)
+    subjects: Dict[str, Any] = {}
+    consolidated = forgotten = 0
+
+    while True:
+        kind, body = _recv(rfile)
+        if kind == EVENTS:
+            kem.deliver(codec.decode_batch(body, allow_pickle=True))
+        elif kind == TICK:
+            msg = json.loads(body)
+            rf = msg["phase"] == "RF"
+            calls: List[List[Any]] = []
+            error: Optional[str] = None
+            for sid in msg["order"]:
+                subj = subjects.get(sid)
+                if subj is None:
+                    continue
+                fn = subj.rf_cycle if rf and hasattr(subj, "rf_cycle") else subj.hb_cycle
+                w0, c0 = perf_counter(), thread_time()
+                try:
+                    fn()
+                except Exception as e:  # noqa: BLE001 — передається координатору
+                    error = error or f"{sid}: {type(e).__name__}: {e}"
+                calls.append([sid, perf_counter() - w0, thread_time() - c0])
+            if msg.get("consolidate"):
+                consolidated += kmm.consolidate()
+                forgotten += kmm.forget()
+                kmm.maybe_checkpoint()
+            # broadcast kernel-події були видимі суб'єктам протягом такту
+            kem.drain_kernel()
+            out, kem.outbox = kem.outbox, []
+            done = {
+                "calls": calls, "error": error,
+                "depth": {sid: kem.subject_len(sid) for sid in subjects},
+                "pending": kmm.pending_consolidations, "entropy": kmm.memory_entropy(),
+                "consolidated": consolidated, "forgotten": forgotten,
+            }
+            frames = [(EVENTS, codec.encode_batch(out, allow_pickle=True))] if out else []
+            frames.append((DONE, _json(done)))
+            _send(sock, frames)
+        elif kind == SPAWN:
+            msg = json.loads(body)
+            sid = msg["subject_id"]
+            subjects[sid] = _load_class(msg["cls"])(subject_id=sid, kem=kem, kmm=kmm, isp=isp, cfg=msg["cfg"])
+            kem.local.add(sid)
+            if msg["cfg"].get("kem_quota") is not None:
+                kem.set_subject_quota(sid, int(msg["cfg"]["kem_quota"]))
+        elif kind == STOP:
+            kmm.checkpoint()
+            break
+    rfile.close()
+    sock.close()
+
+
+# ======================================================================
+# Coordinator side
+# ======================================================================
+
+class ShardedKEMView:
+    """
+    KEM facade handed to the KMS in sharded mode: depth of a subject = events still
+    queued at the coordinator (not yet routed) + the depth last reported by its shard.
+    """
+
+    def __init__(self, kem: KernelEventMesh):
+        self.kem = kem
+        self._remote: Dict[str, int] = {}
+        self._remote_total = 0
+        self._listeners: List[Callable[[Optional[str], int], None]] = []
+
+    def kernel_len(self) -> int:
+        return self.kem.kernel_len()
+
+    def subject_len(self, subject_id: str) -> int:
+        return self.kem.subject_len(subject_id) + self._remote.get(subject_id, 0)
+
+    def subject_total_len(self) -> int:
+        return self.kem.subject_total_len() + self._remote_total
+
+    def add_depth_listener(self, fn: Callable[[Optional[str], int], None]) -> None:
+        self._listeners.append(fn)
+        self.kem.add_depth_listener(lambda sid, _d: fn(sid, self.subject_len(sid)))
+
+    def update(self, depths: Dict[str, int]) -> None:
+        for sid, d in depths.items():
+            old = self._remote.get(sid, 0)
+            if d == old:
+                continue
+            self._remote[sid] = d
+            self._remote_total += d - old
+            for fn in self._listeners:
+                fn(sid, self.subject_len(sid))
+
+
+class _ShardKMMView:
+    """Aggregated KMM figures of all shards for the KMS cognitive RF triggers."""
+
+    def __init__(self, n: int):
+        self.pending = [0] * n
+        self.entropy = [0.0] * n
+
+    @property
+    def pending_consolidations(self) -> int:
+        return sum(self.pending)
+
+    def memory_entropy(self) -> float:
+        return max(self.entropy) if self.entropy else 0.0
+
+
+@dataclass
+class _ShardCfg:
+    shards: int = 2
+    transport: str = "unix"        # "unix" | "tcp" (127.0.0.1)
+    start_method: str = "spawn"    # multiprocessing start method для воркерів
+    connect_timeout_s: float = 30.0
+
+
+class _Shard:
+    __slots__ = ("idx", "proc", "sock", "rfile", "subjects", "stats")
+
+    def __init__(self, idx: int, proc):
+        self.idx = idx
+        self.proc = proc
+        self.sock: Optional[socket.socket] = None
+        self.rfile: Optional[BinaryIO] = None
+        self.subjects: Set[str] = set()
+        self.stats: Dict[str, float] = {
+            "events_in": 0, "events_out": 0, "bytes_sent": 0, "calls": 0,
+            "pending": 0, "entropy": 0.0, "consolidated": 0, "forgotten": 0,
+        }
+
+
+class ShardedRuntime(KernelRuntime):
+    """
+    KernelRuntime whose subjects live in worker processes.
+      - subjects registered in the SPM are re-created in their shard (class path + cfg);
+        shard = subjects.<name>.shard if set, else crc32(subject_id) % shards
+      - the KMS runs here over ShardedKEMView / aggregated KMM figures, so HB/RF phases,
+        RF windows, cooldowns and debt are decided once for all shards
+      - every tick: kernel drain (dispatched here and broadcast to every shard), subject
+        events routed by subject_id, then all shards run their part of the cycle order
+        concurrently; the tick waits for every DONE (barrier) before on_cycle_end()
+      - RF: PID0 then ROOT run first, one bridge round trip each (they may live in
+        different shards), then the rest of the window; shards consolidate their KMM in RF
+      - outbox events returned by shards are re-published here and routed next tick
+      - subject timings come back per call and go through the coordinator's watchdog
+        (budgets, penalties, KMS cost)
+    Deployment: one Linux host, several processes, no external broker.
+    """
+
+    TRANSPORTS = ("unix", "tcp")
+
+    def __init__(self, kem, kmm, kms, spm, cfg: Optional[_RuntimeCfg] = None, *,
+                 shard_cfg: Optional[_ShardCfg] = None, app_cfg: Optional[Dict[str, Any]] = None,
+                 isp=None, **kwargs):
+        super().__init__(kem, kmm, kms, spm, cfg, **kwargs)
+        self.shard_cfg = shard_cfg or _ShardCfg()
+        if self.shard_cfg.shards < 1 or self.shard_cfg.transport not in self.TRANSPORTS:
+            raise ValueError("Invalid sharding config")
+        self.view = ShardedKEMView(kem)
+        self.kmm_view = _ShardKMMView(self.shard_cfg.shards)
+        self._owner: Dict[str, int] = {}
+        self._app_cfg = app_cfg or {}
+        self._tmpdir: Optional[str] = None
+        self._shards: List[_Shard] = []
+        self._start(isp)
+        for sid, subj in list(spm.registry.items()):
+            self.spawn_remote(sid, subj)
+
+    @classmethod
+    def from_context(cls, ctx: Dict[str, Any], **kwargs) -> "ShardedRuntime":
+        rt = (ctx.get("cfg") or {}).get("runtime", {}) or {}
+        kwargs.setdefault("shard_cfg", _ShardCfg(
+            shards=int(rt.get("shards", 2)),
+            transport=str(rt.get("shard_transport", "unix")),
+            start_method=str(rt.get("shard_start_method", "spawn")),
+        ))
+        kwargs.setdefault("app_cfg", ctx.get("cfg") or {})
+        kwargs.setdefault("isp", ctx.get("isp"))
+        return super().from_context(ctx, **kwargs)
+
+    # ----------------- Workers -----------------
+
+    def _start(self, isp) -> None:
+        c = self.shard_cfg
+        if c.transport == "unix":
+            self._tmpdir = tempfile.mkdtemp(prefix="spx-kem-")
+            family, address = socket.AF_UNIX, os.path.join(self._tmpdir, "bridge.sock")
+        else:
+            family, address = socket.AF_INET, ("127.0.0.1", 0)
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            listener.bind(address)
+            listener.listen(c.shards)
+            listener.settimeout(c.connect_timeout_s)
+            address = listener.getsockname()
+            ctx = mp.get_context(c.start_method)
+            for i in range(c.shards):
+                proc = ctx.Process(target=_worker_main, name=f"spx-shard-{i}", daemon=True,
+                                   args=(i, family, address, self._app_cfg, isp))
+                proc.start()
+                self._shards.append(_Shard(i, proc))
+            for _ in range(c.shards):
+                conn, _ = listener.accept()
+                conn.settimeout(None)
+                if family == socket.AF_INET:
+                    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                rfile = conn.makefile("rb")
+                kind, body = _recv(rfile)
+                if kind != HELLO:
+                    raise ConnectionError("KEM bridge: expected HELLO")
+                shard = self._shards[struct.unpack("<I", body)[0]]
+                shard.sock, shard.rfile = conn, rfile
+        except BaseException:
+            self.close()
+            raise
+        finally:
+            listener.close()
+        log_info("ShardedRuntime: %d shards over %s sockets", c.shards, c.transport, sub="runtime")
+
+    def shard_of(self, subject_id: Optional[str]) -> int:
+        idx = self._owner.get(subject_id)
+        if idx is None:
+            idx = zlib.crc32((subject_id or "").encode("utf-8")) % len(self._shards)
+        return idx
+
+    def spawn_remote(self, subject_id: str, subject) -> int:
+        """Create `subject` (class + cfg) in its shard; returns the shard index."""
+        cfg = dict(getattr(subject, "cfg", None) or {})
+        idx = int(cfg["shard"]) % len(self._shards) if "shard" in cfg else self.shard_of(subject_id)
+        self._owner[subject_id] = idx
+        shard = self._shards[idx]
+        shard.subjects.add(subject_id)
+        msg = {"subject_id": subject_id, "cls": _class_path(type(subject)), "cfg": cfg}
+        shard.stats["bytes_sent"] += _send(shard.sock, [(SPAWN, _json(msg))])
+        return idx
+
+    # ----------------- Tick -----------------
+
+    def _pending(self) -> int:
+        return self.view.kernel_len() + self.view.subject_total_len()
+
+    def _exchange(self, events: List[List[Event]], orders: List[List[str]], phase: str,
+                  consolidate: bool) -> None:
+        """One bridge round trip with every shard: send events + TICK, then wait for all DONE."""
+        for sh in self._shards:
+            frames = []
+            if events[sh.idx]:
+                frames.append((EVENTS, codec.encode_batch(events[sh.idx], allow_pickle=True)))
+                sh.stats["events_out"] += len(events[sh.idx])
+            frames.append((TICK, _json({"phase": phase, "order": orders[sh.idx], "consolidate": consolidate})))
+            sh.stats["bytes_sent"] += _send(sh.sock, frames)
+        error: Optional[str] = None
+        hb = phase == "HB"
+        for sh in self._shards:
+            outbox: List[Event] = []
+            while True:
+                kind, body = _recv(sh.rfile)
+                if kind == EVENTS:
+                    outbox = codec.decode_batch(body, allow_pickle=True)
+                elif kind == DONE:
+                    break
+            done = json.loads(body)
+            for sid, wall, cpu in done["calls"]:
+                self.watchdog.record(sid, wall, cpu)
+                if hb:
+                    self.kms.notify_hb_processed(sid)
+            st = sh.stats
+            st["calls"] += len(done["calls"])
+            st["events_in"] += len(outbox)
+            for k in ("pending", "entropy", "consolidated", "forgotten"):
+                st[k] = done[k]
+            self.kmm_view.pending[sh.idx] = done["pending"]
+            self.kmm_view.entropy[sh.idx] = done["entropy"]
+            self.view.update(done["depth"])
+            if outbox:
+                try:
+                    self.kem.publish_many(outbox)
+                except RuntimeError:
+                    pass   # policy "reject" на координаторі
+            if done["error"] and error is None:
+                error = f"shard {sh.idx}: {done['error']}"
+        if error is not None:
+            raise RuntimeError(error)
+
+    def tick(self) -> int:
+        kem = self.kem
+        if kem.rings:
+            with span("kem.ingress"):
+                self._stats["ingress"] += kem.drain_ingress()
+        with span("kms.on_cycle_begin"):
+            self.kms.on_cycle_begin(self.view, self.kmm_view)
+
+        with span("kem.kernel_drain"):
+            drained = kem.drain_by(channel=EventChannel.KERNEL, limit=self.kernel_budget())
+            for ev in drained:
+                self._on_kernel_event(ev)
+        self._stats["kernel_dispatched"] += len(drained)
+
+        n = len(self._shards)
+        events: List[List[Event]] = [list(drained) for _ in range(n)]   # broadcast kernel-подій
+        for ev in kem.drain_subject():
+            events[self.shard_of(ev.subject_id)].append(ev)
+
+        phase = self.kms.phase()
+        orders: List[List[str]] = [[] for _ in range(n)]
+        system: List[str] = []
+        for sid in self.kms.iter_cycle_order():
+            if self._subject(sid) is None or sid not in self._owner:
+                continue
+            if phase == "HB" and not self.watchdog.allow(sid):
+                continue
+            if phase == "RF" and sid in SYSTEM_ORDER:
+                system.append(sid)
+            else:
+                orders[self._owner[sid]].append(sid)
+        # RF: PID0 → ROOT строго по черзі (можуть бути в різних шардах), далі решта — паралельно
+        with span(phase, "phase", shards=n):
+            for sid in system:
+                only: List[List[str]] = [[] for _ in range(n)]
+                only[self._owner[sid]].append(sid)
+                self._exchange(events, only, phase, False)
+                events = [[] for _ in range(n)]
+            self._exchange(events, orders, phase, phase == "RF")
+
+        self.watchdog.on_tick_end()
+        if kem.journal is not None:
+            kem.journal.sync()
+        self.kms.on_cycle_end()
+        return len(drained)
+
+    # ----------------- Lifecycle / diagnostics -----------------
+
+    def close(self) -> None:
+        """Stop workers (they checkpoint their KMM), close the bridge."""
+        super().close()
+        for sh in self._shards:
+            if sh.sock is not None:
+                try:
+                    _send(sh.sock, [(STOP, b"")])
+                except OSError:
+                    pass
+        for sh in self._shards:
+            sh.proc.join(timeout=self.shard_cfg.connect_timeout_s)
+            if sh.proc.is_alive():
+                sh.proc.terminate()
+            if sh.sock is not None:
+                sh.rfile.close()
+                sh.sock.close()
+                sh.sock = sh.rfile = None
+        self._shards = []
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def stats(self) -> Dict[str, Any]:
+        st = super().stats()
+        st.pop("kmm", None)   # KMM координатора не використовується суб'єктами шардів
+        st["shards"] = {sh.idx: dict(sh.stats, subjects=sorted(sh.subjects)) for sh in self._shards}
+        return st
@@ -0,0 +1,313 @@
+# kernel/sim.py
+"""
+Simulation Runner — SPX-OS v0.2
+Runs the real KEM / KMS / KMM / runtime stack on a VirtualClock: ticks, sleeps and event
+timestamps are virtual, so a 10-minute load scenario takes as long as its CPU work.
+
+  - synthetic subjects consume up to `fetch_per_hb` events per HB turn and write one WM node
+    per event; each turn costs subject_cost + event_cost × events of virtual time, which is
+    what the runtime, watchdog and KMS see (overruns, debt, RF)
+  - arrival processes (poisson | uniform | burst) publish subject events at their own virtual
+    instants; arrivals that fall inside a runtime sleep are published at their exact time
+  - the report has queue depths (sampled every sample_every_s), drops / rejects, RF entries,
+    overruns and the virtual queueing-delay distribution seen by the consumers
+With a fixed seed the report is identical between runs (wall_s / speedup aside).
+
+  python -m kernel.sim [--config config/spx_config.yaml] [--duration 600] [--out report.json]
+"""
+
+from __future__ import annotations
+import argparse
+import heapq
+import json
+import math
+import random
+import sys
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from kernel.kem import KernelEventMesh
+from kernel.kmm import KernelMemoryModel
+from kernel.kms import KernelMetaScheduler
+from kernel.runtime import KernelRuntime
+from kernel.spm import SubjectProcessManager
+from kernel.watchdog import SubjectWatchdog
+from spx_types.event import Event, EventType
+from utils.metrics import LATENCY_BUCKETS, Histogram
+from utils.time_utils import VirtualClock, get_T0, use_clock
+
+PROCESSES = ("poisson", "uniform", "burst")
+
+
+@dataclass
+class _ArrivalCfg:
+    subject: str = "*"               # subject_id або "*" — по колу між синтетичними суб'єктами
+    rate_hz: float = 10.0            # середня частота прибуттів
+    process: str = "poisson"         # poisson | uniform | burst
+    burst: int = 1                   # подій за одне прибуття
+    salience: float = 0.5
+    start_s: float = 0.0
+    stop_s: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, c: Dict[str, Any]) -> "_ArrivalCfg":
+        a = cls(
+            subject=str(c.get("subject", "*")),
+            rate_hz=float(c.get("rate_hz", 10.0)),
+            process=str(c.get("process", "poisson")),
+            burst=int(c.get("burst", 1)),
+            salience=float(c.get("salience", 0.5)),
+            start_s=float(c.get("start_s", 0.0)),
+            stop_s=float(c["stop_s"]) if c.get("stop_s") is not None else None,
+        )
+        if a.process not in PROCESSES or a.rate_hz <= 0 or a.burst <= 0 or not 0.0 <= a.salience <= 1.0:
+            raise ValueError("Invalid sim arrival")
+        return a
+
+
+@dataclass
+class _SimCfg:
+    duration_s: float = 60.0
+    seed: int = 1
+    subjects: int = 10
+    fetch_per_hb: int = 8
+    subject_cost_s: float = 0.0002
+    event_cost_s: float = 0.00005
+    sample_every_s: float = 1.0
+    arrivals: List[_ArrivalCfg] = field(default_factory=lambda: [_ArrivalCfg()])
+
+    @classmethod
+    def from_config(cls, c: Optional[Dict[str, Any]]) -> "_SimCfg":
+        c = c or {}
+        cfg = cls(
+            duration_s=float(c.get("duration_s", 60.0)),
+            seed=int(c.get("seed", 1)),
+            subjects=int(c.get("subjects", 10)),
+            fetch_per_hb=int(c.get("fetch_per_hb", 8)),
+            subject_cost_s=float(c.get("subject_cost_ms", 0.2)) / 1000.0,
+            event_cost_s=float(c.get("event_cost_ms", 0.05)) / 1000.0,
+            sample_every_s=float(c.get("sample_every_s", 1.0)),
+            arrivals=[_ArrivalCfg.from_config(a) for a in (c.get("arrivals") or [{}])],
+        )
+        if cfg.duration_s <= 0 or cfg.subjects <= 0 or cfg.fetch_per_hb <= 0 or cfg.sample_every_s <= 0:
+            raise ValueError("Invalid sim config")
+        return cfg
+
+
+class SimSubject:
+    """Synthetic consumer: fetch, charge virtual cost, one WM node per event, record delay."""
+
+    def __init__(self, subject_id, kem, kmm, isp, cfg):
+        self.subject_id = subject_id
+        self.kem = kem
+        self.kmm = kmm
+        self.cfg = cfg
+        self.sim: "SimulationRunner" = cfg["sim"]
+        self.n = 0
+
+    def hb_cycle(self):
+        sim = self.sim
+        got = self.kem.fetch_for(self.subject_id, sim.cfg.fetch_per_hb)
+        now = get_T0()
+        for ev in got:
+            sim.record_delay(now - ev.ts_T0)
+            if self.kmm is not None:
+                self.n += 1
+                self.kmm.encode_wm(f"{self.subject_id}:{self.n}", {"salience": ev.salience},
+                                   origin=self.subject_id)
+        sim.clock.advance(sim.cfg.subject_cost_s + sim.cfg.event_cost_s * len(got))
+
+    def rf_cycle(self):
+        pass
+
+
+class SimulationRunner:
+    """
+    Builds the kernel stack from an app config (kem / system / scheduler / kmm / runtime
+    sections, as bootstrap does) under a VirtualClock and drives it for sim.duration_s.
+    """
+
+    def __init__(self, app_cfg: Dict[str, Any], sim_cfg: Optional[_SimCfg] = None):
+        self.app_cfg = app_cfg or {}
+        self.cfg = sim_cfg or _SimCfg.from_config(self.app_cfg.get("sim"))
+        self.clock = VirtualClock()
+        self.rng = random.Random(self.cfg.seed)
+        self.delay = Histogram(LATENCY_BUCKETS)
+        self.delay_max = 0.0
+        self.published = 0
+        self._arrivals: List[Tuple[float, int, int]] = []   # (час, seq, № процесу) — мін-купа
+        self._seq = 0
+        self._rr = 0
+        self._sids: List[str] = []
+
+    @classmethod
+    def from_config(cls, app_cfg: Dict[str, Any], **overrides: Any) -> "SimulationRunner":
+        sim = dict(app_cfg.get("sim") or {})
+        sim.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(app_cfg, _SimCfg.from_config(sim))
+
+    def record_delay(self, dt: float) -> None:
+        self.delay.observe(dt)
+        if dt > self.delay_max:
+            self.delay_max = dt
+
+    # ----------------- Arrivals -----------------
+
+    def _gap(self, a: _ArrivalCfg) -> float:
+        if a.process == "poisson":
+            return self.rng.expovariate(a.rate_hz)
+        return 1.0 / a.rate_hz
+
+    def _schedule(self, i: int, t: float) -> None:
+        a = self.cfg.arrivals[i]
+        if (a.stop_s is None or t < a.stop_s) and t < self.cfg.duration_s:
+            self._seq += 1
+            heapq.heappush(self._arrivals, (t, self._seq, i))
+
+    def _arrive(self, i: int) -> None:
+        a = self.cfg.arrivals[i]
+        sid = a.subject
+        if sid == "*":
+            sid = self._sids[self._rr % len(self._sids)]
+            self._rr += 1
+        for _ in range(a.burst):
+            try:
+                self.kem.publish(Event.subject(sid, EventType.PERCEPTION, {}, salience=a.salience))
+            except RuntimeError:
+                pass   # policy "reject": враховано у rejected_subject
+        self.published += a.burst
+
+    def _inject_until(self, t: float) -> None:
+        """Publish every arrival due by virtual time t, each at its own instant."""
+        arr, clock = self._arrivals, self.clock
+        while arr and arr[0][0] <= t:
+            at, _, i = heapq.heappop(arr)
+            if at > clock.t:
+                clock.set(at)
+            self._arrive(i)
+            self._schedule(i, at + self._gap(self.cfg.arrivals[i]))
+
+    def _sleep(self, dt: float) -> None:
+        target = self.clock.t + max(0.0, dt)
+        self._inject_until(target)
+        self.clock.set(target)
+
+    # ----------------- Run -----------------
+
+    def _build(self) -> KernelRuntime:
+        c = self.app_cfg
+        kem = KernelEventMesh.init()
+        kc = c.get("kem") or {}
+        kem.configure(kernel_max=kc.get("kernel_max"), subject_max=kc.get("subject_max"),
+                      policy=kc.get("policy"), subject_order=kc.get("subject_order"),
+                      subject_quota=kc.get("subject_quota"))
+        system_cfg = dict(c.get("system") or {})
+        system_cfg.setdefault("scheduler", c.get("scheduler", {}))
+        kms = KernelMetaScheduler.init(system_cfg)
+        # без знімків; бюджет консолідації обмежує лише batch — інакше результат залежить від CPU
+        kmm_cfg = dict(c.get("kmm") or {}, snapshot_dir=None, consolidation_budget_ms=1e9)
+        kmm = KernelMemoryModel(kmm_cfg)
+        spm = SubjectProcessManager.init()
+        for i in range(self.cfg.subjects):
+            subj = spm.spawn(SimSubject, kem, kmm, None, {"subject_id": f"SIM{i}", "sim": self})
+            kms.register(subj)
+            self._sids.append(subj.subject_id)
+        kem.drain_all()   # kernel-події спавну не є навантаженням сценарію
+        self.kem, self.kms, self.kmm = kem, kms, kmm
+        # порядок викликів суб'єктів має бути відтворюваним — лише serial executor
+        rt = dict(c.get("runtime") or {}, executor="serial")
+        ctx = {"cfg": dict(c, runtime=rt), "kem": kem, "kmm": kmm, "kms": kms, "spm": spm}
+        return KernelRuntime.from_context(
+            ctx, clock=get_T0, sleep_fn=self._sleep, on_kernel_event=lambda ev: None,
+            watchdog=SubjectWatchdog.from_config(rt, kms, timer=get_T0))
+
+    def run(self) -> Dict[str, Any]:
+        wall0 = perf_counter()
+        with use_clock(self.clock):
+            runtime = self._build()
+            for i, a in enumerate(self.cfg.arrivals):
+                self._schedule(i, a.start_s + (self._gap(a) if a.process == "poisson" else 0.0))
+            depths: List[int] = []
+            series: List[Dict[str, float]] = []
+            next_sample = 0.0
+            rf_entries = rf_ticks = 0
+            phase = self.kms.phase()
+            try:
+                while self.clock.t < self.cfg.duration_s:
+                    self._inject_until(self.clock.t)
+                    runtime.step()
+                    now_phase = self.kms.phase()
+                    rf_ticks += now_phase == "RF"
+                    rf_entries += phase == "HB" and now_phase == "RF"
+                    phase = now_phase
+                    while next_sample <= self.clock.t:
+                        d = self.kem.subject_total_len()
+                        depths.append(d)
+                        series.append({"t": round(next_sample, 6), "depth": d, "phase": now_phase})
+                        next_sample += self.cfg.sample_every_s
+            finally:
+                runtime.close()
+        wall = perf_counter() - wall0
+        return self._report(runtime.stats(), depths, series, rf_entries, rf_ticks, wall)
+
+    def _report(self, stats: Dict[str, Any], depths: List[int], series: List[Dict[str, float]],
+                rf_entries: int, rf_ticks: int, wall: float) -> Dict[str, Any]:
+        m, h = self.kem.metrics(), self.delay
+        consumed = h.count
+        virtual = self.clock.t
+        return {
+            "virtual_s": virtual,
+            "wall_s": wall,
+            "speedup": virtual / wall if wall else math.inf,
+            "ticks": stats["ticks"],
+            "overruns": stats["overruns"],
+            "published": self.published,
+            "consumed": consumed,
+            "dropped": m["dropped_subject"],
+            "rejected": m["rejected_subject"],
+            "backlog": m["subject_len"],
+            "rf_entries": rf_entries,
+            "rf_ticks": rf_ticks,
+            "consolidated": stats["consolidated"],
+            "depth": {
+                "max": max(depths, default=0),
+                "mean": sum(depths) / len(depths) if depths else 0.0,
+                "final": m["subject_len"],
+            },
+            "latency_s": {
+                "mean": h.sum / consumed if consumed else 0.0,
+                # квантилі — верхні межі бакетів LATENCY_BUCKETS, тому не вище спостереженого max
+                "p50": min(h.quantile(0.5), self.delay_max), "p90": min(h.quantile(0.9), self.delay_max),
+                "p99": min(h.quantile(0.99), self.delay_max), "max": self.delay_max,
+            },
+            "series": series,
+        }
+
+
+def main(argv=None) -> int:
+    from utils.config_loader import load_yaml
+    from utils.diagnostics import setup_logging
+
+    ap = argparse.ArgumentParser(prog="python -m kernel.sim", description="SPX-OS virtual-time simulation")
+    ap.add_argument("--config", default="config/spx_config.yaml")
+    ap.add_argument("--duration", type=float, help="override sim.duration_s")
+    ap.add_argument("--seed", type=int, help="override sim.seed")
+    ap.add_argument("--subjects", type=int, help="override sim.subjects")
+    ap.add_argument("--out", help="write the full report (with the depth series) as JSON")
+    args = ap.parse_args(argv)
+
+    cfg = load_yaml(args.config)
+    setup_logging(dict(cfg.get("logging") or {}, level="WARNING", file=None))
+    report = SimulationRunner.from_config(cfg, duration_s=args.duration, seed=args.seed,
+                                          subjects=args.subjects).run()
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    summary = {k: v for k, v in report.items() if k != "series"}
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
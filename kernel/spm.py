@@ -3,10 +3,14 @@ from __future__ import annotations
 from typing import Type, Dict, Any
 from uuid import uuid4
 from utils.diagnostics import log_info
+from utils.metrics import REGISTRY
 from spx_types.event import Event, EventType, EventChannel
 
 SYSTEM_IDS = {"PID0", "ROOT"}
 
+_SPAWNED = REGISTRY.counter("spx_spm_spawned_total", "Subjects spawned by SPM")
+_SUBJECTS = REGISTRY.gauge("spx_spm_subjects", "Subjects registered in SPM")
+
 class SubjectProcessManager:
     def __init__(self):
         self.registry: Dict[str, Any] = {}  # subject_id -> subject ref
@@ -30,7 +34,11 @@ class SubjectProcessManager:
         subject_id = self._make_subject_id(cls_, cfg)
         subject = cls_(subject_id=subject_id, kem=kem, kmm=kmm, isp=isp, cfg=cfg or {})
         self.registry[subject_id] = subject
-        log_info(f"SPM: spawned subject {subject_id}.")
+        _SPAWNED.inc()
+        _SUBJECTS.set(len(self.registry))
+        if cfg and cfg.get("kem_quota") is not None:
+            kem.set_subject_quota(subject_id, int(cfg["kem_quota"]))
+        log_info("SPM: spawned subject %s.", subject_id, sub="spm")
 
         # Kernel-подія про спавн
         kem.publish_kernel_event(Event(
@@ -0,0 +1,42 @@
+import asyncio
+from kernel.akem import AsyncKernelEventMesh
+from kernel.kem import KernelEventMesh
+from spx_types.event import Event, EventType
+
+def test_async_backpressure_suspends_producer():
+    async def scenario():
+        kem = KernelEventMesh.init()
+        kem.configure(subject_max=2)
+        mesh = AsyncKernelEventMesh.init(kem)
+
+        async def producer():
+            for i in range(5):
+                await mesh.publish(Event.subject("A", EventType.SYSTEM, {"i": i}))
+
+        task = asyncio.create_task(producer())
+        await asyncio.sleep(0)
+        assert kem.subject_len("A") == 2 and not task.done()  # чекає, а не дропає
+
+        got = []
+        async for ev in mesh.events(subject_id="A"):
+            got.append(ev.payload["i"])
+            if len(got) == 5:
+                break
+        await task
+        return got, kem.metrics()["dropped_subject"]
+
+    got, dropped = asyncio.run(scenario())
+    assert got == [0, 1, 2, 3, 4] and dropped == 0
+
+def test_async_next_event_is_kernel_first():
+    async def scenario():
+        mesh = AsyncKernelEventMesh.init()
+        waiter = asyncio.create_task(mesh.next_event())
+        await asyncio.sleep(0)
+        await mesh.publish(Event.subject("A", EventType.SYSTEM, {}, eid="s"))
+        first = await waiter
+        await mesh.publish(Event.subject("A", EventType.SYSTEM, {}, eid="s2"))
+        await mesh.publish(Event.kernel(EventType.SYSTEM, {}, eid="k"))
+        return first.id, (await mesh.next_event()).id
+
+    assert asyncio.run(scenario()) == ("s", "k")
@@ -0,0 +1,16 @@
+import copy
+
+from bench.suite import compare, run
+
+
+def test_bench_run_and_compare_flags_regressions():
+    cur = run(quick=True, repeat=1, only="kem.subject_len")
+    assert set(cur["results"]) == {"kem.subject_len[100]", "kem.subject_len[10000]"}
+    assert all(r["ops"] > 0 and r["us_per_op"] > 0 for r in cur["results"].values())
+
+    slow = copy.deepcopy(cur)
+    slow["results"]["kem.subject_len[100]"]["us_per_op"] *= 2
+    del slow["results"]["kem.subject_len[10000]"]
+    rep = compare(cur, slow, threshold=0.25)
+    assert rep["regressions"] == ["kem.subject_len[100]"] and rep["missing"] == ["kem.subject_len[10000]"]
+    assert compare(slow, cur)["cases"]["kem.subject_len[100]"]["status"] == "improved"
@@ -0,0 +1,55 @@
+import pytest
+from spx_types import codec
+from spx_types.action import Action, AckPolicy
+from spx_types.event import Event, EventChannel, EventType
+from spx_types.intention import Intention, IntentionStatus
+from spx_types.memory import MemoryOp, MemoryOpType
+
+
+def _records():
+    ev = Event.subject("A", EventType.PERCEPTION, {"i": -3, "x": 1.5, "s": "ï", "l": [1, (2, None)],
+                                                    "b": b"\x00", "big": 1 << 70, "st": {1, 2}},
+                       salience=0.25, context={"k": True}).with_t1(12.5)
+    kev = Event.kernel(EventType.SYSTEM, {})
+    other = Event(id="e", type=EventType.MEMORY, payload={}, origin="KERNEL", subject_id="B",
+                  salience=0.0, credibility=0.5, channel=EventChannel.SUBJECT, valid=False)
+    act = Action(id="a", effector="log", params={"m": "x"}, idempotency_key="k",
+                 ack_policy=AckPolicy.REQUIRED, compensation=None, origin="A")
+    it = Intention(id="i", goal="g", params={}, expected_effect={"e": 1}, risk=0.1, cost=2.0,
+                   priority=0.9, source_event="e", origin="A", stop_criteria={},
+                   status=IntentionStatus.APPROVED)
+    op = MemoryOp(id="m", op=MemoryOpType.RETRIEVE, scope="WM", indices={"origin": "A"},
+                  payload={}, origin="A")
+    return [ev, kev, other, act, it, op]
+
+
+def test_codec_roundtrip_and_batch():
+    recs = _records()
+    for r in recs:
+        assert codec.decode(codec.encode(r, allow_pickle=True), allow_pickle=True) == r
+    buf = codec.encode_batch(recs, allow_pickle=True)
+    assert codec.decode_batch(buf, allow_pickle=True) == recs
+    # заголовок читається з memoryview-зрізу без декодування payload
+    off = codec.batch_offsets(buf)[0]
+    h = codec.decode_header(memoryview(buf), off)
+    assert (h.type, h.salience, h.ts_T1, h.valid) == (EventType.PERCEPTION, 0.25, 12.5, True)
+    assert codec.record_kind(buf, codec.batch_offsets(buf)[3]) == codec.KIND_ACTION
+    assert [h.channel for h in codec.batch_headers(codec.encode_batch(recs[:3], allow_pickle=True))] == \
+        [EventChannel.SUBJECT, EventChannel.KERNEL, EventChannel.SUBJECT]
+
+
+def test_codec_pickle_only_when_allowed():
+    ev = _records()[0]   # payload з множиною — тегу для неї немає
+    with pytest.raises(TypeError):
+        codec.encode(ev)
+    out = bytearray(b"x")
+    with pytest.raises(TypeError):
+        codec.encode_into(out, ev)
+    assert out == b"x"
+    raw = codec.encode(ev, allow_pickle=True)
+    with pytest.raises(ValueError):
+        codec.decode(raw)
+    with pytest.raises(ValueError):
+        codec.decode_batch(codec.encode_batch([ev], allow_pickle=True))
+    plain = Event.subject("A", EventType.PERCEPTION, {"x": [1, 2.5, None]})
+    assert codec.decode(codec.encode(plain)) == plain
@@ -0,0 +1,50 @@
+import logging
+from utils import diagnostics
+from utils.diagnostics import log_info, log_warn, logging_metrics, setup_logging, shutdown_logging
+
+
+class _Costly:
+    renders = 0
+
+    def __str__(self):
+        _Costly.renders += 1
+        return "costly"
+
+
+def test_async_logging_is_lazy_levelled_and_rate_limited(tmp_path):
+    path = tmp_path / "spx.log"
+    setup_logging({"mode": "async", "console": False, "file": str(path),
+                   "levels": {"hb": "WARNING"}, "rate_limits": {"rf": 3}})
+    try:
+        assert diagnostics._state["listener"] is not None
+        log_info("%s: HB-cycle", _Costly(), sub="hb")          # нижче рівня підсистеми
+        assert _Costly.renders == 0
+        for i in range(10):
+            log_info("%s: RF-cycle", f"S{i}", sub="rf")
+        log_warn("KEM: %s", _Costly(), sub="kem")
+        assert logging_metrics()["suppressed"] == {"rf": 7}
+    finally:
+        shutdown_logging()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [ln.split("] ", 1)[1] for ln in lines] == ["S0: RF-cycle", "S1: RF-cycle", "S2: RF-cycle", "KEM: costly"]
+    assert _Costly.renders == 1
+
+
+def test_async_logging_snapshots_args_at_call_time(tmp_path):
+    path = tmp_path / "spx.log"
+    setup_logging({"mode": "async", "console": False, "file": str(path)})
+    listener = diagnostics._state["listener"]
+    listener.stop()   # фоновий потік стоїть — записи чекають у черзі
+    try:
+        state = {"n": 1}
+        log_info("state %s", state, sub="kem")
+        try:
+            raise ValueError(state["n"])
+        except ValueError:
+            logging.getLogger("spx.kem").exception("boom")
+        state["n"] = 2   # зміна після виклику не потрапляє в лог
+    finally:
+        listener.start()
+        shutdown_logging()
+    text = path.read_text(encoding="utf-8")
+    assert "state {'n': 1}" in text and "ValueError: 1" in text and "'n': 2" not in text
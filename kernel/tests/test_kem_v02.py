@@ -0,0 +1,307 @@
+import pytest
+from kernel.kem import KernelEventMesh
+from spx_types.event import Event, EventType, EventChannel
+
+def _ev(sid: str, i: int) -> Event:
+    return Event.subject(sid, EventType.SYSTEM, {"i": i}, eid=f"{sid}-{i}")
+
+def test_fetch_for_keeps_other_subjects_in_order():
+    kem = KernelEventMesh.init()
+    for i in range(3):
+        kem.publish(_ev("A", i))
+        kem.publish(_ev("B", i))
+
+    assert kem.subject_len("A") == 3 and kem.subject_len("B") == 3
+    got = kem.fetch_for("A", limit=2)
+    assert [e.id for e in got] == ["A-0", "A-1"]
+    assert kem.subject_len("A") == 1
+
+    # global FIFO для решти подій не порушено
+    order = [kem.next_event().id for _ in range(4)]
+    assert order == ["B-0", "B-1", "A-2", "B-2"]
+    assert kem.empty() and kem.subject_len("B") == 0
+
+def test_drop_oldest_updates_subject_depth():
+    kem = KernelEventMesh.init()
+    kem.configure(subject_max=2, policy="drop_oldest")
+    kem.publish(_ev("A", 0))
+    kem.publish(_ev("B", 0))
+    kem.publish(_ev("B", 1))  # витісняє A-0
+
+    assert kem.subject_len("A") == 0 and kem.subject_len("B") == 2
+    assert kem.metrics()["dropped_subject"] == 1
+    assert kem.fetch_for("A") == []
+
+def test_drain_by_removes_only_matches():
+    kem = KernelEventMesh.init()
+    kem.publish(Event.kernel(EventType.SYSTEM, {}, eid="k-0"))
+    kem.publish(_ev("A", 0))
+    kem.publish(Event.subject("A", EventType.PERCEPTION, {}, eid="A-p"))
+    kem.publish(_ev("B", 0))
+
+    got = kem.drain_by(type=EventType.SYSTEM, channel=EventChannel.SUBJECT)
+    assert [e.id for e in got] == ["A-0", "B-0"]
+    assert kem.drain_by(subject_id="A", type=EventType.PERCEPTION, limit=1)[0].id == "A-p"
+    assert [e.id for e in kem.drain_all()["kernel"]] == ["k-0"]
+    assert kem.empty()
+
+def test_drop_lowest_salience_and_salience_order():
+    kem = KernelEventMesh.init()
+    kem.configure(subject_max=3, policy="drop_lowest_salience", subject_order="salience")
+    for eid, sal in (("lo-1", 0.1), ("hi", 0.9), ("lo-2", 0.1)):
+        kem.publish(Event.subject("A", EventType.SYSTEM, {}, eid=eid, salience=sal))
+
+    kem.publish(Event.subject("A", EventType.SYSTEM, {}, eid="mid", salience=0.5))  # витісняє lo-1
+    kem.publish(Event.subject("A", EventType.SYSTEM, {}, eid="noise", salience=0.05))  # відкидається сама
+
+    assert kem.metrics()["dropped_subject"] == 2
+    assert [kem.next_event().id for _ in range(3)] == ["hi", "mid", "lo-2"]
+
+def test_subject_quota_isolates_chatty_subject():
+    kem = KernelEventMesh.init()
+    kem.configure(subject_max=10, policy="drop_oldest")
+    kem.set_subject_quota("CHATTY", 2)
+    kem.publish(_ev("QUIET", 0))
+    for i in range(5):
+        kem.publish(_ev("CHATTY", i))
+
+    assert kem.credits("CHATTY") == 0 and not kem.has_credit("CHATTY")
+    assert kem.credits("QUIET") == 7
+    assert [e.id for e in kem.fetch_for("CHATTY")] == ["CHATTY-3", "CHATTY-4"]
+    assert kem.subject_len("QUIET") == 1
+    per_subject = kem.metrics()["subjects"]
+    assert per_subject["CHATTY"]["dropped"] == 3 and "QUIET" not in per_subject
+
+def test_subject_quota_reject():
+    kem = KernelEventMesh.init()
+    kem.configure(policy="reject", subject_quota=1)
+    kem.publish(_ev("A", 0))
+    try:
+        kem.publish(_ev("A", 1))
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+    assert kem.metrics()["subjects"]["A"]["rejected"] == 1
+
+def test_concurrent_publish_and_fetch_keep_counts_consistent():
+    import threading
+    kem = KernelEventMesh.init()
+    kem.configure(subject_max=100_000)
+    fetched = []
+
+    def producer(sid):
+        for i in range(2000):
+            kem.publish(_ev(sid, i))
+
+    def consumer(sid):
+        while len(fetched) < 8000:
+            fetched.extend(kem.fetch_for(sid, 50))
+
+    producers = [threading.Thread(target=producer, args=(s,)) for s in "ABCD"]
+    consumers = [threading.Thread(target=consumer, args=(s,)) for s in "ABCD"]
+    for t in producers + consumers:
+        t.start()
+    for t in producers + consumers:
+        t.join(timeout=10)
+    assert len(fetched) == 8000 and kem.empty()
+    for sid in "ABCD":
+        ids = [e.id for e in fetched if e.subject_id == sid]
+        assert ids == [f"{sid}-{i}" for i in range(2000)]  # FIFO per subject
+
+def test_striped_subject_channel_under_global_eviction():
+    # квоти й fetch_for — під смугою суб'єкта; витіснення чужої події й next_subject_event — під усіма
+    import threading
+    kem = KernelEventMesh.init()
+    kem.configure(subject_max=300, subject_quota=60, policy="drop_oldest")
+    depth = {}
+    kem.add_depth_listener(lambda sid, d: depth.__setitem__(sid, d))
+    sids = [f"S{i}" for i in range(8)]
+    fetched = {sid: [] for sid in sids}
+    nexted = {sid: [] for sid in sids}
+    stop = threading.Event()
+
+    def producer(sid):
+        for i in range(3000):
+            kem.publish(_ev(sid, i))
+            if i % 7 == 0:
+                fetched[sid].extend(kem.fetch_for(sid, 5))
+
+    def consumer():
+        while not stop.is_set():
+            ev = kem.next_subject_event()
+            if ev is not None:
+                nexted[ev.subject_id].append(ev)
+
+    producers = [threading.Thread(target=producer, args=(s,)) for s in sids]
+    cons = threading.Thread(target=consumer)
+    for t in producers + [cons]:
+        t.start()
+    for t in producers:
+        t.join(timeout=30)
+    stop.set()
+    cons.join(timeout=10)
+    q = kem.subject_queue
+    assert len(q) <= 300 and sum(q.subject_len(s) for s in sids) == len(q) == len(list(q))
+    consumed = 0
+    for sid in sids:
+        assert q.subject_len(sid) <= 60 and depth.get(sid, 0) == q.subject_len(sid)
+        fetched[sid] += kem.fetch_for(sid)
+        streams = [[e.payload["i"] for e in evs] for evs in (fetched[sid], nexted[sid])]
+        assert all(ns == sorted(ns) for ns in streams)  # FIFO у кожному потоці споживання
+        ns = streams[0] + streams[1]
+        assert len(set(ns)) == len(ns)
+        consumed += len(ns)
+    assert kem.empty() and kem.dropped_subject > 0
+    assert consumed + kem.dropped_subject == 8 * 3000
+
+def test_journal_replays_unconsumed_events(tmp_path):
+    from kernel.kem_journal import KEMJournal
+    cfg = {"journal_dir": str(tmp_path), "journal_fsync_batch": 4, "journal_segment_kb": 1}
+    kem = KernelEventMesh.init()
+    assert kem.attach_journal(KEMJournal.from_config(cfg)) == 0
+    kem.publish(Event.kernel(EventType.SYSTEM, {}, eid="k-0"))
+    for i in range(40):
+        kem.publish(_ev("A", i))
+    kem.fetch_for("A", limit=30)
+    kem.drain_kernel()
+    kem.journal.close()
+    # кадр, обірваний посередині запису, ігнорується
+    last = sorted(tmp_path.iterdir())[-1]
+    with open(last, "ab") as f:
+        f.write(b"\x10\x00\x00")
+
+    kem2 = KernelEventMesh.init()
+    assert kem2.attach_journal(KEMJournal.from_config(cfg)) == 10
+    assert [e.id for e in kem2.fetch_for("A")] == [_ev("A", i).id for i in range(30, 40)]
+    m = kem2.metrics()["journal"]
+    assert m["replayed"] == 10 and m["live"] == 0
+    kem2.journal.close()
+    assert KernelEventMesh.init().attach_journal(KEMJournal.from_config(cfg)) == 0
+
+def test_journal_same_event_published_twice(tmp_path):
+    from kernel.kem_journal import KEMJournal
+    cfg = {"journal_dir": str(tmp_path), "journal_fsync_batch": 1, "journal_segment_kb": 1}
+    kem = KernelEventMesh.init()
+    kem.attach_journal(KEMJournal.from_config(cfg))
+    ev = _ev("A", 0)
+    kem.publish(ev)
+    kem.publish(ev)
+    assert kem.metrics()["journal"]["live"] == 2
+    assert len(kem.fetch_for("A")) == 2
+    assert kem.metrics()["journal"]["live"] == 0
+    kem.journal.close()
+    assert KernelEventMesh.init().attach_journal(KEMJournal.from_config(cfg)) == 0
+
+def test_publish_many_batch_validation_and_order():
+    kem = KernelEventMesh.init()
+    kem.configure(subject_max=8, policy="drop_oldest", subject_quota=3)
+    evs = Event.subject_many("A", EventType.PERCEPTION, [{"i": i} for i in range(4)], salience=0.7)
+    assert len({e.id for e in evs}) == 4 and all(e.salience == 0.7 for e in evs)
+    assert kem.publish_many(evs + [Event.kernel(EventType.SYSTEM, {}, eid="k")]) == 5
+    assert [e.payload["i"] for e in kem.fetch_for("A")] == [1, 2, 3]   # квота 3 → A-0 витіснено
+    assert kem.next_kernel_event().id == "k"
+    # одна невалідна подія — нічого не публікується
+    from spx_types.event import event_unchecked
+    bad = event_unchecked("x", EventType.SYSTEM, {}, "B", "B", 1.5, 1.0, {}, 0.0, None, EventChannel.SUBJECT, True)
+    with pytest.raises(ValueError):
+        kem.publish_many([Event.subject("B", EventType.SYSTEM), bad])
+    assert kem.empty()
+
+def _ring_producer(name: str, n: int) -> None:
+    from kernel.kem_ring import EventRing
+    ring = EventRing.attach(name)
+    i = 0
+    while i < n:
+        if ring.push(_ev("P", i)):
+            i += 1
+    ring.close()
+
+
+def test_ingress_ring_from_other_process():
+    import multiprocessing as mp
+    import time
+    kem = KernelEventMesh.init()
+    kem.configure(subject_max=100000, subject_quota=100000)
+    ring = kem.open_ingress_ring(capacity=4096)
+    # kernel-події із кільця відкидаються
+    ring.push(Event.kernel(EventType.SYSTEM, {}))
+    p = mp.get_context("spawn").Process(target=_ring_producer, args=(ring.name, 500))
+    p.start()
+    deadline = time.monotonic() + 30
+    while kem.subject_len("P") < 500 and time.monotonic() < deadline:
+        kem.drain_ingress(limit=64)
+    p.join(timeout=10)
+    assert [e.id for e in kem.fetch_for("P")] == [f"P-{i}" for i in range(500)]
+    m = kem.metrics()
+    assert m["ingress_invalid"] == 1 and m["ingress"][0]["depth"] == 0
+    kem.close()
+
+
+def test_ingress_ring_skips_undecodable_records():
+    from spx_types import codec
+    kem = KernelEventMesh.init()
+    ring = kem.open_ingress_ring(capacity=4096)
+    ring.push(_ev("A", 0))
+    # pickle із зовнішнього процесу не розпаковується; сміття не зупиняє такт
+    ring._push(codec.encode(Event.subject("A", EventType.PERCEPTION, {"s": {1}}), allow_pickle=True))
+    ring._push(b"\xff" * 40)
+    ring._push(codec.encode(_ev("A", 1))[:-3])
+    ring.push(_ev("A", 2))
+    assert kem.drain_ingress() == 2
+    assert [e.id for e in kem.fetch_for("A")] == ["A-0", "A-2"]
+    m = kem.metrics()
+    assert m["ingress_invalid"] == 3 and m["ingress"][0]["depth"] == 0
+    kem.close()
+
+
+def test_ingress_ring_overflow_policies():
+    from kernel.kem_ring import RingFull
+    kem = KernelEventMesh.init()
+    ring = kem.open_ingress_ring(capacity=4096)
+    sent = sum(ring.push(_ev("A", i)) for i in range(1000))   # drop_oldest: вхідна відкидається
+    assert 0 < sent < 1000 and ring.metrics()["dropped"] == 1000 - sent
+    assert kem.drain_ingress() == sent
+    kem.close()
+
+    kem = KernelEventMesh.init()
+    kem.configure(policy="reject")
+    ring = kem.open_ingress_ring(capacity=4096)
+    with pytest.raises(RingFull):
+        for i in range(1000):
+            ring.push(_ev("A", i))
+    assert kem.drain_ingress() > 0 and kem.metrics()["ingress"][0]["rejected"] == 1
+    kem.close()
+
+
+def test_ingress_ring_reject_leaves_refused_events_in_ring():
+    from kernel.kem_ring import RingFull
+    kem = KernelEventMesh.init()
+    kem.configure(policy="reject", subject_max=3)
+    ring = kem.open_ingress_ring(capacity=4096)
+    sent = 0
+    with pytest.raises(RingFull):
+        for i in range(1000):
+            ring.push(_ev("A", i))
+            sent += 1
+            if i == 5:
+                assert kem.drain_ingress() == 3   # решта лишилась у кільці, не загубилась
+    assert kem.drain_ingress() == 0 and ring.depth() == sent - 3
+    assert kem.metrics()["rejected_subject"] == 0
+    got = []
+    while len(got) < sent:
+        got += kem.fetch_for("A")
+        kem.drain_ingress()
+    assert [e.id for e in got] == [f"A-{i}" for i in range(sent)]
+    kem.close()
+
+
+def test_fifo_consumption_keeps_salience_heap_bounded():
+    kem = KernelEventMesh.init()
+    kem.configure(policy="drop_lowest_salience")
+    for i in range(5000):
+        kem.publish(Event.kernel(EventType.SYSTEM, {"i": i}))
+        assert len(kem.drain_by(channel=EventChannel.KERNEL, limit=8)) == 1
+        kem.publish(_ev("A", i))
+        assert kem.next_subject_event().id == f"A-{i}"
+    assert not kem.kernel_queue and len(kem.kernel_queue._low) <= 64 + 1
+    assert not kem.subject_queue and len(kem.subject_queue._low) <= 64 + 1
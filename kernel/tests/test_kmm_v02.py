@@ -0,0 +1,229 @@
+from kernel.kmm import KernelMemoryModel
+import numpy as np
+
+def test_kmm_scopes_and_bind():
+    kmm = KernelMemoryModel()
+    kmm.encode_wm("a", {"x": 1})
+    kmm.encode_wm("b", {})
+    kmm.encode_em("c", {"y": 2})
+    kmm.bind("a", "c", "causes")
+    kmm.bind("a", "c", "precedes")  # один край на пару, як у DiGraph
+    kmm.bind("c", "ghost", "refers")  # bind створює вузол без scope
+
+    assert kmm.wm_load() == 2 and kmm.total_nodes() == 4
+    kmm.encode_em("a", {"z": 3})  # WM → EM, payload зливається
+    assert kmm.wm_load() == 1
+    assert kmm.graph.node("a") == {"x": 1, "z": 3, "scope": "EM"}
+    assert kmm.graph.rel_type("a", "c") == "precedes"
+    assert kmm.graph.number_of_edges() == 2
+    assert kmm.graph.scope_of("ghost") is None
+
+def test_compact_adjacency_survives_rebuild():
+    kmm = KernelMemoryModel()
+    n = 3000
+    for i in range(n):
+        kmm.encode_wm(f"n{i}", {})
+    for i in range(n):
+        kmm.bind(f"n{i}", f"n{(i * 7) % n}", "r")
+        kmm.bind(f"n{i}", f"n{(i + 1) % n}", "next")
+    g = kmm.graph
+    assert sorted(g.successors("n5")) == sorted({"n35", "n6"})
+    assert sorted(g.predecessors("n0")) == ["n0", "n2999"]
+    g.compact()
+    assert sorted(g.successors("n5")) == sorted({"n35", "n6"})
+
+def test_retrieve_indexes_and_execute():
+    from spx_types.memory import MemoryOp, MemoryOpType
+    kmm = KernelMemoryModel()
+    kmm.encode_wm("a", {"kind": "obs", "tag": "x"}, origin="PID0", ts_T1=1.0)
+    kmm.encode_wm("b", {"kind": "obs"}, origin="ROOT", ts_T1=2.0)
+    kmm.encode_em("c", {"kind": "plan"}, origin="ROOT", ts_T1=3.0)
+    kmm.bind("a", "b", "next")
+    kmm.bind("b", "c", "causes")
+
+    ids = lambda rs: [n for n, _ in rs]
+    assert ids(kmm.retrieve(where={"kind": "obs"})) == ["a", "b"]
+    assert ids(kmm.retrieve("WM", origin="ROOT")) == ["b"]
+    assert ids(kmm.retrieve(has="tag")) == ["a"]
+    assert ids(kmm.retrieve(t_from=1.5, t_to=3.0)) == ["b", "c"]
+    assert ids(kmm.retrieve(around="a", hops=1)) == ["a", "b"]
+    assert ids(kmm.retrieve(around="a", hops=2, direction="out")) == ["a", "b", "c"]
+    assert ids(kmm.retrieve(around="c", hops=2, rel_type="causes")) == ["b", "c"]
+
+    # інкрементальне оновлення: зміна значення, origin і часу
+    kmm.encode_em("a", {"kind": "plan"}, origin="ROOT", ts_T1=4.0)
+    assert ids(kmm.retrieve(where={"kind": "obs"})) == ["b"]
+    assert ids(kmm.retrieve(where={"kind": "plan"}, origin="ROOT")) == ["c", "a"]
+    assert ids(kmm.retrieve(t_to=2.0)) == ["b"]
+
+    op = MemoryOp(id="d", op=MemoryOpType.ENCODE, scope="WM", indices={},
+                  payload={"kind": "obs"}, origin="PID0", ts_T1=5.0)
+    assert kmm.execute(op) == "d"
+    kmm.execute(MemoryOp(id="b1", op=MemoryOpType.BIND, scope="WM",
+                         indices={"src": "d", "dst": "b", "rel_type": "next"},
+                         payload={}, origin="PID0"))
+    res = kmm.execute(MemoryOp(id="q", op=MemoryOpType.RETRIEVE, scope="WM",
+                               indices={"where": {"kind": "obs"}, "around": "d"},
+                               payload={}, origin="PID0"))
+    assert res == [("b", {"kind": "obs", "scope": "WM"}), ("d", {"kind": "obs", "scope": "WM"})]
+
+def test_consolidation_bounded_batches_and_merge():
+    kmm = KernelMemoryModel({"wm_keep": 2, "consolidation_batch": 2, "consolidation_budget_ms": 1000})
+    kmm.encode_wm("a", {"kind": "obs", "v": 1}, ts_T1=1.0)
+    kmm.encode_wm("b", {"kind": "obs", "v": 1}, ts_T1=2.0)   # дублікат "a"
+    kmm.encode_wm("c", {"kind": "obs", "v": 2}, ts_T1=3.0)
+    kmm.encode_wm("d", {"kind": "obs", "v": 3}, ts_T1=4.0)
+    kmm.encode_wm("e", {"kind": "obs", "v": 4}, ts_T1=5.0)
+    kmm.bind("x", "b", "sees")
+    kmm.retrieve(where={"v": 1})           # доступ: a, b стають найсвіжішими (LRU)
+    assert kmm.pending_consolidations == 3
+
+    assert kmm.consolidate() == 2          # c, d — найдавніше використані
+    assert kmm.graph.scope_of("c") == "EM" and kmm.graph.scope_of("d") == "EM"
+    assert kmm.consolidate() == 1          # e; pending вичерпано
+    assert kmm.consolidate() == 0 and kmm.wm_load() == 2
+
+    kmm.consolidator.cfg.wm_keep = 0
+    kmm.consolidate()
+    # b злито в a: ребра переприв'язані, support зрослий, b очищено
+    assert kmm.graph.node("a") == {"kind": "obs", "v": 1, "support": 2, "scope": "EM"}
+    assert kmm.graph.scope_of("b") is None and kmm.graph.has_edge("x", "a")
+    assert [n for n, _ in kmm.retrieve(where={"v": 1})] == ["a"]
+    assert kmm.index.ts_of(kmm.graph.index_of("a")) == 2.0
+    assert kmm.consolidator.snapshot()["merged"] == 1
+
+def test_consolidation_salience_eviction_and_entropy():
+    kmm = KernelMemoryModel({"wm_keep": 1, "eviction": "salience"})
+    kmm.encode_wm("hi", {"salience": 0.9})
+    kmm.encode_wm("lo", {"salience": 0.1})
+    kmm.encode_wm("mid", {"salience": 0.5})
+    assert kmm.memory_entropy() == 0.0     # усі WM-вузли щойно використані
+    kmm.consolidator.consolidate(batch_max=1)
+    assert kmm.graph.scope_of("lo") == "EM"
+    assert kmm.memory_entropy() == 1.0     # після RF-кроку доступів ще не було
+    kmm.consolidate()
+    assert [n for n, _ in kmm.retrieve("WM")] == ["hi"]
+
+def test_salience_eviction_compares_current_salience():
+    kmm = KernelMemoryModel({"wm_keep": 1, "eviction": "salience", "salience_half_life_s": 10})
+    kmm.encode_wm("old", {"salience": 0.8})
+    kmm.forget(now=0.0)
+    kmm.forget(now=20.0)                   # old: 0.8 → 0.2
+    kmm.encode_wm("fresh", {"salience": 0.5})
+    kmm.consolidator.consolidate(batch_max=1)
+    assert kmm.graph.scope_of("old") == "EM" and kmm.graph.scope_of("fresh") == "WM"
+
+def test_salience_columns_decay_topk_and_forget():
+    kmm = KernelMemoryModel({"salience_half_life_s": 10, "forget_threshold": 0.2,
+                             "access_boost": 0.0})
+    kmm.encode_wm("a", {"salience": 0.9})
+    kmm.encode_em("b", {"salience": 0.3})
+    kmm.encode_em("c", {"salience": 0.6})
+    kmm.bind("a", "b", "r")
+    assert kmm.top_salient(2) == ["a", "c"]
+    assert kmm.top_salient(5, scope="EM") == ["c", "b"]
+
+    assert kmm.forget(now=100.0) == 0      # перший виклик лише фіксує час
+    assert kmm.forget(now=110.0) == 1      # напіврозпад: b 0.3 → 0.15 < 0.2
+    assert kmm.graph.scope_of("b") is None and kmm.retrieve(has="salience")[0][0] in ("a", "c")
+    assert abs(kmm.columns.salience_of(kmm.graph.index_of("a")) - 0.45) < 1e-9
+    assert kmm.top_salient(3) == ["a", "c"]
+    i = kmm.graph.index_of("a")
+    assert kmm.columns.access[i] == 2      # encode + retrieve
+
+def test_forgotten_node_is_not_retrieved(tmp_path):
+    cfg = {"salience_half_life_s": 10, "forget_threshold": 0.2, "snapshot_dir": str(tmp_path)}
+    kmm = KernelMemoryModel.init(cfg)
+    kmm.encode_wm("a", {"salience": 0.9})
+    kmm.encode_wm("b", {"salience": 0.3})
+    kmm.bind("a", "b", "r")
+    kmm.bind("b", "a", "r")
+    kmm.checkpoint()
+    kmm.forget(now=0.0)
+    assert kmm.forget(now=10.0) == 1
+    assert [n for n, _ in kmm.retrieve(around="a")] == ["a"]
+    assert kmm.retrieve(around="b") == []
+    assert kmm.total_nodes() == 1 and kmm.graph.number_of_edges() == 0
+    assert not kmm.graph.has_node("b") and kmm.graph.successors("a") == []
+    kmm.checkpoint()                       # дельта з надгробками
+
+    warm = KernelMemoryModel.init(cfg)
+    assert warm.total_nodes() == 1 and list(warm.graph.edges()) == []
+    warm.bind("a", "b", "again")           # повторне використання id оживляє вузол
+    assert warm.total_nodes() == 2 and list(warm.graph.edges()) == [("a", "b", "again")]
+
+def test_snapshot_full_delta_roundtrip(tmp_path):
+    cfg = {"snapshot_dir": str(tmp_path), "snapshot_full_every": 8}
+    kmm = KernelMemoryModel.init(cfg)
+    kmm.encode_wm("a", {"x": 1, "t": (1, 2)}, origin="PID0", ts_T1=1.0)
+    kmm.encode_em("b", {"y": "z"}, ts_T1=2.0)
+    kmm.bind("a", "b", "r1")
+    assert kmm.checkpoint().endswith(".full")
+    kmm.encode_wm("c", {"k": 3}, origin="ROOT", ts_T1=3.0)
+    kmm.encode_em("a", {"x": 5})            # змінений старий вузол
+    kmm.bind("a", "b", "r2")                # змінений тип старого ребра
+    kmm.bind("c", "a", "r1")
+    assert kmm.checkpoint().endswith(".delta")
+
+    warm = KernelMemoryModel.init(cfg)
+    g = warm.graph
+    assert list(g.nodes()) == ["a", "b", "c"]
+    assert g.node("a") == {"x": 5, "t": (1, 2), "scope": "EM"}
+    assert sorted(g.edges()) == [("a", "b", "r2"), ("c", "a", "r1")]
+    assert warm.wm_load() == 1
+    assert [n for n, _ in warm.retrieve(origin="ROOT")] == ["c"]
+    assert [n for n, _ in warm.retrieve(t_from=1.5)] == ["b", "c"]
+
+    warm.encode_wm("d", {})
+    warm.bind("d", "a", "x")
+    warm.checkpoint()
+    again = KernelMemoryModel.init(cfg)
+    assert again.graph.successors("d") == ["a"] and again.total_nodes() == 4
+
+def test_background_full_snapshot_is_point_in_time(tmp_path):
+    cfg = {"snapshot_dir": str(tmp_path), "checkpoint_interval_s": 1.0}
+    kmm = KernelMemoryModel.init(cfg)
+    kmm.encode_wm("a", {"x": 1}, ts_T1=1.0)
+    kmm.bind("a", "a", "self")
+    kmm.maybe_checkpoint(now=0.0)
+    assert kmm.maybe_checkpoint(now=2.0).endswith(".full")   # перший знімок — повний, у фоні
+    kmm.encode_wm("a", {"x": 2})            # після захоплення — лише в наступну дельту
+    kmm.encode_wm("b", {"y": 1}, ts_T1=2.0)
+    kmm.snapshots.wait()
+    only_full = KernelMemoryModel.init(cfg)
+    assert only_full.graph.node("a") == {"x": 1, "scope": "WM"} and not only_full.graph.has_node("b")
+    assert kmm.checkpoint().endswith(".delta")
+
+    warm = KernelMemoryModel.init(cfg)
+    assert warm.graph.node("a") == {"x": 2, "scope": "WM"} and warm.graph.has_edge("a", "a")
+    assert not warm.index._kv_built and not warm.index._ts_built   # під час boot нічого не будується
+    assert [n for n, _ in warm.retrieve(t_from=0.0)] == ["a", "b"]
+    # із іншим фільтром payload перевіряється напряму, без побудови payload-індексів
+    assert [n for n, _ in warm.retrieve(scope="WM", where={"x": 2})] == ["a"] and not warm.index._kv_built
+    assert [n for n, _ in warm.retrieve(has="y")] == ["b"] and warm.index._kv_built
+
+
+def test_delta_carries_only_changed_column_rows(tmp_path):
+    from kernel.kmm_columns import NodeColumns
+    from kernel.kmm_snapshot import SnapshotFile
+    cfg = {"snapshot_dir": str(tmp_path), "salience_half_life_s": 10.0, "forget_threshold": 0.0}
+    kmm = KernelMemoryModel.init(cfg)
+    for i in range(100):
+        kmm.encode_wm(f"n{i}", {"salience": 0.5}, origin="A", ts_T1=float(i))
+    kmm.checkpoint()
+    kmm.forget(now=0.0)
+    kmm.forget(now=5.0)
+    kmm.encode_wm("n3", {"salience": 0.9}, origin="B")
+    kmm.encode_wm("new", {}, ts_T1=200.0)
+    kmm.forget(now=7.0)
+    snap = SnapshotFile(kmm.checkpoint())
+    # затухання всіх вузлів — два множники, а не 101 рядок
+    assert snap.arr("col.rows").tolist() == [3, 100] and len(snap.arr("col.decay", np.float64)) == 2
+
+    warm = KernelMemoryModel.init(cfg)
+    for name in NodeColumns.COLUMNS:
+        a, b = getattr(warm.columns, name)[:101], getattr(kmm.columns, name)[:101]
+        assert a.tobytes() == b.tobytes(), name
+    assert warm.columns.origin_names == ["A", "B"]
+    assert [n for n, _ in warm.retrieve(origin="B")] == ["n3"]
+    assert [n for n, _ in warm.retrieve(t_from=150.0)] == ["new"]
@@ -45,3 +45,65 @@ def test_kernel_overload_triggers_rf():
 
     kms.on_cycle_begin(kem, None)
     assert kms.phase() == "RF"
+
+def test_heap_mode_tracks_debt_incrementally():
+    kem = KernelEventMesh.init()
+    kms = KernelMetaScheduler.init({
+        "hb_period": 0.01,
+        "scheduler": {"mode": "heap", "rf_trigger_debt": 3, "rf_max_cycles": 1,
+                      "kernel_overload_threshold": 999, "rf_window_max": 2}
+    })
+    for sid in ("PID0", "ROOT", "A", "B", "C"):
+        kms.register(sid)
+
+    kms.on_cycle_begin(kem, None)       # під'єднання до KEM, черги порожні
+    assert kms.phase() == "HB"
+    assert list(kms.iter_cycle_order()) == ["PID0", "ROOT", "A", "B", "C"]
+
+    _fill_subject(kem, "B", 3)
+    _fill_subject(kem, "C", 1)
+    _fill_subject(kem, "A", 2)
+    kms.deregister("C")
+    kms.on_cycle_begin(kem, None)
+    assert kms.phase() == "RF"
+    # системні суб'єкти першими, далі top-2 за debt
+    assert kms.schedule_cycle_order() == ["PID0", "ROOT", "B", "A"]
+
+    kem.fetch_for("B")
+    assert kms.snapshot()["last_debt"]["B"] == 0.0
+
+def test_weighted_hb_uses_t1_multiplier_shares():
+    from spx_types.subject import SubjectMetadata
+    kms = KernelMetaScheduler.init({"hb_period": 0.01, "scheduler": {"hb_policy": "weighted"}})
+    kms.register(SubjectMetadata(subject_id="FAST", t1_multiplier=2.0, kind="Other"))
+    kms.register(SubjectMetadata(subject_id="SLOW", t1_multiplier=0.5, kind="Other"))
+    kms.register("NORMAL")
+
+    assert list(kms.iter_cycle_order()) == ["FAST", "NORMAL", "FAST"]
+    assert list(kms.iter_cycle_order()) == ["SLOW", "NORMAL", "FAST", "FAST"]
+    assert kms.snapshot()["hb_served"] == {"FAST": 4, "SLOW": 1, "NORMAL": 2}
+
+def test_cognitive_trigger_from_kmm_pending():
+    from kernel.kmm import KernelMemoryModel
+    kem = KernelEventMesh.init()
+    kmm = KernelMemoryModel({"wm_keep": 1})
+    kms = KernelMetaScheduler.init({
+        "hb_period": 0.01,
+        "rf_triggers": {"debt_threshold": 3, "entropy_threshold": 0.0},
+        "rf_cooldown": 60.0,
+        "scheduler": {"rf_trigger_debt": 99, "rf_max_cycles": 1},
+    })
+    kms.register("S")
+    for i in range(3):
+        kmm.encode_wm(f"n{i}", {"i": i})
+    kms.on_cycle_begin(kem, kmm)
+    assert kms.phase() == "HB"             # pending = 2 < 3
+
+    kmm.encode_wm("n3", {"i": 3})
+    kms.on_cycle_begin(kem, kmm)
+    assert kms.phase() == "RF"             # pending = 3 → debt 1.0
+    assert kms.snapshot()["cognitive"]["pending"] == 3
+    kms.on_cycle_begin(kem, kmm)
+    kms.on_cycle_begin(kem, kmm)           # rf_max_cycles вичерпано → HB
+    kms.on_cycle_begin(kem, kmm)
+    assert kms.phase() == "HB"             # rf_cooldown блокує повторний вхід
@@ -0,0 +1,65 @@
+import gc
+import urllib.request
+
+from kernel.kem import KernelEventMesh
+from spx_types.event import Event, EventType
+from utils.metrics import MetricsExporter, MetricsRegistry, REGISTRY
+
+
+def test_registry_histograms_and_prometheus_text():
+    reg = MetricsRegistry()
+    h = reg.histogram("spx_test_seconds", "test latency", ("phase",), buckets=(0.001, 0.01, 0.1))
+    for v in (0.0005, 0.002, 0.003, 0.05, 5.0):
+        h.labels("HB").observe(v)
+    reg.counter("spx_test_total", "test counter").inc(3)
+    reg.register_collector("t", lambda: [("spx_test_depth", "gauge", "depth", [({"channel": "k"}, 7)])])
+
+    child = h.labels("HB")
+    assert child.count == 5 and child.quantile(0.5) == 0.01 and child.quantile(1.0) == float("inf")
+    assert reg.histogram("spx_test_seconds", "test latency", ("phase",)) is h
+    text = reg.to_prometheus()
+    assert 'spx_test_seconds_bucket{phase="HB",le="0.01"} 3' in text
+    assert 'spx_test_seconds_bucket{phase="HB",le="+Inf"} 5' in text
+    assert 'spx_test_seconds_count{phase="HB"} 5' in text
+    assert "spx_test_total 3" in text and 'spx_test_depth{channel="k"} 7' in text
+
+
+def test_kem_queue_delay_and_http_export():
+    gc.collect()   # KEM з попередніх тестів (цикли з KMS) не тримають ключ "kem"
+    kem = KernelEventMesh.init()
+    delay = REGISTRY.histogram("spx_kem_queue_delay_seconds", "", ("channel",)).labels("subject")
+    before = delay.count
+    kem.publish(Event.subject("A", EventType.PERCEPTION, {}))
+    kem.publish(Event.subject("A", EventType.PERCEPTION, {}))
+    assert len(kem.fetch_for("A")) == 2 and delay.count == before + 2
+
+    exp = MetricsExporter(port=0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{exp.port}/metrics", timeout=5) as resp:
+            body = resp.read().decode()
+    finally:
+        exp.close()
+    assert '# TYPE spx_kem_queue_delay_seconds histogram' in body
+    assert 'spx_kem_queue_depth{channel="subject"} 0' in body
+
+
+class _Depth:
+    def __init__(self, n):
+        self.n = n
+
+    def collect(self):
+        return [("spx_test_depth", "gauge", "depth", [({"channel": "k"}, self.n)])]
+
+
+def test_second_live_collector_gets_instance_label():
+    reg = MetricsRegistry()
+    a, b = _Depth(1), _Depth(2)
+    assert reg.register_collector("t", a.collect) == "t"
+    assert reg.register_collector("t", b.collect) == "t#2"      # живий "t" не замінюється
+    assert reg.register_collector("t", a.collect) == "t"        # повторна реєстрація того самого
+    text = reg.to_prometheus()
+    assert 'spx_test_depth{channel="k"} 1' in text and 'spx_test_depth{channel="k",instance="2"} 2' in text
+    assert text.count("# TYPE spx_test_depth gauge") == 1
+    del a
+    gc.collect()
+    assert reg.register_collector("t", _Depth(3).collect) == "t"   # мертвий слот звільняється
@@ -0,0 +1,112 @@
+from kernel.kem import KernelEventMesh
+from kernel.kms import KernelMetaScheduler
+from kernel.spm import SubjectProcessManager
+from kernel.runtime import KernelRuntime, _RuntimeCfg
+from spx_types.event import Event, EventType
+
+class _FakeClock:
+    def __init__(self):
+        self.t = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.t
+
+    def sleep(self, dt: float) -> None:
+        self.sleeps.append(round(dt, 6))
+        self.t += dt
+
+class _SlowSubject:
+    def __init__(self, subject_id, kem, kmm, isp, cfg):
+        self.subject_id = subject_id
+        self.cost = cfg.get("cost", 0.0)
+        self.clock = cfg["clock"]
+
+    def hb_cycle(self):
+        self.clock.t += self.cost
+
+def _runtime(cost: float):
+    clock = _FakeClock()
+    kem, kms, spm = KernelEventMesh.init(), KernelMetaScheduler.init({"hb_period": 0.1}), SubjectProcessManager.init()
+    kms.register(spm.spawn(_SlowSubject, kem, None, None, {"subject_id": "S", "cost": cost, "clock": clock}))
+    kem.drain_all()
+    rt = KernelRuntime(kem, None, kms, spm, _RuntimeCfg(hb_period=0.1), clock=clock, sleep_fn=clock.sleep)
+    return rt, kem, clock
+
+def test_runtime_sleeps_to_absolute_deadline():
+    rt, _, clock = _runtime(cost=0.03)
+    stats = rt.run(cycles=3)
+    assert clock.sleeps == [0.07, 0.07, 0.07]  # сон = період мінус вартість такту
+    assert stats["overruns"] == 0
+
+def test_runtime_counts_overruns_and_adapts_kernel_budget():
+    rt, kem, _ = _runtime(cost=0.15)
+    for i in range(40):
+        kem.publish(Event.kernel(EventType.SYSTEM, {"i": i}))
+    assert rt.kernel_budget() == 20
+    stats = rt.run(cycles=2)
+    assert stats["overruns"] == 2 and stats["kernel_dispatched"] == 30
+
+class _BlockingSubject:
+    def __init__(self, subject_id, kem, kmm, isp, cfg):
+        self.subject_id = subject_id
+        self.kem = kem
+
+    def hb_cycle(self):
+        import time
+        time.sleep(0.05)  # I/O-bound effector
+        self.kem.publish(Event.subject(self.subject_id, EventType.ACTION, {}))
+        self.kem.fetch_for(self.subject_id)
+
+def test_threaded_hb_runs_subjects_concurrently():
+    import time
+    kem, kms, spm = KernelEventMesh.init(), KernelMetaScheduler.init({"hb_period": 0.0}), SubjectProcessManager.init()
+    for i in range(4):
+        kms.register(spm.spawn(_BlockingSubject, kem, None, None, {"subject_id": f"S{i}"}))
+    rt = KernelRuntime(kem, None, kms, spm, _RuntimeCfg(hb_period=0.0, executor="threads", max_workers=4))
+    try:
+        t0 = time.perf_counter()
+        rt.tick()
+        elapsed = time.perf_counter() - t0
+    finally:
+        rt.close()
+    assert elapsed < 0.15  # послідовно було б ≥ 0.2 с
+    assert kms.snapshot()["hb_processed"] == {f"S{i}": 1 for i in range(4)}
+    assert kem.subject_total_len() == 0
+
+class _PingSubject:
+    def __init__(self, subject_id, kem, kmm, isp, cfg):
+        self.subject_id = subject_id
+        self.kem = kem
+        self.peers = cfg["peers"]
+        self.got = cfg["got"]
+        self.n = 0
+
+    def hb_cycle(self):
+        for peer in self.peers:
+            if peer != self.subject_id:
+                self.kem.publish(Event.subject(peer, EventType.PERCEPTION, {"from": self.subject_id, "n": self.n}))
+        self.n += 1
+        self.got.extend(self.kem.fetch_for(self.subject_id))
+
+def test_threaded_hb_under_subject_lock_contention():
+    # воркери публікують і читають через смуги замків subject-каналу та спільну глобальну секцію
+    kem, kms, spm = KernelEventMesh.init(), KernelMetaScheduler.init({"hb_period": 0.0}), SubjectProcessManager.init()
+    kem.configure(subject_max=100_000)
+    peers = [f"S{i}" for i in range(8)]
+    got = {sid: [] for sid in peers}
+    for sid in peers:
+        kms.register(spm.spawn(_PingSubject, kem, None, None, {"subject_id": sid, "peers": peers, "got": got[sid]}))
+    kem.drain_all()
+    rt = KernelRuntime(kem, None, kms, spm, _RuntimeCfg(hb_period=0.0, executor="threads", max_workers=8))
+    try:
+        rt.run(cycles=50)
+    finally:
+        rt.close()
+    for sid in peers:
+        got[sid].extend(kem.fetch_for(sid))
+        assert len(got[sid]) == 7 * 50
+        for src in peers:
+            ns = [e.payload["n"] for e in got[sid] if e.payload["from"] == src]
+            assert ns == ([] if src == sid else list(range(50)))   # FIFO від кожного відправника
+    assert kem.empty() and kem.metrics()["dropped_subject"] == 0
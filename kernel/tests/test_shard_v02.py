@@ -0,0 +1,47 @@
+from kernel.kem import KernelEventMesh
+from kernel.kms import KernelMetaScheduler
+from kernel.spm import SubjectProcessManager
+from kernel.runtime import _RuntimeCfg
+from kernel.shard import ShardedRuntime, _ShardCfg
+from spx_types.event import Event, EventType
+
+
+class _Pinger:
+    """Forwards every received event to `peer`; reports receipts as kernel events."""
+
+    def __init__(self, subject_id, kem, kmm, isp, cfg):
+        self.subject_id = subject_id
+        self.kem = kem
+        self.cfg = cfg
+
+    def hb_cycle(self):
+        for ev in self.kem.fetch_for(self.subject_id):
+            self.kem.publish_kernel_event(Event.kernel(EventType.SYSTEM, {"got": ev.id, "by": self.subject_id}))
+            hops = ev.payload.get("hops", 0)
+            if hops:
+                self.kem.publish(Event.subject(self.cfg["peer"], EventType.PERCEPTION, {"hops": hops - 1},
+                                               eid=f"{ev.id}>"))
+
+    def rf_cycle(self):
+        pass
+
+
+def test_sharded_runtime_routes_across_processes():
+    kem, spm = KernelEventMesh.init(), SubjectProcessManager.init()
+    kms = KernelMetaScheduler.init({"hb_period": 0.01, "scheduler": {"rf_trigger_debt": 1000}})
+    for sid, peer, shard in (("A", "B", 0), ("B", "A", 1)):
+        kms.register(spm.spawn(_Pinger, kem, None, None, {"subject_id": sid, "peer": peer, "shard": shard}))
+    kem.drain_all()
+    got = []
+    rt = ShardedRuntime(kem, None, kms, spm, _RuntimeCfg(hb_period=0.01),
+                        shard_cfg=_ShardCfg(shards=2, transport="tcp"),
+                        on_kernel_event=lambda ev: got.append((ev.payload.get("by"), ev.payload.get("got"))))
+    try:
+        kem.publish(Event.subject("A", EventType.PERCEPTION, {"hops": 3}, eid="m"))
+        stats = rt.run(cycles=12)
+    finally:
+        rt.close()
+    # A(шард 0) → B(шард 1) → A → B, квитанції повертаються kernel-подіями координатора
+    assert got == [("A", "m"), ("B", "m>"), ("A", "m>>"), ("B", "m>>>")]
+    assert stats["shards"][0]["subjects"] == ["A"] and stats["shards"][1]["subjects"] == ["B"]
+    assert stats["subjects"]["A"]["calls"] == 12 and kms.snapshot()["hb_processed"]["B"] == 12
@@ -0,0 +1,58 @@
+# kernel/tests/test_sim_v02.py
+import time
+
+import pytest
+
+from kernel.sim import SimulationRunner, _SimCfg
+from utils.time_utils import MonotonicClock, VirtualClock, get_clock, get_T0, use_clock
+
+_APP = {"kem": {"subject_max": 2000}, "system": {"hb_period": 0.1}}
+
+
+def _sim(**sim):
+    return SimulationRunner({**_APP, "sim": {"subjects": 4, "seed": 7, **sim}})
+
+
+def test_virtual_clock_swaps_and_restores():
+    vc = VirtualClock(5.0)
+    with use_clock(vc):
+        assert get_T0() == 5.0
+        vc.sleep(1.5)
+        assert get_T0() == 6.5
+        with pytest.raises(ValueError):
+            vc.set(1.0)
+    assert isinstance(get_clock(), MonotonicClock)
+
+
+def test_same_seed_same_report():
+    def run():
+        r = _sim(duration_s=30, arrivals=[{"rate_hz": 300}, {"subject": "SIM1", "process": "burst",
+                                                              "rate_hz": 0.2, "burst": 100}]).run()
+        return {k: v for k, v in r.items() if k not in ("wall_s", "speedup")}
+
+    a, b = run(), run()
+    assert a == b
+    assert a["published"] > 0 and a["consumed"] > 0 and a["series"]
+
+
+def test_long_scenario_runs_faster_than_real_time():
+    t0 = time.perf_counter()
+    r = _sim(duration_s=600, arrivals=[{"rate_hz": 20, "process": "uniform"}]).run()
+    assert r["virtual_s"] >= 600
+    assert time.perf_counter() - t0 < 60
+    assert r["consumed"] >= r["published"] - r["backlog"] - r["dropped"]
+    assert len(r["series"]) == 601
+
+
+def test_overload_shows_up_in_report():
+    # 4 суб'єкти × 8 подій / 0.1 с = 320 Гц пропускної здатності < 2000 Гц прибуттів
+    r = _sim(duration_s=20, arrivals=[{"rate_hz": 2000}]).run()
+    assert r["dropped"] > 0
+    assert r["depth"]["max"] == 2000
+
+
+def test_invalid_sim_config():
+    with pytest.raises(ValueError):
+        _SimCfg.from_config({"arrivals": [{"process": "zipf"}]})
+    with pytest.raises(ValueError):
+        _SimCfg.from_config({"duration_s": 0})
@@ -0,0 +1,55 @@
+import json
+import time
+
+from kernel.kem import KernelEventMesh
+from kernel.kms import KernelMetaScheduler
+from kernel.runtime import KernelRuntime, _RuntimeCfg
+from kernel.spm import SubjectProcessManager
+from utils.tracing import TRACER, SamplingProfiler, span
+
+
+class _Busy:
+    def __init__(self, subject_id, kem, kmm, isp, cfg):
+        self.subject_id = subject_id
+
+    def hb_cycle(self):
+        with span("cognition.analyze", "module"):
+            pass
+
+
+def test_spans_nest_and_export_as_chrome_trace(tmp_path):
+    kem, spm = KernelEventMesh.init(), SubjectProcessManager.init()
+    kms = KernelMetaScheduler.init({"hb_period": 0.01})
+    kms.register(spm.spawn(_Busy, kem, None, None, {"subject_id": "S1"}))
+    rt = KernelRuntime(kem, None, kms, spm, _RuntimeCfg(hb_period=0.01), sleep_fn=lambda s: None,
+                       on_kernel_event=lambda ev: None)
+    assert span("x") is span("y")                 # вимкнено — спільний no-op
+    rt.run(cycles=1)
+    TRACER.enable(capacity=64)
+    try:
+        rt.run(cycles=2)
+    finally:
+        recs = TRACER.disable()
+    names = [r[0] for r in recs]
+    assert names.count("tick") == 2 and names.count("S1") == 2 and "HB" in names
+    # дочірній спан лежить усередині батьківського: module ⊂ subject ⊂ phase ⊂ tick
+    by = {r[0]: r for r in recs[-5:]}
+    for inner, outer in (("cognition.analyze", "S1"), ("S1", "HB"), ("HB", "tick")):
+        i, o = by[inner], by[outer]
+        assert o[2] <= i[2] and i[2] + i[3] <= o[2] + o[3]
+
+    path = TRACER.export_chrome(str(tmp_path / "t.json"), recs)
+    events = json.load(open(path))["traceEvents"]
+    assert {e["ph"] for e in events} >= {"M", "X"}
+    assert any(e["name"] == "S1" and e["cat"] == "subject" and e["dur"] >= 0 for e in events)
+
+
+def test_sampling_profiler_folds_stacks():
+    prof = SamplingProfiler(interval_s=0.001)
+    prof.start()
+    t_end = time.perf_counter() + 0.1
+    while time.perf_counter() < t_end:
+        sum(range(1000))
+    counts = prof.stop()
+    assert prof.samples > 0 and not prof.running
+    assert any("test_sampling_profiler_folds_stacks" in k for k in counts)
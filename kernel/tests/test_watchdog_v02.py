@@ -0,0 +1,46 @@
+import pytest
+from kernel.kms import KernelMetaScheduler
+from kernel.kem import KernelEventMesh
+from kernel.watchdog import SubjectWatchdog, _WatchdogCfg
+
+def test_repeated_overrun_skips_subject_and_feeds_debt():
+    kem = KernelEventMesh.init()
+    kms = KernelMetaScheduler.init({"hb_period": 0.01, "scheduler": {"rf_trigger_debt": 3, "cost_alpha": 1.0}})
+    kms.register("SLOW")
+    wd = SubjectWatchdog(_WatchdogCfg(budget_s=0.01, max_strikes=2, penalty_ticks=1), kms)
+
+    assert wd.record("SLOW", 0.02, 0.02) and wd.allow("SLOW")
+    wd.record("SLOW", 0.04, 0.04)       # друге перевищення поспіль → skip на 1 такт
+    assert not wd.allow("SLOW")
+    wd.on_tick_end()
+    assert wd.allow("SLOW")
+
+    # вартість 4× бюджету → debt 4 → RF без жодної події в черзі
+    kms.on_cycle_begin(kem, None)
+    assert kms.phase() == "RF"
+    snap = wd.snapshot()["SLOW"]
+    assert snap["overruns"] == 2 and snap["penalties"] == 1 and snap["skipped"] == 1
+
+def test_demote_halves_weight_for_penalty():
+    kms = KernelMetaScheduler.init({"scheduler": {"hb_policy": "weighted"}})
+    kms.register("S", weight=2.0)
+    wd = SubjectWatchdog(_WatchdogCfg(budget_s=0.01, max_strikes=1, penalty_ticks=1, action="demote"), kms)
+    wd.record("S", 0.5, 0.0)
+    assert kms.weight("S") == 1.0 and wd.allow("S")
+    wd.on_tick_end()
+    assert kms.weight("S") == 2.0
+
+def test_demote_skips_turns_under_rr():
+    kms = KernelMetaScheduler.init({"scheduler": {"hb_policy": "rr"}})
+    for sid in ("A", "S"):
+        kms.register(sid)
+    wd = SubjectWatchdog(_WatchdogCfg(budget_s=0.01, max_strikes=1, penalty_ticks=4, action="demote"), kms)
+    wd.record("S", 0.5, 0.0)
+    turns = []
+    for _ in range(4):
+        turns.append(kms.schedule_cycle_order().count("S"))
+        wd.on_tick_end()
+    assert turns == [0, 1, 0, 1] and kms.weight("S") == 1.0   # вага 0.5 → кожен другий такт
+    assert [kms.schedule_cycle_order().count("S") for _ in range(3)] == [1, 1, 1]
+    with pytest.raises(ValueError):
+        SubjectWatchdog(_WatchdogCfg(action="demote", demote_factor=1.0), kms)
@@ -0,0 +1,188 @@
+# kernel/watchdog.py
+"""
+Subject Watchdog — SPX-OS v0.2
+Per-subject time budgets for hb_cycle()/rf_cycle(): wall + CPU accounting,
+overrun strikes, and a penalty (skip or demote) for repeat offenders.
+"""
+
+from __future__ import annotations
+import threading
+from dataclasses import dataclass, field
+from time import perf_counter, thread_time
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from utils.diagnostics import log_warn
+from utils.tracing import span
+
+
+@dataclass
+class _WatchdogCfg:
+    budget_s: float = 0.05         # бюджет одного виклику суб'єкта за замовчуванням
+    max_strikes: int = 3           # скільки перевищень поспіль до покарання
+    penalty_ticks: int = 5         # тривалість покарання у тактах
+    action: str = "skip"           # "skip" | "demote"
+    demote_factor: float = 0.5     # для "demote": множник ваги KMS на час покарання
+
+
+@dataclass
+class _SubjectCost:
+    calls: int = 0
+    wall_total_s: float = 0.0
+    cpu_total_s: float = 0.0
+    wall_max_s: float = 0.0
+    overruns: int = 0
+    strikes: int = 0
+    penalties: int = 0
+    skipped: int = 0
+    penalty_left: int = 0
+    saved_weight: Optional[float] = field(default=None, repr=False)
+
+
+class SubjectWatchdog:
+    """
+    Wraps subject calls with timing.
+      - run(sid, fn) → measures wall (perf_counter) and CPU (thread_time) time
+      - a call above the subject's budget is an overrun; `max_strikes` consecutive
+        overruns put the subject under penalty for `penalty_ticks` ticks:
+          skip   → allow(sid) is False, HB turns are skipped
+          demote → KMS weight is multiplied by demote_factor (restored afterwards):
+                   fewer DRR slots under hb_policy "weighted", skipped turns under "rr"
+                   (a weight below 1 gets a slot only every 1/weight ticks)
+      - every measurement is reported to kms.report_cost() for the debt model
+      - `timer` measures wall time (perf_counter; a virtual clock in kernel.sim)
+    """
+
+    ACTIONS = ("skip", "demote")
+
+    def __init__(self, cfg: Optional[_WatchdogCfg] = None, kms=None,
+                 timer: Callable[[], float] = perf_counter):
+        self.cfg = cfg or _WatchdogCfg()
+        self._timer = timer
+        if self.cfg.action not in self.ACTIONS:
+            raise ValueError("Invalid watchdog action")
+        if self.cfg.action == "demote" and not 0.0 < self.cfg.demote_factor < 1.0:
+            raise ValueError("Invalid watchdog demote_factor (0 < factor < 1)")
+        self.kms = kms
+        self._budgets: Dict[str, float] = {}
+        self._costs: Dict[str, _SubjectCost] = {}
+        self._penalized: Set[str] = set()
+        self._lock = threading.Lock()   # record() may run on HB worker threads
+
+    @classmethod
+    def from_config(cls, runtime_cfg: Dict[str, Any], kms=None,
+                    timer: Callable[[], float] = perf_counter) -> "SubjectWatchdog":
+        rt = runtime_cfg or {}
+        cfg = _WatchdogCfg(
+            budget_s=float(rt.get("subject_budget_ms", 50)) / 1000.0,
+            max_strikes=int(rt.get("overrun_strikes", 3)),
+            penalty_ticks=int(rt.get("overrun_penalty_ticks", 5)),
+            action=str(rt.get("overrun_action", "skip")),
+            demote_factor=float(rt.get("demote_factor", 0.5)),
+        )
+        return cls(cfg, kms, timer)
+
+    # ----------------- Budgets -----------------
+
+    def set_budget(self, subject_id: str, seconds: float) -> None:
+        if seconds <= 0:
+            raise ValueError("Watchdog budget must be > 0")
+        self._budgets[subject_id] = seconds
+
+    def budget(self, subject_id: str) -> float:
+        return self._budgets.get(subject_id, self.cfg.budget_s)
+
+    def _cost(self, subject_id: str) -> _SubjectCost:
+        c = self._costs.get(subject_id)
+        if c is None:
+            c = self._costs[subject_id] = _SubjectCost()
+        return c
+
+    # ----------------- Enforcement -----------------
+
+    def allow(self, subject_id: str) -> bool:
+        """False while a "skip" penalty is active; counts the skipped turn."""
+        c = self._costs.get(subject_id)
+        if c is None or not c.penalty_left or self.cfg.action != "skip":
+            return True
+        with self._lock:
+            c.skipped += 1
+        return False
+
+    def run(self, subject_id: str, fn: Callable[[], Any]) -> Tuple[float, float]:
+        """Call fn() and account its cost to subject_id. Returns (wall_s, cpu_s)."""
+        with span(subject_id, "subject"):
+            w0, c0 = self._timer(), thread_time()
+            try:
+                fn()
+            finally:
+                wall, cpu = self._timer() - w0, thread_time() - c0
+                self.record(subject_id, wall, cpu)
+        return wall, cpu
+
+    def record(self, subject_id: str, wall_s: float, cpu_s: float) -> bool:
+        """Account one call; returns True if it overran the budget."""
+        budget = self.budget(subject_id)
+        if self.kms is not None:
+            self.kms.report_cost(subject_id, wall_s / budget)
+        with self._lock:
+            c = self._cost(subject_id)
+            c.calls += 1
+            c.wall_total_s += wall_s
+            c.cpu_total_s += cpu_s
+            c.wall_max_s = max(c.wall_max_s, wall_s)
+
+            over = wall_s > budget
+            if not over:
+                c.strikes = 0
+                return False
+            c.overruns += 1
+            c.strikes += 1
+            if c.strikes >= self.cfg.max_strikes and not c.penalty_left:
+                self._penalize(subject_id, c)
+        return True
+
+    def _penalize(self, subject_id: str, c: _SubjectCost) -> None:
+        c.strikes = 0
+        c.penalties += 1
+        c.penalty_left = self.cfg.penalty_ticks
+        self._penalized.add(subject_id)
+        log_warn("Watchdog: %s overran budget %dx → %s", subject_id, self.cfg.max_strikes, self.cfg.action,
+                 sub="watchdog")
+        if self.cfg.action == "demote" and self.kms is not None:
+            c.saved_weight = self.kms.weight(subject_id)
+            self.kms.set_weight(subject_id, c.saved_weight * self.cfg.demote_factor)
+
+    def on_tick_end(self) -> None:
+        """Advance penalties by one tick (called after the tick barrier)."""
+        for sid in list(self._penalized):
+            c = self._costs[sid]
+            c.penalty_left -= 1
+            if c.penalty_left:
+                continue
+            self._penalized.discard(sid)
+            if c.saved_weight is not None:
+                if self.kms is not None:
+                    self.kms.set_weight(sid, c.saved_weight)
+                c.saved_weight = None
+
+    # ----------------- Diagnostics -----------------
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {
+            sid: {
+                "calls": c.calls,
+                "wall_total_s": c.wall_total_s,
+                "cpu_total_s": c.cpu_total_s,
+                "wall_avg_s": c.wall_total_s / c.calls if c.calls else 0.0,
+                "wall_max_s": c.wall_max_s,
+                "budget_s": self.budget(sid),
+                "overruns": c.overruns,
+                "penalties": c.penalties,
+                "skipped": c.skipped,
+                "penalty_left": c.penalty_left,
+            }
+            for sid, c in self._costs.items()
+        }
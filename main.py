@@ -1,15 +1,16 @@
-from time import sleep
 from bootstrap import spx_bootstrap
+from kernel.runtime import KernelRuntime
+from kernel.shard import ShardedRuntime
 from utils.diagnostics import log_info
 from spx_types.event import Event, EventType
 
 def main():
     ctx = spx_bootstrap()
-    kem, kms, spm = ctx["kem"], ctx["kms"], ctx["spm"]
+    kem = ctx["kem"]
     log_info("SPX-OS: entering demo loop...")
 
     for i in range(5):
-        ctx["kem"].publish(Event.subject(
+        kem.publish(Event.subject(
             subject_id="ROOT",
             type_=EventType.SYSTEM,
             payload={"n": i},
@@ -17,34 +18,20 @@ def main():
             credibility=1.0
         ))
 
-    for _ in range(18):
-        kms.on_cycle_begin(kem, ctx["kmm"])
-
-        # ядро: дренаж кількох kernel-подій кожен такт
-        for _ in range(2):
-            ev = kem.next_event()
-            if not ev:
-                break
-            log_info(f"KEM: dispatched kernel event {ev.id}")
-
-        order = kms.schedule_cycle_order()
-        if kms.phase() == "HB":
-            for sid in order:
-                subj = spm.get(sid)
-                if subj:
-                    subj.hb_cycle()
-                    kms.notify_hb_processed(subj.subject_id)
-        else:
-            for sid in order:
-                subj = spm.get(sid)
-                if subj:
-                    if hasattr(subj, "rf_cycle"):
-                        subj.rf_cycle()
-                    else:
-                        subj.hb_cycle()
-
-        kms.on_cycle_end()
-        sleep(kms.cfg.hb_period)
+    # runtime.shards > 0 → суб'єкти у процесах-воркерах (KEM bridge), інакше — в одному процесі
+    if int((ctx["cfg"].get("runtime") or {}).get("shards", 0)) > 0:
+        runtime = ShardedRuntime.from_context(ctx)
+    else:
+        runtime = KernelRuntime.from_context(ctx)
+    try:
+        stats = runtime.run(cycles=18)
+    finally:
+        runtime.close()
+        ctx["kem"].close()        # журнал + ingress-кільця
+        ctx["kmm"].checkpoint()   # no-op, якщо kmm.snapshot_dir не задано
+        if ctx["metrics"] is not None:
+            ctx["metrics"].close()    # фінальний знімок у prometheus_file
+    log_info("SPX-OS: runtime stats %s", stats)
 
     log_info("SPX-OS: demo loop finished.")
 
@@ -1,5 +1,11 @@
+from time import perf_counter
 from typing import Dict, Any
 from kernel.isp import ISP
+from utils.metrics import REGISTRY
+from utils.tracing import span
+
+_EFFECTOR = REGISTRY.histogram("spx_effector_seconds", "Effector execute() duration", ("effector",))
+_DENIED = REGISTRY.counter("spx_effector_denied_total", "Actions not executed", ("effector", "reason"))
 
 class ActionExecutor:
     def __init__(self, isp: ISP, registry: Dict[str, Any]):
@@ -8,8 +14,16 @@ class ActionExecutor:
 
     def execute(self, effector_name: str, params: Dict[str, Any]) -> bool:
         if not self.isp.is_allowed_effector(effector_name):
+            _DENIED.labels(effector_name, "isp").inc()
             return False
         eff = self.registry.get(effector_name)
-        if not eff: return False
-        eff.execute(params)
+        if not eff:
+            _DENIED.labels(effector_name, "unbound").inc()
+            return False
+        t0 = perf_counter()
+        try:
+            with span(effector_name, "effector"):
+                eff.execute(params)
+        finally:
+            _EFFECTOR.labels(effector_name).observe(perf_counter() - t0)
         return True
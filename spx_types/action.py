@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Dict, Optional
-from time import monotonic
+from utils.time_utils import get_T0
 
 class AckPolicy(Enum):
     NONE = "none"
@@ -16,5 +16,5 @@ class Action:
     ack_policy: AckPolicy
     compensation: Optional[Dict]
     origin: str
-    ts_T1: float = field(default_factory=monotonic)
+    ts_T1: float = field(default_factory=get_T0)
     valid: bool = True
@@ -0,0 +1,423 @@
+# spx_types/codec.py
+"""
+Binary codec — SPX-OS v0.2
+Compact serializer for Event, Action, Intention and MemoryOp (journal, IPC).
+
+Record = fixed little-endian header + variable part:
+  header  "<IB" length of the whole record, record kind, then a per-kind fixed layout
+          (packed enums, flags, f64 salience/credibility/timestamps)
+  strings varint length + UTF-8
+  values  tagged compact encoding of payload-like data (None/bool/int/float/str/bytes/
+          list/tuple/dict); other types raise TypeError unless allow_pickle=True, which
+          stores them pickled
+
+Batch = "<4sI" magic + count, uint32 offsets of every record, then the records.
+Decoding accepts any buffer (bytes, bytearray, mmap, memoryview) at an offset:
+decode_header()/batch_headers() read only fixed headers in place (payloads untouched),
+decode() copies just the one record it materializes.
+
+Pickled values are only decoded with allow_pickle=True, and only from trusted bytes (the
+KEM journal, the shard bridge between kernel processes): unpickling runs code. Input from
+other processes that the kernel does not control (the ingress ring) is decoded strictly —
+a pickled value is rejected with ValueError.
+
+Enum codes are the member positions in their Enum definition — append new members
+at the end to keep old buffers readable.
+"""
+
+from __future__ import annotations
+import pickle
+import struct
+from array import array
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from spx_types.event import Event, EventChannel, EventType, event_unchecked
+from spx_types.action import Action, AckPolicy
+from spx_types.intention import Intention, IntentionStatus
+from spx_types.memory import MemoryOp, MemoryOpType
+
+Record = Union[Event, Action, Intention, MemoryOp]
+Buffer = Union[bytes, bytearray, memoryview]
+
+KIND_EVENT, KIND_ACTION, KIND_INTENTION, KIND_MEMORY_OP = 1, 2, 3, 4
+
+_EVENT_HDR = struct.Struct("<IBBBBdddd")        # len, kind, type, channel, flags, sal, cred, T0, T1
+_ACTION_HDR = struct.Struct("<IBBBxd")          # len, kind, ack_policy, flags, T1
+_INTENTION_HDR = struct.Struct("<IBBBxddddd")   # len, kind, status, flags, risk, cost, priority, T1, -
+_MEMORY_OP_HDR = struct.Struct("<IBBBxd")       # len, kind, op, flags, T1
+_PREFIX = struct.Struct("<IB")
+_BATCH = struct.Struct("<4sI")
+BATCH_MAGIC = b"SPXB"
+
+# flags
+_F_VALID = 0x01
+_F_HAS_T1 = 0x02
+_F_HAS_SUBJECT = 0x04
+_F_SUBJECT_IS_ORIGIN = 0x08
+_F_HAS_COMPENSATION = 0x10
+
+_EVENT_TYPES: Tuple[EventType, ...] = tuple(EventType)
+_CHANNELS: Tuple[EventChannel, ...] = tuple(EventChannel)
+_ACK_POLICIES: Tuple[AckPolicy, ...] = tuple(AckPolicy)
+_STATUSES: Tuple[IntentionStatus, ...] = tuple(IntentionStatus)
+_MEMORY_OPS: Tuple[MemoryOpType, ...] = tuple(MemoryOpType)
+_CODE = {m: i for seq in (_EVENT_TYPES, _CHANNELS, _ACK_POLICIES, _STATUSES, _MEMORY_OPS)
+         for i, m in enumerate(seq)}
+
+# value tags
+_T_NONE, _T_FALSE, _T_TRUE, _T_INT, _T_FLOAT, _T_STR, _T_BYTES = range(7)
+_T_LIST, _T_TUPLE, _T_DICT, _T_EMPTY_DICT, _T_PICKLE = range(7, 12)
+
+_F64 = struct.Struct("<d")
+_pack_f64 = _F64.pack
+_unpack_f64 = _F64.unpack_from
+
+
+class EventHeader(NamedTuple):
+    """Fixed part of an encoded Event (readable without touching the payload)."""
+    length: int
+    type: EventType
+    channel: EventChannel
+    salience: float
+    credibility: float
+    ts_T0: float
+    ts_T1: Optional[float]
+    valid: bool
+
+
+# ----------------- Primitives -----------------
+
+def _put_varint(out: bytearray, n: int) -> None:
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    b = buf[pos]
+    if b < 0x80:
+        return b, pos + 1
+    n, shift = 0, 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _put_str(out: bytearray, s: str) -> None:
+    raw = s.encode("utf-8")
+    _put_varint(out, len(raw))
+    out += raw
+
+
+def _get_str(buf: bytes, pos: int) -> Tuple[str, int]:
+    n = buf[pos]
+    if n < 0x80:
+        pos += 1
+    else:
+        n, pos = _get_varint(buf, pos)
+    end = pos + n
+    return buf[pos:end].decode("utf-8"), end
+
+
+def _put_value(out: bytearray, v: Any, allow_pickle: bool) -> None:
+    t = type(v)
+    if t is str:
+        out.append(_T_STR)
+        _put_str(out, v)
+    elif t is int:
+        out.append(_T_INT)
+        _put_varint(out, (v << 1) if v >= 0 else ((-v << 1) - 1))   # zigzag
+    elif t is float:
+        out.append(_T_FLOAT)
+        out += _pack_f64(v)
+    elif v is None:
+        out.append(_T_NONE)
+    elif t is bool:
+        out.append(_T_TRUE if v else _T_FALSE)
+    elif t is dict:
+        if not v:
+            out.append(_T_EMPTY_DICT)
+            return
+        out.append(_T_DICT)
+        _put_varint(out, len(v))
+        for k, x in v.items():
+            _put_value(out, k, allow_pickle)
+            _put_value(out, x, allow_pickle)
+    elif t is list or t is tuple:
+        out.append(_T_LIST if t is list else _T_TUPLE)
+        _put_varint(out, len(v))
+        for x in v:
+            _put_value(out, x, allow_pickle)
+    elif t is bytes:
+        out.append(_T_BYTES)
+        _put_varint(out, len(v))
+        out += v
+    elif allow_pickle:
+        raw = pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)
+        out.append(_T_PICKLE)
+        _put_varint(out, len(raw))
+        out += raw
+    else:
+        raise TypeError(f"codec: unsupported value type {t.__name__}")
+
+
+def _get_value(buf: bytes, pos: int, allow_pickle: bool) -> Tuple[Any, int]:
+    tag = buf[pos]
+    pos += 1
+    if tag == _T_STR:
+        return _get_str(buf, pos)
+    if tag == _T_INT:
+        z = buf[pos]
+        if z < 0x80:
+            pos += 1
+        else:
+            z, pos = _get_varint(buf, pos)
+        return (z >> 1) ^ -(z & 1), pos
+    if tag == _T_FLOAT:
+        return _unpack_f64(buf, pos)[0], pos + 8
+    if tag == _T_NONE:
+        return None, pos
+    if tag == _T_TRUE or tag == _T_FALSE:
+        return tag == _T_TRUE, pos
+    if tag == _T_EMPTY_DICT:
+        return {}, pos
+    if tag == _T_DICT:
+        n, pos = _get_varint(buf, pos)
+        d = {}
+        for _ in range(n):
+            # ключі payload майже завжди рядки — без рекурсивного виклику
+            if buf[pos] == _T_STR:
+                k, pos = _get_str(buf, pos + 1)
+            else:
+                k, pos = _get_value(buf, pos, allow_pickle)
+            d[k], pos = _get_value(buf, pos, allow_pickle)
+        return d, pos
+    if tag == _T_LIST or tag == _T_TUPLE:
+        n, pos = _get_varint(buf, pos)
+        items = []
+        for _ in range(n):
+            x, pos = _get_value(buf, pos, allow_pickle)
+            items.append(x)
+        return (items if tag == _T_LIST else tuple(items)), pos
+    if tag == _T_BYTES or tag == _T_PICKLE:
+        if tag == _T_PICKLE and not allow_pickle:
+            raise ValueError("Invalid codec value: pickle in untrusted input")
+        n, pos = _get_varint(buf, pos)
+        raw = buf[pos:pos + n]
+        return (raw if tag == _T_BYTES else pickle.loads(raw)), pos + n
+    raise ValueError(f"Invalid codec value tag: {tag}")
+
+
+# ----------------- Records -----------------
+
+def _encode_event(out: bytearray, ev: Event, allow_pickle: bool) -> None:
+    flags = _F_VALID if ev.valid else 0
+    if ev.ts_T1 is not None:
+        flags |= _F_HAS_T1
+    if ev.subject_id is not None:
+        flags |= _F_HAS_SUBJECT
+        if ev.subject_id == ev.origin:
+            flags |= _F_SUBJECT_IS_ORIGIN
+    out += _EVENT_HDR.pack(0, KIND_EVENT, _CODE[ev.type], _CODE[ev.channel], flags,
+                           ev.salience, ev.credibility, ev.ts_T0,
+                           0.0 if ev.ts_T1 is None else ev.ts_T1)
+    _put_str(out, ev.id)
+    _put_str(out, ev.origin)
+    if flags & _F_HAS_SUBJECT and not flags & _F_SUBJECT_IS_ORIGIN:
+        _put_str(out, ev.subject_id)
+    _put_value(out, ev.payload, allow_pickle)
+    _put_value(out, ev.context, allow_pickle)
+
+
+def _decode_event(buf: bytes, pos: int, allow_pickle: bool) -> Event:
+    _, _, t, ch, flags, sal, cred, t0, t1 = _EVENT_HDR.unpack_from(buf, pos)
+    pos += _EVENT_HDR.size
+    eid, pos = _get_str(buf, pos)
+    origin, pos = _get_str(buf, pos)
+    subject_id = None
+    if flags & _F_HAS_SUBJECT:
+        if flags & _F_SUBJECT_IS_ORIGIN:
+            subject_id = origin
+        else:
+            subject_id, pos = _get_str(buf, pos)
+    payload, pos = _get_value(buf, pos, allow_pickle)
+    context, pos = _get_value(buf, pos, allow_pickle)
+    # як і pickle — без __init__/__post_init__: значення вже перевірені при створенні
+    return event_unchecked(eid, _EVENT_TYPES[t], payload, origin, subject_id, sal, cred, context, t0,
+                           t1 if flags & _F_HAS_T1 else None, _CHANNELS[ch], bool(flags & _F_VALID))
+
+
+def _encode_action(out: bytearray, a: Action, allow_pickle: bool) -> None:
+    flags = _F_VALID if a.valid else 0
+    if a.compensation is not None:
+        flags |= _F_HAS_COMPENSATION
+    out += _ACTION_HDR.pack(0, KIND_ACTION, _CODE[a.ack_policy], flags, a.ts_T1)
+    for s in (a.id, a.effector, a.idempotency_key, a.origin):
+        _put_str(out, s)
+    _put_value(out, a.params, allow_pickle)
+    if a.compensation is not None:
+        _put_value(out, a.compensation, allow_pickle)
+
+
+def _decode_action(buf: bytes, pos: int, allow_pickle: bool) -> Action:
+    _, _, ack, flags, t1 = _ACTION_HDR.unpack_from(buf, pos)
+    pos += _ACTION_HDR.size
+    aid, pos = _get_str(buf, pos)
+    effector, pos = _get_str(buf, pos)
+    key, pos = _get_str(buf, pos)
+    origin, pos = _get_str(buf, pos)
+    params, pos = _get_value(buf, pos, allow_pickle)
+    compensation = None
+    if flags & _F_HAS_COMPENSATION:
+        compensation, pos = _get_value(buf, pos, allow_pickle)
+    return Action(id=aid, effector=effector, params=params, idempotency_key=key,
+                  ack_policy=_ACK_POLICIES[ack], compensation=compensation, origin=origin,
+                  ts_T1=t1, valid=bool(flags & _F_VALID))
+
+
+def _encode_intention(out: bytearray, it: Intention, allow_pickle: bool) -> None:
+    out += _INTENTION_HDR.pack(0, KIND_INTENTION, _CODE[it.status], _F_VALID if it.valid else 0,
+                               it.risk, it.cost, it.priority, it.ts_T1, 0.0)
+    for s in (it.id, it.goal, it.source_event, it.origin):
+        _put_str(out, s)
+    for v in (it.params, it.expected_effect, it.stop_criteria):
+        _put_value(out, v, allow_pickle)
+
+
+def _decode_intention(buf: bytes, pos: int, allow_pickle: bool) -> Intention:
+    _, _, status, flags, risk, cost, prio, t1, _ = _INTENTION_HDR.unpack_from(buf, pos)
+    pos += _INTENTION_HDR.size
+    iid, pos = _get_str(buf, pos)
+    goal, pos = _get_str(buf, pos)
+    source, pos = _get_str(buf, pos)
+    origin, pos = _get_str(buf, pos)
+    params, pos = _get_value(buf, pos, allow_pickle)
+    effect, pos = _get_value(buf, pos, allow_pickle)
+    stop, pos = _get_value(buf, pos, allow_pickle)
+    return Intention(id=iid, goal=goal, params=params, expected_effect=effect, risk=risk, cost=cost,
+                     priority=prio, source_event=source, origin=origin, stop_criteria=stop,
+                     status=_STATUSES[status], ts_T1=t1, valid=bool(flags & _F_VALID))
+
+
+def _encode_memory_op(out: bytearray, m: MemoryOp, allow_pickle: bool) -> None:
+    out += _MEMORY_OP_HDR.pack(0, KIND_MEMORY_OP, _CODE[m.op], _F_VALID if m.valid else 0, m.ts_T1)
+    for s in (m.id, m.scope, m.origin):
+        _put_str(out, s)
+    _put_value(out, m.indices, allow_pickle)
+    _put_value(out, m.payload, allow_pickle)
+
+
+def _decode_memory_op(buf: bytes, pos: int, allow_pickle: bool) -> MemoryOp:
+    _, _, op, flags, t1 = _MEMORY_OP_HDR.unpack_from(buf, pos)
+    pos += _MEMORY_OP_HDR.size
+    mid, pos = _get_str(buf, pos)
+    scope, pos = _get_str(buf, pos)
+    origin, pos = _get_str(buf, pos)
+    indices, pos = _get_value(buf, pos, allow_pickle)
+    payload, pos = _get_value(buf, pos, allow_pickle)
+    return MemoryOp(id=mid, op=_MEMORY_OPS[op], scope=scope, indices=indices, payload=payload,
+                    origin=origin, ts_T1=t1, valid=bool(flags & _F_VALID))
+
+
+_ENCODERS = {Event: _encode_event, Action: _encode_action,
+             Intention: _encode_intention, MemoryOp: _encode_memory_op}
+_DECODERS = {KIND_EVENT: _decode_event, KIND_ACTION: _decode_action,
+             KIND_INTENTION: _decode_intention, KIND_MEMORY_OP: _decode_memory_op}
+
+
+# ----------------- Public API -----------------
+
+def encode_into(out: bytearray, rec: Record, allow_pickle: bool = False) -> int:
+    """Append one record to `out`; returns its length. TypeError on values the codec has no tag for."""
+    enc = _ENCODERS.get(type(rec))
+    if enc is None:
+        raise TypeError(f"codec: unsupported record type {type(rec).__name__}")
+    start = len(out)
+    try:
+        enc(out, rec, allow_pickle)
+    except TypeError:
+        del out[start:]
+        raise
+    n = len(out) - start
+    struct.pack_into("<I", out, start, n)
+    return n
+
+
+def encode(rec: Record, allow_pickle: bool = False) -> bytes:
+    out = bytearray()
+    encode_into(out, rec, allow_pickle)
+    return bytes(out)
+
+
+def record_kind(buf: Buffer, offset: int = 0) -> int:
+    return _PREFIX.unpack_from(buf, offset)[1]
+
+
+def record_len(buf: Buffer, offset: int = 0) -> int:
+    return _PREFIX.unpack_from(buf, offset)[0]
+
+
+def decode(buf: Buffer, offset: int = 0, allow_pickle: bool = False) -> Record:
+    """One record; allow_pickle=True only for trusted bytes (see the module docstring)."""
+    n, kind = _PREFIX.unpack_from(buf, offset)
+    dec = _DECODERS.get(kind)
+    if dec is None:
+        raise ValueError(f"Invalid codec record kind: {kind}")
+    # одна копія запису у bytes: індексація bytes у рази швидша за memoryview
+    mv = buf if isinstance(buf, memoryview) else memoryview(buf)
+    return dec(mv[offset:offset + n].tobytes(), 0, allow_pickle)
+
+
+def decode_header(buf: Buffer, offset: int = 0) -> EventHeader:
+    """Fixed header of an encoded Event — no strings or payload are decoded."""
+    n, kind, t, ch, flags, sal, cred, t0, t1 = _EVENT_HDR.unpack_from(buf, offset)
+    if kind != KIND_EVENT:
+        raise ValueError("Invalid codec record kind: not an Event")
+    return EventHeader(n, _EVENT_TYPES[t], _CHANNELS[ch], sal, cred, t0,
+                       t1 if flags & _F_HAS_T1 else None, bool(flags & _F_VALID))
+
+
+# ----------------- Batches -----------------
+
+def encode_batch(records: Iterable[Record], allow_pickle: bool = False) -> bytes:
+    """Many records in one buffer: magic, count, uint32 offsets, records."""
+    body = bytearray()
+    offsets = array("I")
+    for rec in records:
+        offsets.append(len(body))
+        encode_into(body, rec, allow_pickle)
+    base = _BATCH.size + 4 * len(offsets)
+    if base + len(body) > 0xFFFFFFFF:
+        raise ValueError("Invalid codec batch: larger than 4 GiB")
+    for i in range(len(offsets)):
+        offsets[i] += base
+    return _BATCH.pack(BATCH_MAGIC, len(offsets)) + offsets.tobytes() + bytes(body)
+
+
+def batch_offsets(buf: Buffer) -> memoryview:
+    """Offsets of the records of a batch (uint32 view into `buf`, no copy)."""
+    magic, n = _BATCH.unpack_from(buf, 0)
+    if magic != BATCH_MAGIC:
+        raise ValueError("Invalid codec batch magic")
+    mv = buf if isinstance(buf, memoryview) else memoryview(buf)
+    return mv[_BATCH.size:_BATCH.size + 4 * n].cast("B").cast("I")
+
+
+def iter_batch(buf: Buffer, allow_pickle: bool = False) -> Iterator[Record]:
+    mv = buf if isinstance(buf, memoryview) else memoryview(buf)
+    for off in batch_offsets(mv):
+        yield decode(mv, off, allow_pickle)
+
+
+def decode_batch(buf: Buffer, allow_pickle: bool = False) -> List[Record]:
+    return list(iter_batch(buf, allow_pickle))
+
+
+def batch_headers(buf: Buffer) -> List[EventHeader]:
+    """Headers of an all-Event batch (e.g. for filtering by type/salience before decoding)."""
+    mv = buf if isinstance(buf, memoryview) else memoryview(buf)
+    return [decode_header(mv, off) for off in batch_offsets(mv)]
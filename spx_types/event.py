@@ -1,9 +1,11 @@
 # spx_types/event.py
-from dataclasses import dataclass, field, replace
+import os
+from dataclasses import dataclass, field, fields, replace
 from enum import Enum, auto
-from typing import Dict, Any, Optional
-from time import monotonic
+from itertools import count
+from typing import Dict, Any, Iterable, List, Optional
 from uuid import uuid4
+from utils.time_utils import get_T0
 
 
 class EventType(Enum):
@@ -19,7 +21,27 @@ class EventChannel(Enum):
     SUBJECT = auto()
 
 
-@dataclass(frozen=True)
+# Event IDs: "<prefix>-<process token>-<counter>" — лічильник замість uuid4 на кожну подію.
+# Токен випадковий на процес і перевипускається у дочірньому процесі після fork.
+_id_token = uuid4().hex[:8]
+_id_seq = count(1)
+
+
+def _reseed_ids() -> None:
+    global _id_token, _id_seq
+    _id_token = uuid4().hex[:8]
+    _id_seq = count(1)
+
+
+if hasattr(os, "register_at_fork"):   # лише POSIX; на Windows fork немає
+    os.register_at_fork(after_in_child=_reseed_ids)
+
+
+def next_event_id(prefix: str = "ev") -> str:
+    return f"{prefix}-{_id_token}-{next(_id_seq)}"
+
+
+@dataclass(frozen=True, slots=True)
 class Event:
     id: str
     type: EventType
@@ -29,7 +51,7 @@ class Event:
     salience: float
     credibility: float
     context: Dict[str, Any] = field(default_factory=dict)
-    ts_T0: float = field(default_factory=monotonic)
+    ts_T0: float = field(default_factory=get_T0)
     ts_T1: Optional[float] = None
     channel: EventChannel = EventChannel.SUBJECT
     valid: bool = True
@@ -47,7 +69,7 @@ class Event:
     @staticmethod
     def kernel(type_: EventType, payload: Dict[str, Any] | None = None, *, eid: Optional[str] = None) -> "Event":
         return Event(
-            id=eid or f"kev-{uuid4().hex[:10]}",
+            id=eid or next_event_id("kev"),
             type=type_,
             payload=payload or {},
             origin="KERNEL",
@@ -62,7 +84,7 @@ class Event:
     def subject(subject_id: str, type_: EventType, payload: Dict[str, Any] | None = None, *, eid: Optional[str] = None,
                 salience: float = 0.5, credibility: float = 1.0, context: Optional[Dict[str, Any]] = None) -> "Event":
         return Event(
-            id=eid or f"sev-{uuid4().hex[:10]}",
+            id=eid or next_event_id("sev"),
             type=type_,
             payload=payload or {},
             origin=subject_id,
@@ -73,5 +95,36 @@ class Event:
             context=context or {}
         )
 
+    @staticmethod
+    def subject_many(subject_id: str, type_: EventType, payloads: Iterable[Dict[str, Any]], *,
+                     salience: float = 0.5, credibility: float = 1.0,
+                     context: Optional[Dict[str, Any]] = None) -> List["Event"]:
+        """Batch form of subject(): ranges are validated once for the whole batch."""
+        if not (0.0 <= salience <= 1.0):
+            raise ValueError("Invalid salience")
+        if not (0.0 <= credibility <= 1.0):
+            raise ValueError("Invalid credibility")
+        now, ch = get_T0(), EventChannel.SUBJECT
+        return [
+            event_unchecked(next_event_id("sev"), type_, p, subject_id, subject_id, salience, credibility,
+                            dict(context) if context else {}, now, None, ch, True)
+            for p in payloads
+        ]
+
     def with_t1(self, t1: float) -> "Event":
         return replace(self, ts_T1=t1)
+
+
+_EVENT_SETTERS = tuple(Event.__dict__[f.name].__set__ for f in fields(Event))
+_new = object.__new__
+
+
+def event_unchecked(*values: Any) -> Event:
+    """
+    Build an Event from all field values in declaration order without __init__ / __post_init__.
+    For callers that have already validated the values (batch constructors, codec).
+    """
+    ev = _new(Event)
+    for set_, v in zip(_EVENT_SETTERS, values):
+        set_(ev, v)
+    return ev
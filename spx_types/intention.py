@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Dict
-from time import monotonic
+from utils.time_utils import get_T0
 
 class IntentionStatus(Enum):
     PENDING = "pending"
@@ -21,7 +21,7 @@ class Intention:
     origin: str
     stop_criteria: Dict
     status: IntentionStatus = IntentionStatus.PENDING
-    ts_T1: float = field(default_factory=monotonic)
+    ts_T1: float = field(default_factory=get_T0)
     valid: bool = True
 
     def __post_init__(self):
@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Dict, Any
-from time import monotonic
+from utils.time_utils import get_T0
 
 class MemoryOpType(Enum):
     ENCODE = "encode"
@@ -16,5 +16,5 @@ class MemoryOp:
     indices: Dict[str, Any]
     payload: Dict[str, Any]
     origin: str
-    ts_T1: float = field(default_factory=monotonic)
+    ts_T1: float = field(default_factory=get_T0)
     valid: bool = True
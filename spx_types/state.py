@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 from typing import List, Dict
-from time import monotonic
+from utils.time_utils import get_T0
 
 @dataclass(frozen=True)
 class StateSnapshot:
@@ -11,7 +11,7 @@ class StateSnapshot:
     recency: float
     salience_map: Dict[str, float]
     origin: str
-    ts_T1: float = field(default_factory=monotonic)
+    ts_T1: float = field(default_factory=get_T0)
     valid: bool = True
 
     def __post_init__(self):
@@ -7,6 +7,7 @@ from kernel.kmm import KernelMemoryModel
 from kernel.kem import KernelEventMesh
 from kernel.isp import ISP
 from utils.diagnostics import log_info
+from utils.tracing import span
 
 class BaseSubject:
     def __init__(self, subject_id: str, kem: KernelEventMesh, kmm: KernelMemoryModel, isp: ISP):
@@ -22,12 +23,14 @@ class BaseSubject:
     def hb_cycle(self):
         # minimal HB skeleton
         events = self.kem.fetch_for(self.subject_id)
-        norm = self.perception.normalize(events)
-        analysis = self.cognition.analyze(norm)
+        with span("perception.normalize", "module"):
+            norm = self.perception.normalize(events)
+        with span("cognition.analyze", "module"):
+            analysis = self.cognition.analyze(norm)
         # v0.1: just log
-        log_info(f"{self.subject_id}: HB analysis {analysis}")
+        log_info("%s: HB analysis %s", self.subject_id, analysis, sub="hb")
 
     def rf_cycle(self):
-        log_info(f"{self.subject_id}: entering RF (freeze AE).")
+        log_info("%s: entering RF (freeze AE).", self.subject_id, sub="rf")
         # v0.1: no-op consolidation
-        log_info(f"{self.subject_id}: leaving RF → HB.")
+        log_info("%s: leaving RF → HB.", self.subject_id, sub="rf")
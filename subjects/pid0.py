@@ -13,7 +13,7 @@ class PID0:
         self.cfg = cfg
 
     def hb_cycle(self):
-        log_info(f"{self.subject_id}: HB-cycle")
+        log_info("%s: HB-cycle", self.subject_id, sub="hb")
 
     def rf_cycle(self):
-        log_info(f"{self.subject_id}: RF-cycle (noop)")
+        log_info("%s: RF-cycle (noop)", self.subject_id, sub="rf")
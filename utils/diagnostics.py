@@ -1,15 +1,248 @@
-import logging, os
-
-os.makedirs("logs", exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("logs/spx.log", encoding="utf-8")
-    ]
-)
-
-def log_info(msg: str): logging.info(msg)
-def log_warn(msg: str): logging.warning(msg)
-def log_error(msg: str): logging.error(msg)
+# utils/diagnostics.py
+"""
+Diagnostics — SPX-OS v0.2
+Logging for the kernel and subjects. Nothing is configured at import time: setup_logging()
+(bootstrap, shard workers) installs handlers, and the first log_* call before that falls back
+to the defaults (console + logs/spx.log, synchronous).
+
+  - log_info(msg, *args, sub=...) — %-style args are rendered only for records that pass the
+    level check, so a filtered call costs one lookup and a level comparison
+  - sub names a subsystem logger "spx.<sub>" (kem, kms, spm, runtime, hb, …) whose level and
+    rate limit are set in the `logging` config section
+  - mode "async": records go through a bounded queue to a background writer thread; the file
+    is buffered and flushed every flush_interval_ms or on WARNING and above. The message is
+    rendered before it is queued, so the writer never sees caller objects. A full queue
+    drops the record (counted) instead of blocking the tick
+"""
+
+from __future__ import annotations
+import atexit
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from logging.handlers import QueueHandler, QueueListener
+from time import monotonic
+from typing import Any, Dict, List, Optional
+
+_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+_ROOT = "spx"
+
+
+@dataclass
+class _LogCfg:
+    mode: str = "sync"                 # sync | async
+    level: str = "INFO"
+    file: Optional[str] = "logs/spx.log"
+    console: bool = True
+    levels: Dict[str, str] = field(default_factory=dict)       # sub → рівень
+    rate_limits: Dict[str, int] = field(default_factory=dict)  # sub → записів/с на шаблон
+    queue_max: int = 10000
+    flush_interval_s: float = 0.2
+
+    @classmethod
+    def from_config(cls, c: Optional[Dict[str, Any]]) -> "_LogCfg":
+        c = c or {}
+        cfg = cls(
+            mode=str(c.get("mode", "sync")),
+            level=str(c.get("level", "INFO")).upper(),
+            file=c.get("file", "logs/spx.log"),
+            console=bool(c.get("console", True)),
+            levels={str(k): str(v).upper() for k, v in (c.get("levels") or {}).items()},
+            rate_limits={str(k): int(v) for k, v in (c.get("rate_limits") or {}).items()},
+            queue_max=int(c.get("queue_max", 10000)),
+            flush_interval_s=float(c.get("flush_interval_ms", 200)) / 1000.0,
+        )
+        if cfg.mode not in ("sync", "async"):
+            raise ValueError("Invalid logging mode")
+        for name in [cfg.level, *cfg.levels.values()]:
+            if not isinstance(logging.getLevelName(name), int):
+                raise ValueError(f"Invalid logging level {name}")
+        if cfg.queue_max <= 0 or any(v <= 0 for v in cfg.rate_limits.values()):
+            raise ValueError("Invalid logging config")
+        return cfg
+
+
+class _RateLimit:
+    """
+    At most `per_s` records per second for each message template (msg before args are applied,
+    so "%s: HB-cycle" from thousands of subjects counts as one message). Checked before a
+    LogRecord is built; the number suppressed in a window is appended to the first message of
+    the next one.
+    """
+
+    def __init__(self, per_s: int):
+        self.per_s = per_s
+        self.suppressed = 0
+        self._win: Dict[str, List[float]] = {}   # шаблон → [початок вікна, пропущено, придушено]
+
+    def admit(self, msg: str) -> Optional[str]:
+        """The message to log (possibly with a suppressed-count suffix), or None to drop it."""
+        now = monotonic()
+        st = self._win.get(msg)
+        if st is None or now - st[0] >= 1.0:
+            self._win[msg] = [now, 1, 0]
+            return f"{msg} [+{int(st[2])} similar suppressed]" if st is not None and st[2] else msg
+        if st[1] < self.per_s:
+            st[1] += 1
+            return msg
+        # гонки між потоками executor-а лише трохи зсувають лічильники — замок тут не потрібен
+        st[2] += 1
+        self.suppressed += 1
+        return None
+
+
+class _BufferedFileHandler(logging.FileHandler):
+    """FileHandler that flushes on an interval (or on WARNING+) instead of after every record."""
+
+    def __init__(self, path: str, flush_interval_s: float):
+        super().__init__(path, encoding="utf-8")
+        self.flush_interval_s = flush_interval_s
+        self._last_flush = monotonic()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            now = monotonic()
+            if record.levelno >= logging.WARNING or now - self._last_flush >= self.flush_interval_s:
+                self.flush()
+                self._last_flush = now
+        except Exception:
+            self.handleError(record)
+
+
+class _AsyncHandler(QueueHandler):
+    """
+    Non-blocking enqueue. The message is rendered in the caller (args and exc_info are live
+    objects it may change before the writer thread gets to the record); the writer thread
+    only applies the formatter and does the I/O.
+    """
+
+    def __init__(self, q: "queue.Queue[logging.LogRecord]"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # знімок у момент виклику: пізніша зміна args/винятку не потрапляє в лог
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_EXC_FORMATTER = logging.Formatter()
+_lock = threading.Lock()
+_state: Dict[str, Any] = {"cfg": None, "handlers": [], "listener": None, "async_": None, "limits": {}}
+_loggers: Dict[str, logging.Logger] = {}
+
+
+def _logger(sub: str) -> logging.Logger:
+    lg = _loggers.get(sub)
+    if lg is None:
+        if _state["cfg"] is None:
+            setup_logging()
+        lg = _loggers.setdefault(sub, logging.getLogger(f"{_ROOT}.{sub}"))
+    return lg
+
+
+def setup_logging(cfg: Optional[Dict[str, Any]] = None) -> None:
+    """Install (or re-install) the SPX log pipeline from the `logging` config section."""
+    c = _LogCfg.from_config(cfg)
+    with _lock:
+        _teardown()
+        root = logging.getLogger(_ROOT)
+        root.setLevel(c.level)
+        root.propagate = False
+        fmt = logging.Formatter(_FORMAT)
+        sinks: List[logging.Handler] = []
+        if c.console:
+            sinks.append(logging.StreamHandler())
+        if c.file:
+            os.makedirs(os.path.dirname(c.file) or ".", exist_ok=True)
+            sinks.append(_BufferedFileHandler(c.file, c.flush_interval_s) if c.mode == "async"
+                         else logging.FileHandler(c.file, encoding="utf-8"))
+        for h in sinks:
+            h.setFormatter(fmt)
+        if c.mode == "async":
+            front = _AsyncHandler(queue.Queue(c.queue_max))
+            listener = QueueListener(front.queue, *sinks, respect_handler_level=True)
+            listener.start()
+            _state["listener"], _state["async_"] = listener, front
+            root.addHandler(front)
+            _state["handlers"] = [front]
+        else:
+            for h in sinks:
+                root.addHandler(h)
+            _state["handlers"] = sinks
+        for sub, level in c.levels.items():
+            logging.getLogger(f"{_ROOT}.{sub}").setLevel(level)
+        _state["limits"] = {sub: _RateLimit(per_s) for sub, per_s in c.rate_limits.items()}
+        _state["cfg"] = c
+
+
+def _teardown() -> None:
+    listener = _state["listener"]
+    if listener is not None:
+        listener.stop()                       # дописує чергу до кінця
+    root = logging.getLogger(_ROOT)
+    for h in _state["handlers"]:
+        root.removeHandler(h)
+    for h in ([*listener.handlers] if listener is not None else []) + _state["handlers"]:
+        h.close()
+    for sub in (_state["cfg"].levels if _state["cfg"] else {}):
+        logging.getLogger(f"{_ROOT}.{sub}").setLevel(logging.NOTSET)
+    _state.update(cfg=None, handlers=[], listener=None, limits={}, async_=None)
+    _loggers.clear()                          # наступний log_* без setup_logging() візьме типові
+
+
+def shutdown_logging() -> None:
+    """Drain the async queue and flush/close the sinks (also registered with atexit)."""
+    with _lock:
+        _teardown()
+
+
+atexit.register(shutdown_logging)
+
+
+def logging_metrics() -> Dict[str, Any]:
+    c, front = _state["cfg"], _state["async_"]
+    return {
+        "mode": c.mode if c else None,
+        "queued": front.queue.qsize() if front is not None else 0,
+        "dropped": front.dropped if front is not None else 0,
+        "suppressed": {sub: f.suppressed for sub, f in _state["limits"].items()},
+    }
+
+
+def _emit(level: int, sub: str, msg: str, args: tuple) -> None:
+    lg = _logger(sub)
+    if lg.isEnabledFor(level):
+        limit = _state["limits"].get(sub)
+        if limit is not None:
+            msg = limit.admit(msg)
+            if msg is None:
+                return
+        # makeRecord + handle замість lg.info(): формат не містить місця виклику, тож
+        # обхід стеку (findCaller) — зайва робота на кожен запис
+        lg.handle(lg.makeRecord(lg.name, level, "", 0, msg, args, None))
+
+
+def log_info(msg: str, *args: Any, sub: str = "core") -> None:
+    _emit(logging.INFO, sub, msg, args)
+
+
+def log_warn(msg: str, *args: Any, sub: str = "core") -> None:
+    _emit(logging.WARNING, sub, msg, args)
+
+
+def log_error(msg: str, *args: Any, sub: str = "core") -> None:
+    _emit(logging.ERROR, sub, msg, args)
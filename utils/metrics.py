@@ -1,3 +1,22 @@
+# utils/metrics.py
+"""
+Metrics — SPX-OS v0.2
+Formula helpers for KMS/KMM and the metrics registry: counters, gauges and fixed-bucket
+histograms cheap enough for the kernel hot path, collectors (callbacks read at scrape time,
+zero cost per event) and Prometheus text export to a file or a local HTTP endpoint.
+Updates take no lock: one list/attribute increment under the GIL. Concurrent writers on
+HB pool threads may very rarely lose an increment, which is acceptable for telemetry.
+"""
+
+from __future__ import annotations
+import os
+import threading
+import weakref
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
 def compute_cognitive_debt(pending_consolidations: int, threshold: int) -> float:
     if threshold <= 0: return 0.0
     return pending_consolidations / float(threshold)
@@ -9,3 +28,344 @@ def compute_memory_entropy(recent_access_count: int, total_nodes: int) -> float:
 
 def compute_salience(priority: float, relevance: float) -> float:
     return max(0.0, min(1.0, priority * relevance))
+
+
+# ----------------- Registry -----------------
+
+Labels = Tuple[str, ...]
+# (name, kind, help, [(labels, value)]) — результат collector-а
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def exp_buckets(start: float, factor: float, count: int) -> Tuple[float, ...]:
+    if start <= 0 or factor <= 1 or count <= 0:
+        raise ValueError("Invalid histogram buckets")
+    return tuple(start * factor ** i for i in range(count))
+
+
+# 1 мкс … ~16 с, крок ×2 — покриває і черги KEM, і такти, і ефектори
+LATENCY_BUCKETS = exp_buckets(1e-6, 2.0, 25)
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, n: float = 1.0) -> None:
+        self.value += n
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, v: float) -> None:
+        self.value = v
+
+    def inc(self, n: float = 1.0) -> None:
+        self.value += n
+
+    def dec(self, n: float = 1.0) -> None:
+        self.value -= n
+
+
+class Histogram:
+    """Fixed upper bounds; counts[i] = observations in (bounds[i-1], bounds[i]], last = +Inf."""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def observe_many(self, values: Iterable[float]) -> None:
+        bounds, counts, b = self.bounds, self.counts, bisect_left
+        n, s = 0, 0.0
+        for v in values:
+            counts[b(bounds, v)] += 1
+            s += v
+            n += 1
+        self.sum += s
+        self.count += n
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (0 if empty)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+
+_KINDS = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+
+class MetricFamily:
+    """One metric name with a fixed label set; children are created on first labels() call."""
+
+    def __init__(self, name: str, kind: str, help_: str, labelnames: Sequence[str] = (),
+                 buckets: Optional[Sequence[float]] = None):
+        self.name = name
+        self.kind = kind
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets or LATENCY_BUCKETS) if kind == "histogram" else None
+        self._children: Dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"Invalid labels for metric {self.name}")
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = Histogram(self.buckets) if self.kind == "histogram" else _KINDS[self.kind]()
+                    self._children[key] = child
+        return child
+
+    # без міток — сам family поводиться як єдиний child
+    def inc(self, n: float = 1.0) -> None:
+        self.labels().inc(n)
+
+    def set(self, v: float) -> None:
+        self.labels().set(v)
+
+    def observe(self, v: float) -> None:
+        self.labels().observe(v)
+
+    def children(self) -> List[Tuple[Labels, Any]]:
+        with self._lock:
+            return list(self._children.items())
+
+
+class MetricsRegistry:
+    """
+    Process-wide metric families + collectors.
+      - counter()/gauge()/histogram() are idempotent per name (same family returned)
+      - register_collector(key, fn): fn() → iterable of (name, kind, help, samples); bound
+        methods are held weakly. A key held by another live collector (a second KEM in a
+        shard, a test or a simulation) is not replaced: the newcomer is stored as "key#N"
+        and its samples get an instance="N" label; families of one name are merged
+      - snapshot() → plain dict, to_prometheus() → text exposition format 0.0.4
+    """
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._collectors: Dict[str, Tuple[Callable[[], Optional[Callable[[], Iterable[Family]]]],
+                                          Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _family(self, name: str, kind: str, help_: str, labelnames: Sequence[str],
+                buckets: Optional[Sequence[float]] = None) -> MetricFamily:
+        with self._lock:
+            fam = self._families.get(name)
+            if fam is None:
+                fam = self._families[name] = MetricFamily(name, kind, help_, labelnames, buckets)
+            elif fam.kind != kind or fam.labelnames != tuple(labelnames):
+                raise ValueError(f"Invalid metric redefinition: {name}")
+            return fam
+
+    def counter(self, name: str, help_: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._family(name, "counter", help_, labelnames)
+
+    def gauge(self, name: str, help_: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._family(name, "gauge", help_, labelnames)
+
+    def histogram(self, name: str, help_: str, labelnames: Sequence[str] = (),
+                  buckets: Optional[Sequence[float]] = None) -> MetricFamily:
+        return self._family(name, "histogram", help_, labelnames, buckets)
+
+    def register_collector(self, key: str, fn: Callable[[], Iterable[Family]]) -> str:
+        """Register fn; returns the key it is stored under (for unregister_collector())."""
+        ref = weakref.WeakMethod(fn) if hasattr(fn, "__self__") else (lambda: fn)
+        with self._lock:
+            slot, n = key, 1
+            while True:
+                cur = self._collectors.get(slot)
+                live = cur[0]() if cur is not None else None
+                if live is None or live == fn:
+                    break
+                n += 1
+                slot = f"{key}#{n}"
+            self._collectors[slot] = (ref, None if n == 1 else str(n))
+        return slot
+
+    def unregister_collector(self, key: str) -> None:
+        with self._lock:
+            self._collectors.pop(key, None)
+
+    def _collected(self) -> List[Family]:
+        with self._lock:
+            refs = list(self._collectors.items())
+        merged: Dict[str, Family] = {}
+        for key, (ref, instance) in refs:
+            fn = ref()
+            if fn is None:
+                self.unregister_collector(key)
+                continue
+            for name, kind, help_, samples in fn():
+                if instance is not None:
+                    samples = [({**lbls, "instance": instance}, v) for lbls, v in samples]
+                fam = merged.get(name)
+                if fam is None:
+                    merged[name] = (name, kind, help_, list(samples))
+                else:
+                    fam[3].extend(samples)
+        return list(merged.values())
+
+    # ----------------- Export -----------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """{name: {label-string: value | histogram summary}} for stats / benchmarks."""
+        snap: Dict[str, Any] = {}
+        with self._lock:
+            fams = list(self._families.values())
+        for fam in fams:
+            series: Dict[str, Any] = {}
+            for key, child in fam.children():
+                lbl = ",".join(f"{k}={v}" for k, v in zip(fam.labelnames, key))
+                if fam.kind == "histogram":
+                    series[lbl] = {"count": child.count, "sum": child.sum, "p50": child.quantile(0.5),
+                                   "p90": child.quantile(0.9), "p99": child.quantile(0.99)}
+                else:
+                    series[lbl] = child.value
+            snap[fam.name] = series
+        for name, _, _, samples in self._collected():
+            snap.setdefault(name, {}).update(
+                {",".join(f"{k}={v}" for k, v in lbls.items()): val for lbls, val in samples})
+        return snap
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            fams = sorted(self._families.values(), key=lambda f: f.name)
+        for fam in fams:
+            children = fam.children()
+            if not children:
+                continue
+            lines += [f"# HELP {fam.name} {fam.help}", f"# TYPE {fam.name} {fam.kind}"]
+            for key, child in sorted(children):
+                base = dict(zip(fam.labelnames, key))
+                if fam.kind != "histogram":
+                    lines.append(f"{fam.name}{_fmt_labels(base)} {_fmt_value(child.value)}")
+                    continue
+                acc = 0
+                for bound, c in zip(fam.buckets + (float("inf"),), child.counts):
+                    acc += c
+                    lines.append(f"{fam.name}_bucket{_fmt_labels({**base, 'le': _fmt_value(bound)})} {acc}")
+                lines.append(f"{fam.name}_sum{_fmt_labels(base)} {_fmt_value(child.sum)}")
+                lines.append(f"{fam.name}_count{_fmt_labels(base)} {child.count}")
+        for name, kind, help_, samples in self._collected():
+            lines += [f"# HELP {name} {help_}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{_fmt_labels(lbls)} {_fmt_value(v)}" for lbls, v in samples]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Atomic write (tmp + rename) for node_exporter's textfile collector and similar."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+def _fmt_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    esc = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, esc)) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class MetricsExporter:
+    """
+    Publishes REGISTRY: rewrites `path` every `interval_s` on a daemon thread and/or serves
+    GET /metrics on host:`port` (0 = any free port, None = no server). close() writes the
+    final file.
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, *, path: Optional[str] = None,
+                 interval_s: float = 5.0, port: Optional[int] = None, host: str = "127.0.0.1"):
+        if interval_s <= 0 or (port is not None and port < 0):
+            raise ValueError("Invalid metrics exporter config")
+        self.registry = registry
+        self.path = path
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+        if path:
+            self._thread = threading.Thread(target=self._file_loop, name="spx-metrics", daemon=True)
+            self._thread.start()
+        if port is not None:
+            self._server = ThreadingHTTPServer((host, port), _handler_for(registry))
+            threading.Thread(target=self._server.serve_forever, name="spx-metrics-http", daemon=True).start()
+
+    @classmethod
+    def from_config(cls, metrics_cfg: Optional[Dict[str, Any]],
+                    registry: MetricsRegistry = REGISTRY) -> Optional["MetricsExporter"]:
+        c = metrics_cfg or {}
+        if not c.get("prometheus_file") and not c.get("prometheus_port"):
+            return None
+        return cls(registry, path=c.get("prometheus_file"), interval_s=float(c.get("export_interval_s", 5)),
+                   port=int(c["prometheus_port"]) if c.get("prometheus_port") else None)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1] if self._server is not None else 0
+
+    def _file_loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.registry.write_prometheus(self.path)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.registry.write_prometheus(self.path)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _handler_for(registry: MetricsRegistry):
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802 — http.server API
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return _Handler
@@ -1,3 +1,83 @@
-from time import monotonic
+# utils/time_utils.py
+"""
+Time — SPX-OS v0.2
+Process-wide pluggable clock. get_T0() is the kernel timestamp source (Event/Action/... ts,
+KMS RF windows, KEM queue delay, KMM decay) and sleep() the pacing primitive of the runtime.
+
+  - MonotonicClock (default): time.monotonic / time.sleep
+  - VirtualClock: time moves only through sleep()/advance(), so a simulated hour takes as
+    long as the work inside it (kernel.sim)
+  - set_clock()/use_clock() swap the source for the whole process; readers resolve it on every
+    call, so objects created before the swap follow it too
+
+Measurements of real execution cost (perf_counter in consolidation budgets, the watchdog's
+default timer, journal write timing) and log/trace timestamps stay on the real clocks.
+"""
+
+from __future__ import annotations
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+class MonotonicClock:
+    now: Callable[[], float] = staticmethod(time.monotonic)
+    sleep: Callable[[float], None] = staticmethod(time.sleep)
+
+
+class VirtualClock:
+    """Manually advanced clock; sleep(dt) returns immediately after moving time forward."""
+
+    def __init__(self, start: float = 0.0):
+        self.t = float(start)
+
+    def now(self) -> float:
+        return self.t
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.t += seconds
+
+    def advance(self, seconds: float) -> None:
+        if seconds < 0:
+            raise ValueError("Invalid clock step: time cannot go backwards")
+        self.t += seconds
+
+    def set(self, t: float) -> None:
+        if t < self.t:
+            raise ValueError("Invalid clock step: time cannot go backwards")
+        self.t = t
+
+
+_clock = MonotonicClock()
+_now: Callable[[], float] = _clock.now
+_sleep: Callable[[float], None] = _clock.sleep
+
+
 def get_T0() -> float:
-    return monotonic()
+    return _now()
+
+
+def sleep(seconds: float) -> None:
+    _sleep(seconds)
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock) -> object:
+    """Install `clock` (anything with now() and sleep()); returns the previous one."""
+    global _clock, _now, _sleep
+    prev = _clock
+    _clock, _now, _sleep = clock, clock.now, clock.sleep
+    return prev
+
+
+@contextmanager
+def use_clock(clock) -> Iterator[object]:
+    prev = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(prev)
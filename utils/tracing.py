@@ -0,0 +1,293 @@
+# utils/tracing.py
+"""
+Tracing — SPX-OS v0.2
+Nested spans (tick → phase → subject → module → effector) and an on-demand sampling
+profiler, both switchable at runtime.
+
+  - span(name, cat, **args) is a context manager. While tracing is off it returns one shared
+    no-op object, so an instrumented call site costs a global read and a call
+  - finished spans go to a bounded ring (deque maxlen) as (name, cat, t0_ns, dur_ns, tid, args);
+    the oldest are overwritten, appends are atomic under the GIL
+  - export_chrome(path) writes Chrome trace-event JSON (chrome://tracing, Perfetto)
+  - SamplingProfiler samples sys._current_frames() on a daemon thread into collapsed stacks
+    ("outer;…;inner count", flamegraph.pl / speedscope)
+  - install_signal_toggles(): SIGUSR1 toggles tracing, SIGUSR2 the profiler; switching one off
+    dumps its capture into export_dir
+"""
+
+from __future__ import annotations
+import json
+import os
+import signal
+import sys
+import threading
+from collections import deque
+from dataclasses import dataclass
+from time import perf_counter_ns, strftime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from utils.diagnostics import log_info
+
+# (name, cat, t0_ns, dur_ns, tid, args); dur_ns = -1 — миттєва подія
+_Record = Tuple[str, str, int, int, int, Optional[Dict[str, Any]]]
+
+
+@dataclass
+class _TraceCfg:
+    enabled: bool = False
+    capacity: int = 100_000          # спанів у кільці
+    profile: bool = False
+    profile_interval_ms: float = 5.0
+    export_dir: str = "logs/trace"
+    signals: bool = True             # SIGUSR1 / SIGUSR2 перемикають трасування / профайлер
+
+    @classmethod
+    def from_config(cls, c: Optional[Dict[str, Any]]) -> "_TraceCfg":
+        c = c or {}
+        cfg = cls(
+            enabled=bool(c.get("enabled", False)),
+            capacity=int(c.get("capacity", 100_000)),
+            profile=bool(c.get("profile", False)),
+            profile_interval_ms=float(c.get("profile_interval_ms", 5.0)),
+            export_dir=str(c.get("export_dir", "logs/trace")),
+            signals=bool(c.get("signals", True)),
+        )
+        if cfg.capacity <= 0 or cfg.profile_interval_ms <= 0:
+            raise ValueError("Invalid tracing config")
+        return cfg
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("ring", "name", "cat", "args", "t0")
+
+    def __init__(self, ring: Deque[_Record], name: str, cat: str, args: Optional[Dict[str, Any]]):
+        self.ring = ring
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self) -> "_Span":
+        self.t0 = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> bool:
+        t0 = self.t0
+        args = self.args
+        if exc_type is not None:
+            args = dict(args or {}, error=exc_type.__name__)
+        self.ring.append((self.name, self.cat, t0, perf_counter_ns() - t0, threading.get_native_id(), args))
+        return False
+
+
+class Tracer:
+    """Bounded span ring; `ring` is None while disabled."""
+
+    def __init__(self):
+        self.ring: Optional[Deque[_Record]] = None
+        self.capacity = 100_000
+
+    @property
+    def enabled(self) -> bool:
+        return self.ring is not None
+
+    def enable(self, capacity: Optional[int] = None) -> None:
+        if capacity is not None:
+            if capacity <= 0:
+                raise ValueError("Invalid trace capacity")
+            self.capacity = capacity
+        if self.ring is None or self.ring.maxlen != self.capacity:
+            self.ring = deque(self.ring or (), maxlen=self.capacity)
+
+    def disable(self) -> List[_Record]:
+        """Stop recording; returns what the ring held."""
+        ring, self.ring = self.ring, None
+        return list(ring or ())
+
+    def records(self) -> List[_Record]:
+        return list(self.ring or ())
+
+    def chrome_events(self, records: Optional[List[_Record]] = None) -> List[Dict[str, Any]]:
+        recs = self.records() if records is None else records
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [{"ph": "M", "pid": pid, "tid": 0, "name": "process_name",
+                                         "args": {"name": "spx-kernel"}}]
+        names = {t.native_id: t.name for t in threading.enumerate()}
+        for tid in sorted({r[4] for r in recs}):
+            events.append({"ph": "M", "pid": pid, "tid": tid, "name": "thread_name",
+                           "args": {"name": names.get(tid, f"thread-{tid}")}})
+        for name, cat, t0, dur, tid, args in recs:
+            ev: Dict[str, Any] = {"name": name, "cat": cat, "pid": pid, "tid": tid, "ts": t0 / 1000.0}
+            if dur < 0:
+                ev.update(ph="i", s="t")
+            else:
+                ev.update(ph="X", dur=dur / 1000.0)
+            if args:
+                ev["args"] = args
+            events.append(ev)
+        return events
+
+    def export_chrome(self, path: str, records: Optional[List[_Record]] = None) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.chrome_events(records), "displayTimeUnit": "ms"}, f, default=str)
+        return path
+
+
+TRACER = Tracer()
+
+
+def span(name: str, cat: str = "kernel", **args: Any):
+    ring = TRACER.ring
+    if ring is None:
+        return _NULL
+    return _Span(ring, name, cat, args or None)
+
+
+def instant(name: str, cat: str = "kernel", **args: Any) -> None:
+    ring = TRACER.ring
+    if ring is not None:
+        ring.append((name, cat, perf_counter_ns(), -1, threading.get_native_id(), args or None))
+
+
+# ----------------- Sampling profiler -----------------
+
+class SamplingProfiler:
+    """
+    Wall-clock sampler: every `interval_s` the stacks of all other threads are folded into
+    "file:func;…" keys. Sampling cost falls on the profiler thread (plus the GIL it takes).
+    """
+
+    def __init__(self, interval_s: float = 0.005, max_depth: int = 64):
+        if interval_s <= 0 or max_depth <= 0:
+            raise ValueError("Invalid profiler config")
+        self.interval_s = interval_s
+        self.max_depth = max_depth
+        self.counts: Dict[str, int] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="spx-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, int]:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return dict(self.counts)
+
+    def _loop(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_s):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack: List[str] = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if tid not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(tid, str(tid)))
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{k} {n}\n" for k, n in sorted(self.counts.items(), key=lambda kv: -kv[1]))
+
+    def export_collapsed(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
+
+
+# ----------------- Runtime switches -----------------
+
+_cfg = _TraceCfg()
+_profiler: Optional[SamplingProfiler] = None
+
+
+def configure_tracing(cfg: Optional[Dict[str, Any]] = None) -> None:
+    """Apply the `tracing` config section (bootstrap)."""
+    global _cfg
+    _cfg = _TraceCfg.from_config(cfg)
+    if _cfg.enabled:
+        TRACER.enable(_cfg.capacity)
+    if _cfg.profile:
+        start_profiler()
+    if _cfg.signals:
+        install_signal_toggles()
+
+
+def toggle_tracing() -> Optional[str]:
+    """Enable tracing, or disable it and dump the ring; returns the dump path."""
+    if not TRACER.enabled:
+        TRACER.enable(_cfg.capacity)
+        log_info("Tracing: on (capacity %d)", TRACER.capacity, sub="tracing")
+        return None
+    recs = TRACER.disable()
+    path = TRACER.export_chrome(os.path.join(_cfg.export_dir, f"trace-{strftime('%Y%m%d-%H%M%S')}.json"), recs)
+    log_info("Tracing: off, %d spans → %s", len(recs), path, sub="tracing")
+    return path
+
+
+def start_profiler(interval_ms: Optional[float] = None) -> SamplingProfiler:
+    global _profiler
+    if _profiler is None or not _profiler.running:
+        _profiler = SamplingProfiler((interval_ms or _cfg.profile_interval_ms) / 1000.0)
+        _profiler.start()
+        log_info("Profiler: on (every %.1f ms)", _profiler.interval_s * 1000.0, sub="tracing")
+    return _profiler
+
+
+def stop_profiler() -> Optional[str]:
+    """Stop the profiler and dump collapsed stacks; returns the dump path."""
+    global _profiler
+    prof, _profiler = _profiler, None
+    if prof is None:
+        return None
+    prof.stop()
+    path = prof.export_collapsed(os.path.join(_cfg.export_dir, f"profile-{strftime('%Y%m%d-%H%M%S')}.folded"))
+    log_info("Profiler: off, %d samples → %s", prof.samples, path, sub="tracing")
+    return path
+
+
+def toggle_profiler() -> Optional[str]:
+    if _profiler is not None and _profiler.running:
+        return stop_profiler()
+    start_profiler()
+    return None
+
+
+def install_signal_toggles() -> bool:
+    """SIGUSR1 → toggle_tracing, SIGUSR2 → toggle_profiler (POSIX, main thread only)."""
+    if not hasattr(signal, "SIGUSR1") or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signal.SIGUSR1, lambda *_: toggle_tracing())
+    signal.signal(signal.SIGUSR2, lambda *_: toggle_profiler())
+    return True